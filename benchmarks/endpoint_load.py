@@ -0,0 +1,297 @@
+# benchmarks/endpoint_load.py
+"""
+In-process load benchmark for the stats REST endpoints and DeviceStatsConsumer.
+
+    python -m benchmarks.endpoint_load --devices 500 --history 288 --clients 20 --requests 200
+
+Seeds a fleet with history, then drives each endpoint with concurrent
+in-process clients (Django test Client threads, Channels WebsocketCommunicator
+tasks). Reports requests per second, latency percentiles, queries per request
+and peak memory per request for every endpoint. Exits non-zero when a budget
+in benchmarks/endpoint_budgets.json (or --budgets) is exceeded.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+
+import django  # noqa: E402
+
+from benchmarks.poller_throughput import percentile, git_revision, RESULTS_DIR  # noqa: E402
+
+DEFAULT_BUDGETS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'endpoint_budgets.json')
+
+
+def seed(devices, history):
+    """Create devices in one branch, each with `history` samples 5 minutes apart."""
+    from django.contrib.auth.models import User
+    from network.models import Device, DeviceStats
+
+    Device.objects.all().delete()
+    DeviceStats.objects.all().delete()
+    Device.objects.bulk_create([
+        Device(
+            serial_number=f'LOAD{i:06d}', ip_address=f'10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}',
+            name=f'load-{i}', model='load-router', branch='Load', status='Up',
+            cpu_usage=40.0, temperature=45.0, latency=12.0, bandwidth=1000.0,
+        )
+        for i in range(devices)
+    ], batch_size=500)
+
+    now = datetime.now(timezone.utc)
+    rows = []
+    for device_id in Device.objects.values_list('id', flat=True):
+        for step in range(history):
+            rows.append(DeviceStats(
+                device_id=device_id, timestamp=now - timedelta(minutes=5 * step),
+                cpu_usage=step % 100, temperature=40.0, latency=10.0, bandwidth=1000.0,
+            ))
+            if len(rows) >= 5000:
+                DeviceStats.objects.bulk_create(rows)
+                rows = []
+    DeviceStats.objects.bulk_create(rows)
+
+    user, _ = User.objects.get_or_create(username='loadtest')
+    return user
+
+
+class QueryCounter:
+    """Counts queries on every database connection of the current thread."""
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        from django.db import connections
+        self._contexts = [connections[alias].execute_wrapper(self) for alias in connections]
+        for context in self._contexts:
+            context.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        for context in reversed(self._contexts):
+            context.__exit__(*exc)
+
+
+def summarize(name, latencies, queries, wall_seconds, peak_bytes, errors):
+    return {
+        'endpoint': name,
+        'requests': len(latencies),
+        'errors': errors,
+        'requests_per_second': len(latencies) / wall_seconds if wall_seconds else 0,
+        'latency_p50_ms': percentile(latencies, 50) * 1000,
+        'latency_p95_ms': percentile(latencies, 95) * 1000,
+        'latency_p99_ms': percentile(latencies, 99) * 1000,
+        'queries_per_request': sum(queries) / len(queries),
+        'peak_memory_kb': peak_bytes / 1024,
+    }
+
+
+class ViewClient:
+    """
+    Calls a view directly with a RequestFactory request, for views the URLconf
+    shadows (the DeviceStatsViewSet list shares its path with device_stats_api).
+    """
+    def __init__(self, view, user):
+        from django.test import RequestFactory
+        self.factory = RequestFactory()
+        self.view = view
+        self.user = user
+
+    def get(self, url):
+        request = self.factory.get(url)
+        request.user = self.user
+        request.session = {'branch': 'Load'}
+        response = self.view(request)
+        response.render()
+        return response
+
+
+def run_http(name, url, user, clients, requests, memory_samples, view=None):
+    from django.test import Client
+
+    local = threading.local()
+    latencies, queries, errors = [], [], []
+
+    def client():
+        if not hasattr(local, 'client'):
+            if view is not None:
+                local.client = ViewClient(view, user)
+                return local.client
+            local.client = Client()
+            local.client.force_login(user)
+            session = local.client.session
+            session['branch'] = 'Load'
+            session.save()
+        return local.client
+
+    def one_request(_):
+        c = client()
+        with QueryCounter() as counter:
+            started = time.perf_counter()
+            response = c.get(url)
+            latencies.append(time.perf_counter() - started)
+        queries.append(counter.count)
+        if response.status_code >= 400:
+            errors.append(response.status_code)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(one_request, range(requests)))
+    wall = time.perf_counter() - started
+
+    # Measure peak allocation separately; tracing would distort the timings above
+    tracemalloc.start()
+    peak = 0
+    for _ in range(memory_samples):
+        tracemalloc.reset_peak()
+        client().get(url)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+    tracemalloc.stop()
+    return summarize(name, latencies, queries, wall, peak, len(errors))
+
+
+def run_websocket(name, path, clients, messages):
+    from asgiref.sync import async_to_sync
+    from channels.routing import URLRouter
+    from channels.testing import WebsocketCommunicator
+    from network.routing import websocket_urlpatterns
+
+    application = URLRouter(websocket_urlpatterns)
+    latencies = []
+
+    async def session():
+        communicator = WebsocketCommunicator(application, path)
+        started = time.perf_counter()
+        await communicator.connect()
+        await communicator.receive_from(timeout=30)
+        latencies.append(time.perf_counter() - started)
+        for _ in range(messages):
+            started = time.perf_counter()
+            await communicator.send_json_to({'type': 'get_stats'})
+            await communicator.receive_from(timeout=30)
+            latencies.append(time.perf_counter() - started)
+        await communicator.disconnect()
+
+    async def load():
+        await asyncio.gather(*(session() for _ in range(clients)))
+
+    # Thread-sensitive database calls run back on this thread, so one QueryCounter sees them all
+    with QueryCounter() as counter:
+        started = time.perf_counter()
+        async_to_sync(load)()
+        wall = time.perf_counter() - started
+    queries = [counter.count / len(latencies)]
+
+    tracemalloc.start()
+    async_to_sync(session)()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return summarize(name, latencies[:clients * (messages + 1)], queries, wall, peak / (messages + 1), 0)
+
+
+def check_budgets(results, budgets):
+    """Return a list of budget violations."""
+    violations = []
+    limits = {
+        'max_latency_p95_ms': ('latency_p95_ms', max),
+        'max_queries_per_request': ('queries_per_request', max),
+        'max_peak_memory_kb': ('peak_memory_kb', max),
+        'min_requests_per_second': ('requests_per_second', min),
+    }
+    for result in results:
+        budget = budgets.get(result['endpoint'], {})
+        for key, (field, kind) in limits.items():
+            if key not in budget:
+                continue
+            value = result[field]
+            exceeded = value > budget[key] if kind is max else value < budget[key]
+            if exceeded:
+                violations.append(f"{result['endpoint']}: {field} {value:.4g} violates {key}={budget[key]}")
+        if result['errors']:
+            violations.append(f"{result['endpoint']}: {result['errors']} failed requests")
+    return violations
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--devices', type=int, default=200)
+    parser.add_argument('--history', type=int, default=288, help='Samples per device (5 minutes apart)')
+    parser.add_argument('--clients', type=int, default=10, help='Concurrent clients per endpoint')
+    parser.add_argument('--requests', type=int, default=100, help='HTTP requests per endpoint')
+    parser.add_argument('--ws-messages', type=int, default=5, help='get_stats messages per WebSocket client')
+    parser.add_argument('--memory-samples', type=int, default=3)
+    parser.add_argument('--budgets', default=DEFAULT_BUDGETS)
+    parser.add_argument('--output', help='Result file (default: benchmarks/results/endpoints-<revision>-<time>.json)')
+    options = parser.parse_args(argv)
+
+    django.setup()
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+    call_command('migrate', database='timeseries', verbosity=0)
+
+    user = seed(options.devices, options.history)
+    from network.models import Device
+    device_id = Device.objects.values_list('id', flat=True).first()
+
+    from network.api_views import DeviceStatsViewSet
+    http_endpoints = [
+        ('current_device_stats', '/network/api/current-stats/', None),
+        ('DeviceStatsViewSet', f'/?device_id={device_id}', DeviceStatsViewSet.as_view({'get': 'list'})),
+        ('historical_stats', f'/network/api/devices/{device_id}/historical_stats/?days=1&interval=1', None),
+    ]
+    results = [
+        run_http(name, url, user, options.clients, options.requests, options.memory_samples, view)
+        for name, url, view in http_endpoints
+    ]
+    results.append(run_websocket('DeviceStatsConsumer', '/ws/device-stats/', options.clients, options.ws_messages))
+    results.append(run_websocket(
+        'DeviceStatsConsumer (device)', f'/ws/device-stats/{device_id}/', options.clients, options.ws_messages
+    ))
+
+    report = {
+        'benchmark': 'endpoint_load',
+        'revision': git_revision(),
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'config': {key: value for key, value in vars(options).items() if key not in ('output', 'budgets')},
+        'results': results,
+    }
+    output = options.output or os.path.join(
+        RESULTS_DIR, f"endpoints-{report['revision']}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    for result in results:
+        print(
+            f"{result['endpoint']:<30} {result['requests_per_second']:>8.1f} req/s  "
+            f"p50 {result['latency_p50_ms']:>7.1f} ms  p95 {result['latency_p95_ms']:>7.1f} ms  "
+            f"p99 {result['latency_p99_ms']:>7.1f} ms  {result['queries_per_request']:>6.1f} queries  "
+            f"{result['peak_memory_kb']:>8.0f} KB"
+        )
+    print(f"Saved to {output}")
+
+    budgets = {}
+    if options.budgets and os.path.exists(options.budgets):
+        with open(options.budgets) as f:
+            budgets = json.load(f)
+    violations = check_budgets(results, budgets)
+    for violation in violations:
+        print(f"BUDGET EXCEEDED {violation}")
+    return 1 if violations else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
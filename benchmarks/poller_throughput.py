@@ -0,0 +1,187 @@
+# benchmarks/poller_throughput.py
+"""
+Poller throughput benchmark against a simulated SNMP agent fleet.
+
+    python -m benchmarks.poller_throughput --devices 2000 --cycles 3 --loss-rate 0.01
+
+Seeds one Device per simulated agent, runs the poll task for a number of
+cycles and reports devices per second, cycle p50/p99 and CPU time per device.
+Results are written as JSON (benchmarks/results/ by default); pass --compare
+with an earlier result file to flag regressions.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+
+import django  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(math.ceil(pct / 100 * len(ordered)) - 1, 0)]
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except Exception:
+        return 'unknown'
+
+
+def seed_devices(addresses, model_names):
+    from network.models import Device
+    Device.objects.all().delete()
+    Device.objects.bulk_create([
+        Device(
+            serial_number=f'SIM{i:06d}',
+            ip_address=address,
+            name=f'sim-{address}',
+            model=model_names[i % len(model_names)],
+            branch='Benchmark',
+        )
+        for i, address in enumerate(addresses)
+    ], batch_size=500)
+
+
+def run(options):
+    from django.core.management import call_command
+    from benchmarks.snmp_sim import SimulatedAgentFleet, agent_addresses
+
+    call_command('migrate', verbosity=0)
+    call_command('migrate', database='timeseries', verbosity=0)
+
+    from network import tasks
+    poll = getattr(tasks, options.task)
+
+    addresses = agent_addresses(options.devices)
+    seed_devices(addresses, options.models.split(','))
+
+    fleet = SimulatedAgentFleet(
+        port=options.port,
+        latency_ms=options.latency_ms,
+        jitter_ms=options.jitter_ms,
+        loss_rate=options.loss_rate,
+        dead_rate=options.dead_rate,
+        no_temperature_rate=options.no_temperature_rate,
+        seed=options.seed,
+    )
+    cycles = []
+    with fleet:
+        for _ in range(options.cycles):
+            wall_start = time.perf_counter()
+            cpu_start = time.process_time()
+            poll()
+            cycles.append({
+                'wall_seconds': time.perf_counter() - wall_start,
+                'cpu_seconds': time.process_time() - cpu_start,
+            })
+
+    walls = [cycle['wall_seconds'] for cycle in cycles]
+    total_cpu = sum(cycle['cpu_seconds'] for cycle in cycles)
+    return {
+        'benchmark': 'poller_throughput',
+        'revision': git_revision(),
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'config': {
+            'task': options.task,
+            'devices': options.devices,
+            'cycles': options.cycles,
+            'latency_ms': options.latency_ms,
+            'jitter_ms': options.jitter_ms,
+            'loss_rate': options.loss_rate,
+            'dead_rate': options.dead_rate,
+            'no_temperature_rate': options.no_temperature_rate,
+        },
+        'results': {
+            'devices_per_second': options.devices * len(cycles) / sum(walls),
+            'cycle_p50_seconds': percentile(walls, 50),
+            'cycle_p99_seconds': percentile(walls, 99),
+            'cpu_ms_per_device': total_cpu * 1000 / (options.devices * len(cycles)),
+        },
+        'cycles': cycles,
+    }
+
+
+# For each reported value, whether a higher number is better
+RESULT_DIRECTIONS = {
+    'devices_per_second': True,
+    'cycle_p50_seconds': False,
+    'cycle_p99_seconds': False,
+    'cpu_ms_per_device': False,
+}
+
+
+def compare(current, baseline, tolerance):
+    """
+    Return a list of human-readable regressions of current vs baseline
+    beyond the given relative tolerance.
+    """
+    regressions = []
+    for name, higher_is_better in RESULT_DIRECTIONS.items():
+        old = baseline['results'].get(name)
+        new = current['results'].get(name)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        if (change < -tolerance) if higher_is_better else (change > tolerance):
+            regressions.append(f"{name}: {old:.4g} -> {new:.4g} ({change:+.1%})")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--devices', type=int, default=1000)
+    parser.add_argument('--cycles', type=int, default=3)
+    parser.add_argument('--task', default='poll_all_devices', choices=['poll_all_devices', 'update_snmp_data'])
+    parser.add_argument('--port', type=int, default=int(os.getenv('SNMP_PORT', 16161)))
+    parser.add_argument('--latency-ms', type=float, default=1.0)
+    parser.add_argument('--jitter-ms', type=float, default=0.5)
+    parser.add_argument('--loss-rate', type=float, default=0.0, help='Fraction of requests silently dropped')
+    parser.add_argument('--dead-rate', type=float, default=0.0, help='Fraction of agents that never answer')
+    parser.add_argument('--no-temperature-rate', type=float, default=0.0,
+                        help='Fraction of agents without the temperature OID')
+    parser.add_argument('--models', default='sim-router,sim-switch', help='Comma-separated Device.model values')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='Result file (default: benchmarks/results/poller-<revision>-<time>.json)')
+    parser.add_argument('--compare', help='Earlier result file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='Allowed relative regression')
+    options = parser.parse_args(argv)
+
+    os.environ['SNMP_PORT'] = str(options.port)
+    django.setup()
+
+    result = run(options)
+    output = options.output or os.path.join(
+        RESULTS_DIR, f"poller-{result['revision']}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+
+    print(json.dumps(result['results'], indent=2))
+    print(f"Saved to {output}")
+
+    if options.compare:
+        with open(options.compare) as f:
+            regressions = compare(result, json.load(f), options.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
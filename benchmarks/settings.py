@@ -0,0 +1,27 @@
+# benchmarks/settings.py
+"""
+Django settings for benchmark runs: the project settings with throwaway
+databases and in-process caches/channel layers, so a benchmark never touches
+db.sqlite3 or needs Redis.
+"""
+import os
+import tempfile
+from myproject.settings import *  # noqa: F401,F403
+
+BENCH_DIR = os.getenv('BENCH_DIR') or tempfile.mkdtemp(prefix='signalsync-bench-')
+
+DATABASES['default']['NAME'] = os.path.join(BENCH_DIR, 'default.sqlite3')
+DATABASES['timeseries']['NAME'] = os.path.join(BENCH_DIR, 'timeseries.sqlite3')
+
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'stream': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+}
+CHANNEL_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+
+INGEST = dict(INGEST, ENABLED=False)
+METRICS = dict(METRICS, REDIS_URL=None)
+TIMESERIES_STORE = dict(TIMESERIES_STORE, PATH=os.path.join(BENCH_DIR, 'tsdata'))
+
+SNMP_PORT = int(os.getenv('SNMP_PORT', 16161))
+ALLOWED_HOSTS = ['*']
@@ -0,0 +1,185 @@
+# benchmarks/snmp_sim.py
+"""
+Simulated SNMP agent fleet for benchmarking the poller without hardware.
+
+One UDP socket bound to 0.0.0.0:<port> answers for every agent. Agents are
+told apart by the loopback destination address of each request (127.1.0.1,
+127.1.0.2, ...), which the kernel reports through IP_PKTINFO, and replies are
+sent from that same address.
+
+Per-agent behaviour is derived from a hash of its address, so a given agent is
+consistently dead (never answers) or missing the temperature OID across runs.
+"""
+import asyncio
+import hashlib
+import ipaddress
+import multiprocessing
+import random
+import socket
+import struct
+import time
+from pyasn1.codec.ber import decoder, encoder
+from pysnmp.proto import api, rfc1905
+
+IP_PKTINFO = getattr(socket, 'IP_PKTINFO', 8)  # Linux value; not exported by every Python build
+
+# OIDs answered by the simulated agents (the ones the poller requests)
+CPU_OID = '1.3.6.1.4.1.2021.11.10.0'
+TEMPERATURE_OID = '1.3.6.1.4.1.2021.13.16.0'
+IF_HC_OUT_OCTETS_OID = '1.3.6.1.2.1.31.1.1.1.10.1'
+IF_HIGH_SPEED_OID = '1.3.6.1.2.1.31.1.1.1.15.1'
+SYS_DESCR_OID = '1.3.6.1.2.1.1.1.0'
+SYS_OBJECT_ID_OID = '1.3.6.1.2.1.1.2.0'
+SYS_NAME_OID = '1.3.6.1.2.1.1.5.0'
+
+
+def agent_addresses(count, base='127.1.0.1'):
+    """Loopback addresses for count agents, starting at base."""
+    start = int(ipaddress.IPv4Address(base))
+    return [str(ipaddress.IPv4Address(start + i)) for i in range(count)]
+
+
+def _fraction(address, salt):
+    """Stable pseudo-random number in [0, 1) for an agent address."""
+    digest = hashlib.blake2b(f'{salt}:{address}'.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') / 2 ** 64
+
+
+class AgentFleetProtocol(asyncio.DatagramProtocol):
+    """
+    Decodes SNMP GET requests and answers them as the addressed agent would.
+    """
+    def __init__(self, sock, latency_ms=1.0, jitter_ms=0.5, loss_rate=0.0,
+                 dead_rate=0.0, no_temperature_rate=0.0, seed=None):
+        self.sock = sock
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.loss_rate = loss_rate
+        self.dead_rate = dead_rate
+        self.no_temperature_rate = no_temperature_rate
+        self.random = random.Random(seed)
+        self.started = time.time()
+        self.loop = asyncio.get_event_loop()
+
+    def on_readable(self):
+        while True:
+            try:
+                data, ancdata, _, client = self.sock.recvmsg(65535, socket.CMSG_SPACE(12))
+            except BlockingIOError:
+                return
+            agent = None
+            for level, kind, payload in ancdata:
+                if level == socket.IPPROTO_IP and kind == IP_PKTINFO:
+                    agent = socket.inet_ntoa(payload[8:12])
+            if agent is None or _fraction(agent, 'dead') < self.dead_rate:
+                continue
+            if self.random.random() < self.loss_rate:
+                continue
+            response = self.respond(agent, data)
+            if response is None:
+                continue
+            delay = max(self.latency + self.random.uniform(-self.jitter, self.jitter), 0)
+            self.loop.call_later(delay, self.send, agent, client, response)
+
+    def send(self, agent, client, response):
+        pktinfo = struct.pack('@i4s4s', 0, socket.inet_aton(agent), b'\0' * 4)
+        try:
+            self.sock.sendmsg([response], [(socket.IPPROTO_IP, IP_PKTINFO, pktinfo)], 0, client)
+        except OSError:
+            pass
+
+    def values(self, agent, module):
+        """Current value of every OID this agent exposes."""
+        elapsed = time.time() - self.started
+        values = {
+            CPU_OID: module.Integer(int(20 + 60 * _fraction(agent, 'cpu'))),
+            IF_HIGH_SPEED_OID: (module.Gauge32 if hasattr(module, 'Gauge32') else module.Gauge)(1000),  # v1 calls it Gauge
+            SYS_DESCR_OID: module.OctetString(f'Simulated agent {agent}'),
+            SYS_OBJECT_ID_OID: module.ObjectIdentifier('1.3.6.1.4.1.8072.3.2.10'),
+            SYS_NAME_OID: module.OctetString(f'sim-{agent}'),
+        }
+        octets = int(elapsed * 1_000_000 * (1 + _fraction(agent, 'rate')))
+        if hasattr(module, 'Counter64'):
+            values[IF_HC_OUT_OCTETS_OID] = module.Counter64(octets)
+        if _fraction(agent, 'temperature') >= self.no_temperature_rate:
+            values[TEMPERATURE_OID] = module.Integer(int(35 + 20 * _fraction(agent, 'temp')))
+        return values
+
+    def respond(self, agent, data):
+        try:
+            version = int(api.decodeMessageVersion(data))
+            module = api.protoModules[version]
+            request, _ = decoder.decode(data, asn1Spec=module.Message())
+        except Exception:
+            return None
+        response = module.apiMessage.getResponse(request)
+        request_pdu = module.apiMessage.getPDU(request)
+        response_pdu = module.apiMessage.getPDU(response)
+        if not request_pdu.isSameTypeWith(module.GetRequestPDU()):
+            module.apiPDU.setErrorStatus(response_pdu, 5)  # genErr
+            return encoder.encode(response)
+
+        values = self.values(agent, module)
+        var_binds = []
+        for index, (oid, _) in enumerate(module.apiPDU.getVarBinds(request_pdu)):
+            value = values.get(str(oid))
+            if value is not None:
+                var_binds.append((oid, value))
+            elif version == api.protoVersion1:
+                module.apiPDU.setErrorStatus(response_pdu, 2)  # noSuchName
+                module.apiPDU.setErrorIndex(response_pdu, index + 1)
+                var_binds.append((oid, module.Null('')))
+            else:
+                var_binds.append((oid, rfc1905.noSuchObject))
+        module.apiPDU.setVarBinds(response_pdu, var_binds)
+        return encoder.encode(response)
+
+
+def _serve(port, ready, options):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 8 * 1024 * 1024)
+    sock.setsockopt(socket.IPPROTO_IP, IP_PKTINFO, 1)
+    sock.bind(('0.0.0.0', port))
+    sock.setblocking(False)
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    protocol = AgentFleetProtocol(sock, **options)
+    loop.add_reader(sock.fileno(), protocol.on_readable)
+    ready.set()
+    loop.run_forever()
+
+
+class SimulatedAgentFleet:
+    """
+    Runs the simulated agents in a child process so their CPU time isn't
+    counted against the poller being measured.
+
+        with SimulatedAgentFleet(port=16161, loss_rate=0.01) as fleet:
+            ...
+    """
+    def __init__(self, port=16161, **options):
+        self.port = port
+        self.options = options
+        self.process = None
+
+    def start(self):
+        ready = multiprocessing.Event()
+        self.process = multiprocessing.Process(target=_serve, args=(self.port, ready, self.options), daemon=True)
+        self.process.start()
+        if not ready.wait(10):
+            raise RuntimeError('Simulated SNMP agent fleet failed to start')
+        return self
+
+    def stop(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.join(5)
+            self.process = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -67,8 +67,18 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'network.profiling.ProfilingMiddleware',  # No-op unless PROFILING['ENABLED']
 ]
 
+# Query/timing profiler for requests and Celery tasks (see network/profiling.py).
+# Slow or N+1-looking samples go to logs/profiling.log and the admin (Request profiles).
+PROFILING = {
+    'ENABLED': os.getenv('PROFILING_ENABLED', 'False') == 'True',
+    'SAMPLE_RATE': float(os.getenv('PROFILING_SAMPLE_RATE', 0.05)),  # Fraction of requests/tasks profiled
+    'SLOW_MS': 500,  # Record anything slower than this
+    'N_PLUS_ONE_THRESHOLD': 10,  # Same query fingerprint this many times = N+1
+}
+
 ROOT_URLCONF = 'myproject.urls'
 
 TEMPLATES = [
@@ -98,9 +108,80 @@ DATABASES = {
         'OPTIONS': {
             'timeout': 30,  # Increase timeout for better performance
         }
+    },
+    # Dedicated time-series database for DeviceStats, rollups and alerts (see network/routers.py).
+    # Tuned for appends so poller writes don't block web requests on the default database.
+    'timeseries': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.getenv('TIMESERIES_DB_PATH', BASE_DIR / 'timeseries.sqlite3'),
+        'OPTIONS': {
+            'timeout': 30,
+            'transaction_mode': 'IMMEDIATE',  # Take the writer lock up front instead of failing mid-transaction
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA cache_size=-65536;'  # 64 MB page cache
+                'PRAGMA temp_store=MEMORY;'
+                'PRAGMA wal_autocheckpoint=10000;'
+            ),
+        }
     }
 }
 
+DATABASE_ROUTERS = ['network.routers.TimeSeriesRouter']
+TIMESERIES_DATABASE = 'timeseries'
+
+SILENCED_SYSTEM_CHECKS = [
+    # DeviceStats' devicestats_latest_idx covers the metric columns on PostgreSQL; SQLite just
+    # builds it without them, which is what we want there
+    'models.W040',
+]
+
+# Optional memory-mapped columnar store for DeviceStats samples (see network/tsstore.py).
+# When enabled, historical chart and export endpoints read from it directly.
+TIMESERIES_STORE = {
+    'ENABLED': os.getenv('TIMESERIES_STORE_ENABLED', 'False') == 'True',
+    'PATH': os.getenv('TIMESERIES_STORE_PATH', BASE_DIR / 'tsdata'),
+    'SEGMENT_CAPACITY': 65536,  # Samples per segment file (~768 KB per device/metric)
+    'RETENTION_DAYS': 30,  # Whole segments older than this are deleted by cleanup_old_stats
+}
+
+# Caches. 'series' holds closed chunks of historical range queries (see network/rangecache.py),
+# which never expire: in Redis, run that instance with maxmemory-policy allkeys-lru; without
+# Redis, a file cache on local disk culls the least recently used chunks past MAX_ENTRIES.
+CACHES = {
+    # Counter baselines, RTT estimates, unsupported OIDs, live-read locks and
+    # SNMPv3 engine IDs; shared by every poller/web process and kept across restarts
+    'default': {
+        'BACKEND': 'network.sharedcache.FailSafeRedisCache',
+        'LOCATION': os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379/3'),
+    },
+    'series': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('SERIES_CACHE_URL'),
+        'TIMEOUT': None,
+    } if os.getenv('SERIES_CACHE_URL') else {
+        'BACKEND': 'network.rangecache.LRUFileBasedCache',
+        'LOCATION': os.getenv('SERIES_CACHE_PATH', BASE_DIR / 'cache' / 'series'),
+        'TIMEOUT': None,
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'CULL_FREQUENCY': 10,  # Drop the least recently used tenth when full
+        },
+    },
+    # Live-stats sequence numbers and ring buffer, shared by ingest workers and consumers
+    'stream': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('STREAM_REDIS_URL', 'redis://localhost:6379/2'),
+        'TIMEOUT': None,
+    },
+}
+
+RANGE_CACHE = {
+    'ENABLED': os.getenv('RANGE_CACHE_ENABLED', 'True') == 'True',
+    'CLOSE_DELAY': 600,  # Seconds after a chunk ends before it is cached (covers ingest and collector backlogs)
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -140,6 +221,42 @@ EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
+# UDP port devices answer SNMP on (overridden by the benchmark's simulated agent fleet)
+SNMP_PORT = int(os.getenv('SNMP_PORT', 161))
+
+# SNMP collector (see network/collector.py)
+COLLECTOR = {
+    # Per-Device.model OID overrides: {model: {metric name: OID, or None to never poll it}}
+    # e.g. {'Catalyst 2960': {'temperature': None, 'cpu_usage': '1.3.6.1.4.1.9.9.109.1.1.1.1.8.1'}}
+    'MODEL_PROFILES': {},
+    # Seconds to stop requesting an OID a device answered with noSuchObject/noSuchInstance
+    'UNSUPPORTED_TTL': int(os.getenv('COLLECTOR_UNSUPPORTED_TTL', 6 * 60 * 60)),
+    # Live API reads reuse the poller's sample if it is younger than this (seconds)...
+    'LIVE_FRESH_SECONDS': int(os.getenv('COLLECTOR_LIVE_FRESH_SECONDS', 30)),
+    # ...otherwise one coalesced SNMP query per device, cached for this long
+    'LIVE_CACHE_SECONDS': int(os.getenv('COLLECTOR_LIVE_CACHE_SECONDS', 5)),
+    # Per-device SNMP timeouts learned from RTT history, TCP RTO style (see network/rto.py)
+    'ADAPTIVE_TIMEOUT': {
+        'ENABLED': os.getenv('COLLECTOR_ADAPTIVE_TIMEOUT', 'True') == 'True',
+        'INITIAL_TIMEOUT': 2,  # Seconds per attempt until a device has answered
+        'MIN_TIMEOUT': 0.25,
+        'MAX_TIMEOUT': 10,
+    },
+    # Branches polled by standalone collectors (python -m network.edge) instead of Celery.
+    # Collectors authenticate with REMOTE_TOKEN; the endpoints are off while it is empty.
+    'REMOTE_BRANCHES': [b for b in os.getenv('COLLECTOR_REMOTE_BRANCHES', '').split(',') if b],
+    'REMOTE_TOKEN': os.getenv('COLLECTOR_REMOTE_TOKEN', ''),
+    'REMOTE_INTERVAL': 3,  # Seconds between collector polls
+    'REMOTE_REFRESH': 60,  # Seconds between assignment fetches
+    # Per-device circuit breaker for unreachable devices (see network/breaker.py)
+    'BREAKER': {
+        'FAILURE_THRESHOLD': 3,  # Unanswered polls in a row before only probing the device
+        'BASE_BACKOFF': 30,  # Seconds to the first probe, doubling after each failed probe...
+        'MAX_BACKOFF': 30 * 60,  # ...up to this
+        'PROBE_TIMEOUT': 1,
+    },
+}
+
 # Celery Configuration for Task Scheduling
 CELERY_TIMEZONE = "UTC"
 CELERY_TASK_TRACK_STARTED = True
@@ -159,6 +276,66 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'network.tasks.send_scheduled_notifications',
         'schedule': 6 * 60 * 60,  # Every 6 hours
     },
+    'drain-ingest-buffer-every-2-seconds': {
+        'task': 'network.tasks.drain_ingest_buffer',
+        'schedule': 2,
+    },
+}
+
+# Run the ingest consumer on its own queue: celery -A myproject worker -Q ingest -c 1
+CELERY_TASK_ROUTES = {
+    'network.tasks.drain_ingest_buffer': {'queue': 'ingest'},
+    # Sweeps run for minutes: celery -A myproject worker -Q discovery -c 1
+    'network.tasks.discover_devices': {'queue': 'discovery'},
+}
+
+# Write-behind ingest buffer between pollers and the database (see network/ingest.py)
+INGEST = {
+    'ENABLED': os.getenv('INGEST_BUFFER_ENABLED', 'False') == 'True',
+    'BACKEND': os.getenv('INGEST_BUFFER_BACKEND', 'redis'),  # 'redis' (stream) or 'local' (SQLite file)
+    'REDIS_URL': os.getenv('INGEST_REDIS_URL', CELERY_BROKER_URL),
+    'STREAM': 'signalsync:ingest',
+    'GROUP': 'ingest',
+    'LOCAL_PATH': BASE_DIR / 'ingest_queue.sqlite3',
+    'BATCH_SIZE': 1000,  # Samples per database transaction
+    'CLAIM_IDLE_SECONDS': 60,  # Redeliver unacknowledged samples after this long
+}
+
+# Prometheus metrics registry (see network/metrics.py). Per-process values are pushed
+# to Redis every FLUSH_INTERVAL seconds so /metrics shows totals across all workers.
+# Scrapers authenticate with "Authorization: Bearer <TOKEN>"; staff sessions also work.
+METRICS = {
+    'REDIS_URL': os.getenv('METRICS_REDIS_URL', 'redis://localhost:6379/1'),
+    'FLUSH_INTERVAL': 5,
+    'TOKEN': os.getenv('METRICS_TOKEN', ''),
+}
+
+# Last CAPACITY samples per device in NumPy rings, mirrored to Redis lists so every process
+# can serve latest values and short windows without querying DeviceStats (see network/recent.py).
+RECENT_SAMPLES = {
+    'CAPACITY': 1200,  # One hour at the 3-second poll interval
+    'REDIS_URL': os.getenv('RECENT_SAMPLES_REDIS_URL', 'redis://localhost:6379/1'),
+}
+
+# Sequenced live-stats stream (see network/stream.py). Clients reconnecting with
+# since=<seq> get the missed deltas from a ring buffer in the CACHE alias, which must be
+# shared between processes (Redis); startup fails on a per-process cache.
+STREAM = {
+    'BUFFER_SIZE': 1000,  # Deltas kept; an older cursor gets a full snapshot
+    'CACHE': 'stream',
+    'CLIENT_MAX_RATE': 10,  # Deltas per second per WebSocket client
+    'CLIENT_BYTE_BUDGET': 256 * 1024,  # Bytes per second per WebSocket client
+}
+
+# Subnet discovery (see network/discovery.py); run with the discover_devices task or
+# POST /network/api/devices/discover/
+DISCOVERY = {
+    'RANGES': {},  # {branch: ['10.1.0.0/16', ...]} swept by default
+    'COMMUNITIES': [c for c in os.getenv('DISCOVERY_COMMUNITIES', 'public').split(',') if c],
+    'CONCURRENCY': 256,  # Addresses in flight at once
+    'RATE': 1000,  # New addresses per second
+    # sysObjectID prefix -> Device.model, so discovered devices get their COLLECTOR['MODEL_PROFILES'] entry
+    'MODELS': {},
 }
 
 # Channel Layers - using Redis for development
@@ -181,6 +358,21 @@ LOGGING = {
             'class': 'logging.FileHandler',
             'filename': LOG_DIR / 'errors.log',
         },
+        'profiling': {
+            'level': 'WARNING',
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': LOG_DIR / 'profiling.log',
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'formatter': 'json_line',
+        },
+    },
+    'formatters': {
+        'json_line': {
+            # Profiling messages are already JSON documents; prefix a timestamp field
+            'format': '{{"time": "{asctime}", "profile": {message}}}',
+            'style': '{',
+        },
     },
     'loggers': {
         'django': {
@@ -188,6 +380,11 @@ LOGGING = {
             'level': 'ERROR',
             'propagate': True,
         },
+        'network.profiling': {
+            'handlers': ['profiling'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
     },
 }
 
@@ -6,6 +6,7 @@ from network.api_views import DeviceViewSet
 from django.views.generic import RedirectView
 from network.views import register_user, user_login
 from network import views
+from network.metrics import metrics_view
 
 # Register API routes
 router = DefaultRouter()
@@ -14,6 +15,7 @@ router.register(r'devices', DeviceViewSet)
 urlpatterns = [
     path('', RedirectView.as_view(url='/device_list/', permanent=False)),
     path('admin/', admin.site.urls),  # Admin panel
+    path('metrics', metrics_view, name='metrics'),  # Prometheus scrape endpoint
     
     # API endpoints managed by Django Rest Framework router
     path('api/', include(router.urls)),
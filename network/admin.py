@@ -1,23 +1,71 @@
 from django.contrib import admin
-from .models import Device, DeviceStats, NotificationPreference
+from .models import Device, DeviceAlert, DeviceStats, NotificationPreference, RequestProfile
+from . import breaker
+
+
+class BreakerStateFilter(admin.SimpleListFilter):
+    title = 'circuit breaker'
+    parameter_name = 'breaker'
+
+    def lookups(self, request, model_admin):
+        return [('open', 'Open'), ('closed', 'Closed')]
+
+    def queryset(self, request, queryset):
+        if self.value() == 'open':
+            return queryset.filter(breaker_opened_at__isnull=False)
+        if self.value() == 'closed':
+            return queryset.filter(breaker_opened_at__isnull=True)
+        return queryset
+
 
 # Custom admin interface for the Device model
 @admin.register(Device)
 class DeviceAdmin(admin.ModelAdmin):
-    list_display = ('name', 'ip_address', 'serial_number', 'status', 'cpu_usage', 'temperature', 'latency', 'bandwidth')  
+    list_display = ('name', 'ip_address', 'serial_number', 'status', 'cpu_usage', 'temperature', 'latency', 'bandwidth', 'breaker_state', 'breaker_next_probe')  
     search_fields = ('name', 'ip_address', 'serial_number', 'branch')  
-    list_filter = ('status', 'branch')  
+    list_filter = ('status', 'branch', BreakerStateFilter)  
     ordering = ('serial_number',)  
 #    list_editable = ('status',)  
-    readonly_fields = ('cpu_usage', 'temperature', 'latency', 'bandwidth')  
+    readonly_fields = ('cpu_usage', 'temperature', 'latency', 'bandwidth', 'breaker_failures', 'breaker_opened_at', 'breaker_next_probe')  
+    actions = ['reset_breaker']
+
+    @admin.action(description='Reset circuit breaker (poll again next cycle)')
+    def reset_breaker(self, request, queryset):
+        count = breaker.reset(queryset)
+        self.message_user(request, f"Reset the circuit breaker of {count} device(s).")
 
 # Custom admin interface for DeviceStats (if historical stats need to be viewed)
 @admin.register(DeviceStats)
 class DeviceStatsAdmin(admin.ModelAdmin):
     list_display = ('device', 'timestamp', 'cpu_usage', 'temperature', 'latency', 'bandwidth')  
-    search_fields = ('device__name', 'timestamp')  
+    search_fields = ('timestamp',)  
     list_filter = ('device', 'timestamp')  
     ordering = ('-timestamp',)  
     readonly_fields = ('device', 'timestamp', 'cpu_usage', 'temperature', 'latency', 'bandwidth')  
+
+    def get_search_results(self, request, queryset, search_term):
+        # DeviceStats lives in the time-series database, so device names can't be joined in SQL
+        queryset, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if search_term:
+            device_ids = list(Device.objects.filter(name__icontains=search_term).values_list('id', flat=True))
+            queryset |= self.model.objects.filter(device_id__in=device_ids)
+        return queryset, may_have_duplicates
+
+# Alerts raised with ingested samples
+@admin.register(DeviceAlert)
+class DeviceAlertAdmin(admin.ModelAdmin):
+    list_display = ('device', 'timestamp', 'message')
+    list_filter = ('device', 'timestamp')
+    ordering = ('-timestamp',)
+    readonly_fields = ('device', 'timestamp', 'message')
     
-admin.site.register(NotificationPreference)
\ No newline at end of file
+admin.site.register(NotificationPreference)
+
+# Slowest requests/tasks and detected N+1 patterns (see network/profiling.py)
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ('name', 'kind', 'method', 'status_code', 'wall_ms', 'sql_ms', 'query_count', 'n_plus_one', 'timestamp')
+    search_fields = ('name',)
+    list_filter = ('kind', 'n_plus_one', 'timestamp')
+    ordering = ('-wall_ms',)
+    readonly_fields = ('kind', 'name', 'method', 'status_code', 'timestamp', 'wall_ms', 'sql_ms', 'query_count', 'n_plus_one', 'duplicate_queries')
@@ -2,64 +2,22 @@
 from rest_framework import viewsets
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, action
+from rest_framework.permissions import IsAdminUser
 from django.http import HttpResponse
 from django.utils import timezone
 from datetime import datetime, timedelta
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError
 from django.db.models import F
 import csv
-from pysnmp.hlapi import (
-    CommunityData,
-    UdpTransportTarget,
-    ContextData,
-    ObjectType,
-    ObjectIdentity,
-    getCmd
-)
-from pysnmp.entity.engine import SnmpEngine
 from .models import Device, DeviceStats
 from .serializers import DeviceSerializer, DeviceStatsSerializer
+from . import bulk, collector, discovery, downsample, ingest, recent, series, stream, tasks, tsstore
 import logging
 
 # Setup logging
 logger = logging.getLogger(__name__)
 
-# SNMP utility function
-def fetch_snmp_data(ip, oid, community='public', version='2c'):
-    """
-    Fetch SNMP data from a device using the provided OID.
-    """
-    try:
-        logger.debug(f"Attempting SNMP query to {ip} with OID {oid}")
-        snmp_version = 0 if version == '1' else 1  # SNMP v1 = 0, SNMP v2c = 1
-        iterator = getCmd(
-            SnmpEngine(),
-            CommunityData(community, mpModel=snmp_version),
-            UdpTransportTarget((ip, 161), timeout=2, retries=1),
-            ContextData(),
-            ObjectType(ObjectIdentity(oid))
-        )
-
-        errorIndication, errorStatus, errorIndex, varBinds = next(iterator)
-
-        if errorIndication:
-            logger.error(f"SNMP Error for {ip}: {errorIndication}")
-            return None
-        elif errorStatus:
-            logger.error(f"SNMP Error for {ip}: {errorStatus.prettyPrint()}")
-            return None
-
-        for varBind in varBinds:
-            logger.debug(f"SNMP Response from {ip}: {varBind[0].prettyPrint()} = {varBind[1].prettyPrint()}")
-            try:
-                return float(varBind[1])  # Convert to float if possible
-            except (ValueError, TypeError):
-                return str(varBind[1])  # Otherwise, return as string
-
-    except Exception as e:
-        logger.error(f"SNMP Request Failed for {ip}: {str(e)}")
-        return None
-
-
 class DeviceViewSet(viewsets.ModelViewSet):
     """
     ViewSet for managing devices, including SNMP data retrieval.
@@ -72,15 +30,7 @@ class DeviceViewSet(viewsets.ModelViewSet):
         Retrieve a device along with real-time SNMP data.
         """
         device = self.get_object()
-        snmp_community = getattr(device, 'snmp_community', 'public')
-        snmp_version = getattr(device, 'snmp_version', '2c')
-
-        snmp_data = {
-            'cpu_usage': fetch_snmp_data(device.ip_address, '1.3.6.1.4.1.2021.11.10.0', snmp_community, snmp_version),
-            'temperature': fetch_snmp_data(device.ip_address, '1.3.6.1.4.1.2021.13.16.0', snmp_community, snmp_version),
-            'latency': fetch_snmp_data(device.ip_address, '1.3.6.1.2.1.31.1.1.1.10.1', snmp_community, snmp_version),
-            'bandwidth': fetch_snmp_data(device.ip_address, '1.3.6.1.2.1.31.1.1.1.15.1', snmp_community, snmp_version),
-        }
+        snmp_data, _ = collector.live_read(device)
 
         response_data = self.get_serializer(device).data
         response_data.update(snmp_data)
@@ -90,20 +40,79 @@ class DeviceViewSet(viewsets.ModelViewSet):
     def stats(self, request, pk=None):
         """
         Fetch real-time SNMP data and store in DeviceStats model.
+        Only a request that actually queried the device records a sample;
+        readers served from the poller or a coalesced query don't.
         """
         device = self.get_object()
 
-        snmp_data = {
-            'cpu_usage': fetch_snmp_data(device.ip_address, '1.3.6.1.4.1.2021.11.10.0', device.snmp_community, device.snmp_version),
-            'temperature': fetch_snmp_data(device.ip_address, '1.3.6.1.4.1.2021.13.16.0', device.snmp_community, device.snmp_version),
-            'latency': fetch_snmp_data(device.ip_address, '1.3.6.1.2.1.31.1.1.1.10.1', device.snmp_community, device.snmp_version),
-            'bandwidth': fetch_snmp_data(device.ip_address, '1.3.6.1.2.1.31.1.1.1.15.1', device.snmp_community, device.snmp_version),
-        }
+        snmp_data, queried = collector.live_read(device)
 
         # Save new SNMP data entry for historical stats
-        DeviceStats.objects.create(device=device, **snmp_data)
+        if queried:
+            ingest.submit([ingest.make_sample(device.id, timezone.now(), snmp_data)])
 
         return Response(snmp_data)
+
+    @action(detail=False, methods=['post'], url_path='bulk-create')
+    def bulk_create(self, request):
+        """
+        Create many devices in one transaction.
+        Body: {"devices": [{...device fields...}, ...]}
+        """
+        return self._bulk(bulk.create, request.data)
+
+    @action(detail=False, methods=['post'], url_path='bulk-update')
+    def bulk_update(self, request):
+        """
+        Partially update many devices in one transaction.
+        Body: {"devices": [{"id": 1, ...fields...}, ...]}, or a selection
+        ({"ids": [...]} or {"filter": {"branch": ...}}) with {"changes": {...fields...}}
+        """
+        return self._bulk(bulk.update, request.data)
+
+    @action(detail=False, methods=['post'], url_path='bulk-delete')
+    def bulk_delete(self, request):
+        """
+        Delete a selection of devices in one transaction.
+        Body: {"ids": [...]} or {"filter": {...}}
+        """
+        return self._bulk(bulk.delete, request.data)
+
+    @action(detail=False, methods=['post'], url_path='bulk-maintenance')
+    def bulk_maintenance(self, request):
+        """
+        Set ("maintenance_mode": true/false) or toggle (omitted) maintenance
+        mode on a selection of devices in one transaction.
+        Body: {"ids": [...]} or {"filter": {...}}, plus optional "maintenance_mode"
+        """
+        return self._bulk(bulk.set_maintenance, request.data)
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser])
+    def discover(self, request):
+        """
+        Queue a subnet discovery sweep (see network/discovery.py). Staff only,
+        since it sends SNMP and ICMP to every address in the ranges.
+        Body: {"ranges": {"Branch A": ["10.1.0.0/16", ...]}}, or empty for DISCOVERY['RANGES']
+        """
+        try:
+            ranges = request.data.get('ranges')
+            ranges = discovery.parse_ranges(ranges if ranges is not None else discovery.get_config()['RANGES'])
+        except (AttributeError, ValueError) as e:
+            return Response({'error': str(e)}, status=400)
+        result = tasks.discover_devices.delay(ranges)
+        return Response({'task_id': result.id, 'ranges': ranges}, status=202)
+
+    def _bulk(self, operation, data):
+        """Run a network/bulk.py operation and return its per-item report."""
+        try:
+            return Response(operation(data))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+        except ValidationError as e:
+            return Response({'error': ' '.join(e.messages)}, status=400)
+        except IntegrityError as e:
+            logger.error(f"Bulk {operation.__name__} rolled back: {e}")
+            return Response({'error': f'Conflicting concurrent change, nothing was applied: {e}'}, status=409)
     
     @action(detail=True, methods=['get'])
     def historical_stats(self, request, pk=None):
@@ -112,14 +121,37 @@ class DeviceViewSet(viewsets.ModelViewSet):
         Optional query parameters:
         - days: Number of days to look back (default 1)
         - interval: Time interval in minutes for data points (default 5)
+        - points: Downsample with LTTB to about this many points per metric
+          instead of keeping every n-th one (overrides interval)
         """
         device = self.get_object()
-        days = int(request.query_params.get('days', 1))
-        interval = int(request.query_params.get('interval', 5))
+        try:
+            days = int(request.query_params.get('days', 1))
+            interval = int(request.query_params.get('interval', 5))
+            points = downsample.parse_points(request.query_params.get('points'), default=None)
+        except ValueError:
+            return Response({'error': 'days, interval and points must be integers'}, status=400)
         
         # Calculate time range
         end_date = timezone.now()
         start_date = end_date - timedelta(days=days)
+
+        if points:
+            return Response(self._downsampled_stats(device, start_date, end_date, points))
+        
+        # Read straight from the columnar store when it is enabled
+        store = tsstore.get_store()
+        if store is not None:
+            timestamps, columns = store.read_columns(
+                device.id, tsstore.to_epoch_ms(start_date), tsstore.to_epoch_ms(end_date)
+            )
+            if interval > 1:
+                timestamps = timestamps[::interval]
+                columns = {metric: values[::interval] for metric, values in columns.items()}
+            return Response([
+                {'device': device.id, 'device_name': device.name, 'timestamp': timestamp, **row}
+                for timestamp, row in tsstore.iter_rows(timestamps, columns)
+            ])
         
         # Get stats for the specified period
         stats = DeviceStats.objects.filter(
@@ -136,6 +168,32 @@ class DeviceViewSet(viewsets.ModelViewSet):
         serializer = DeviceStatsSerializer(stats, many=True)
         return Response(serializer.data)
 
+    def _downsampled_stats(self, device, start_date, end_date, points):
+        """historical_stats rows kept by LTTB on any metric."""
+        store = tsstore.get_store()
+        start_ms, end_ms = tsstore.to_epoch_ms(start_date), tsstore.to_epoch_ms(end_date)
+        if store is not None:
+            timestamps, columns = store.read_columns(device.id, start_ms, end_ms)
+        else:
+            buffered = recent.read_columns(device.id, start_ms, end_ms)
+            if buffered is not None:
+                timestamps, columns = buffered
+            else:
+                rows = DeviceStats.objects.filter(
+                    device=device,
+                    timestamp__gte=start_date,
+                    timestamp__lte=end_date
+                ).order_by('timestamp').values_list('timestamp', *tsstore.METRICS)
+                timestamps, columns = downsample.columns_from_rows(rows, tsstore.METRICS)
+
+        keep = downsample.shared_indices(timestamps, columns, points)
+        timestamps = timestamps[keep]
+        columns = {metric: values[keep] for metric, values in columns.items()}
+        return [
+            {'device': device.id, 'device_name': device.name, 'timestamp': timestamp, **row}
+            for timestamp, row in tsstore.iter_rows(timestamps, columns)
+        ]
+
 
 class DeviceStatsViewSet(viewsets.ReadOnlyModelViewSet):
     """
@@ -148,7 +206,7 @@ class DeviceStatsViewSet(viewsets.ReadOnlyModelViewSet):
         """
         Optionally filter by device ID and/or date range.
         """
-        queryset = DeviceStats.objects.all()
+        queryset = DeviceStats.objects.order_by('-timestamp')
         
         # Filter by device ID if specified
         device_id = self.request.query_params.get('device_id', None)
@@ -188,18 +246,33 @@ class DeviceStatsViewSet(viewsets.ReadOnlyModelViewSet):
         except ValueError:
             return Response({"error": "Invalid date format. Use YYYY-MM-DD."}, status=400)
 
-        # Filter stats by date and optionally by device
-        stats_query = DeviceStats.objects.filter(timestamp__date=date_obj)
-        if device_id:
-            stats_query = stats_query.filter(device_id=device_id)
-
         # Generate CSV file response
         response = HttpResponse(content_type='text/csv')
         response['Content-Disposition'] = f'attachment; filename="device_stats_{date_str}.csv"'
         writer = csv.writer(response)
 
         # Write CSV headers
-        writer.writerow(['Device', 'Timestamp', 'CPU Usage (%)', 'Temperature (°C)', 'Latency (ms)', 'Bandwidth (Mbps)'])
+        writer.writerow(['Device', 'Timestamp', 'CPU Usage (%)', 'Temperature (°C)', 'Outbound Traffic (Mbps)', 'Bandwidth (Mbps)'])
+
+        # Export from the columnar store when it is enabled
+        store = tsstore.get_store()
+        if store is not None:
+            day_start = timezone.make_aware(datetime.combine(date_obj, datetime.min.time()))
+            start_ms = tsstore.to_epoch_ms(day_start)
+            end_ms = tsstore.to_epoch_ms(day_start + timedelta(days=1)) - 1
+            devices = Device.objects.filter(pk=device_id) if device_id else Device.objects.all()
+            for device in devices:
+                timestamps, columns = store.read_columns(device.id, start_ms, end_ms)
+                for timestamp, row in tsstore.iter_rows(timestamps, columns):
+                    writer.writerow([device.name, timestamp.strftime('%Y-%m-%d %H:%M:%S')] + [
+                        row[metric] if row[metric] is not None else 'N/A' for metric in tsstore.METRICS
+                    ])
+            return response
+
+        # Filter stats by date and optionally by device
+        stats_query = DeviceStats.objects.filter(timestamp__date=date_obj).order_by('-timestamp')
+        if device_id:
+            stats_query = stats_query.filter(device_id=device_id)
 
         # Write data rows
         for stat in stats_query:
@@ -240,4 +313,84 @@ def current_device_stats(request):
             'timestamp': timezone.now().strftime('%Y-%m-%d %H:%M:%S')
         })
     
-    return Response(stats)
\ No newline at end of file
+    return Response(stats)
+
+
+@api_view(['GET'])
+def device_series(request):
+    """
+    Several devices' metrics in one columnar payload, for comparison charts.
+    Query parameters:
+    - devices: Comma-separated device ids, or branch: all devices of a branch
+    - metrics: Comma-separated metric names (default all)
+    - start, end: Epoch milliseconds (default: the last `days` days, default 1)
+    - resolution: Bucket size in seconds, or points: target number of buckets
+    Returns {'timestamps': [bucket start, epoch ms], 'series': {device id: {metric: [mean or null]}}, ...}.
+    """
+    params = request.query_params
+    try:
+        device_ids = [int(value) for value in params.get('devices', '').split(',') if value]
+        end_ms = int(params.get('end') or tsstore.to_epoch_ms(timezone.now()))
+        start_ms = int(params.get('start') or end_ms - int(params.get('days', 1)) * 24 * 60 * 60 * 1000)
+        points = min(int(params.get('points', series.DEFAULT_POINTS)), series.MAX_POINTS)
+        resolution = series.pick_resolution(start_ms, end_ms, points, params.get('resolution'))
+    except ValueError:
+        return Response({'error': 'devices, start, end, days, points and resolution must be integers'}, status=400)
+
+    metrics = [metric for metric in params.get('metrics', '').split(',') if metric] or list(tsstore.METRICS)
+    unknown = set(metrics) - set(tsstore.METRICS)
+    if unknown:
+        return Response({'error': f"Unknown metrics: {', '.join(sorted(unknown))}"}, status=400)
+    if start_ms >= end_ms:
+        return Response({'error': 'start must be before end'}, status=400)
+
+    devices = Device.objects.only('id', 'name')
+    if device_ids:
+        devices = devices.filter(id__in=device_ids)
+    elif params.get('branch'):
+        devices = devices.filter(branch=params['branch'])
+    else:
+        return Response({'error': 'devices or branch is required'}, status=400)
+    devices = list(devices.order_by('id')[:series.MAX_DEVICES + 1])
+    if len(devices) > series.MAX_DEVICES:
+        return Response({'error': f'At most {series.MAX_DEVICES} devices per request'}, status=400)
+
+    axis, values = series.read([device.id for device in devices], metrics, start_ms, end_ms, resolution)
+    return Response({
+        'start': start_ms,
+        'end': end_ms,
+        'resolution': resolution,
+        'metrics': metrics,
+        'devices': [{'id': device.id, 'name': device.name} for device in devices],
+        'timestamps': axis.tolist(),
+        'series': {
+            str(device_id): {metric: series.to_json(column) for metric, column in columns.items()}
+            for device_id, columns in values.items()
+        },
+    })
+
+
+@api_view(['GET'])
+def stats_changes(request):
+    """
+    Latest-stats updates after a stream cursor, the REST counterpart of the
+    ws/device-stats/?since=<seq> reconnect (see network/stream.py).
+    Query parameters:
+    - since: Last seq the client has seen (omit for a snapshot)
+    - device: Only this device's updates
+    - branch: Follow this branch's stream (since is then a seq of that stream)
+    Returns {'seq': n, 'type': 'delta', 'deltas': [...]} or {'seq': n, 'type': 'snapshot', 'data': ...}.
+    """
+    try:
+        since = request.query_params.get('since')
+        since = int(since) if since not in (None, '') else None
+        device_id = int(request.query_params['device']) if request.query_params.get('device') else None
+    except ValueError:
+        return Response({'error': 'since and device must be integers'}, status=400)
+    branch = request.query_params.get('branch') or None
+
+    if since is not None:
+        seq, deltas = stream.changes_since(since, {device_id} if device_id else None, branch)
+        if deltas is not None:
+            return Response({'seq': seq, 'type': 'delta', 'deltas': deltas})
+    return Response(stream.snapshot_message(device_id, branch))
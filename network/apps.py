@@ -4,4 +4,10 @@ class NetworkConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'network'
 
-    
\ No newline at end of file
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .stream import check_cache
+        check_cache()
+        from .profiling import connect_celery_signals, connect_query_wrapper
+        connect_query_wrapper()
+        connect_celery_signals()
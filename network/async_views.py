@@ -0,0 +1,128 @@
+# network/async_views.py
+"""
+Async (ASGI-native) versions of the live-device, current-stats and historical
+endpoints. They use the async ORM and the non-blocking SNMP client, so a slow
+or dead device holds a coroutine rather than a worker thread.
+
+Responses match the DRF endpoints they mirror:
+- device_live       -> DeviceViewSet.retrieve
+- current_stats     -> current_device_stats
+- historical_stats  -> DeviceViewSet.historical_stats
+"""
+from datetime import timedelta
+import logging
+from django.contrib.auth.decorators import login_required
+from django.db import transaction
+from django.http import JsonResponse, Http404
+from django.utils import timezone
+from .models import Device, DeviceStats
+from .serializers import DeviceSerializer
+from . import collector, downsample, tsstore
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+
+# ATOMIC_REQUESTS can't wrap async views; these views only read.
+@transaction.non_atomic_requests
+@login_required
+async def device_live(request, pk):
+    """
+    A device along with real-time SNMP data.
+    """
+    try:
+        device = await Device.objects.aget(pk=pk)
+    except Device.DoesNotExist:
+        raise Http404('Device not found')
+
+    snmp_data, _ = await collector.alive_read(device)
+    response_data = dict(DeviceSerializer(device).data)
+    response_data.update(snmp_data)
+    return JsonResponse(response_data)
+
+
+@transaction.non_atomic_requests
+@login_required
+async def current_stats(request):
+    """
+    The latest stats for all devices (of the session's branch).
+    """
+    branch = await request.session.aget('branch', None)
+    devices = Device.objects.only('id', 'name', 'cpu_usage', 'temperature', 'latency', 'bandwidth')
+    if branch and branch != 'Unknown':
+        devices = devices.filter(branch=branch)
+
+    now = timezone.now().strftime('%Y-%m-%d %H:%M:%S')
+    stats = [
+        {
+            'device_id': device.id,
+            'name': device.name,
+            'cpu_usage': device.cpu_usage,
+            'temperature': device.temperature,
+            'latency': device.latency,
+            'bandwidth': device.bandwidth,
+            'timestamp': now,
+        }
+        async for device in devices
+    ]
+    return JsonResponse(stats, safe=False)
+
+
+@transaction.non_atomic_requests
+@login_required
+async def historical_stats(request, pk):
+    """
+    Historical stats for a device.
+    Optional query parameters:
+    - days: Number of days to look back (default 1)
+    - interval: Keep every n-th data point (default 5)
+    - points: Downsample with LTTB to about this many points per metric
+      instead (overrides interval)
+    """
+    try:
+        device = await Device.objects.only('id', 'name').aget(pk=pk)
+    except Device.DoesNotExist:
+        raise Http404('Device not found')
+    try:
+        days = int(request.GET.get('days', 1))
+        interval = max(int(request.GET.get('interval', 5)), 1)
+        points = downsample.parse_points(request.GET.get('points'), default=None)
+    except ValueError:
+        return JsonResponse({'error': 'days, interval and points must be integers'}, status=400)
+
+    end_date = timezone.now()
+    start_date = end_date - timedelta(days=days)
+
+    stats = DeviceStats.objects.filter(
+        device_id=device.id,
+        timestamp__gte=start_date,
+        timestamp__lte=end_date
+    ).order_by('timestamp').values_list('timestamp', *tsstore.METRICS)
+
+    # The columnar store reads are local memory-mapped files
+    store = tsstore.get_store()
+    if store is not None or points:
+        if store is not None:
+            timestamps, columns = store.read_columns(
+                device.id, tsstore.to_epoch_ms(start_date), tsstore.to_epoch_ms(end_date)
+            )
+        else:
+            timestamps, columns = downsample.columns_from_rows([row async for row in stats], tsstore.METRICS)
+        keep = downsample.shared_indices(timestamps, columns, points) if points else slice(None, None, interval)
+        timestamps = timestamps[keep]
+        columns = {metric: values[keep] for metric, values in columns.items()}
+        return JsonResponse([
+            {'device': device.id, 'device_name': device.name, 'timestamp': timestamp, **row}
+            for timestamp, row in tsstore.iter_rows(timestamps, columns)
+        ], safe=False)
+
+    rows = []
+    index = 0
+    async for timestamp, *values in stats:
+        if index % interval == 0:
+            rows.append({
+                'device': device.id, 'device_name': device.name, 'timestamp': timestamp,
+                **dict(zip(tsstore.METRICS, values)),
+            })
+        index += 1
+    return JsonResponse(rows, safe=False)
@@ -0,0 +1,110 @@
+# network/asyncsnmp.py
+"""
+Non-blocking SNMP v1/v2c GET client for async views.
+
+pysnmp's own asyncio API does not run on current Python versions, so this
+encodes the PDUs with pysnmp's protocol modules and sends them over one
+asyncio UDP endpoint per event loop. Outstanding requests are matched to
+replies by request-id, so thousands of concurrent GETs share one socket and
+no threads.
+
+get() returns the same (errorIndication, errorStatus, errorIndex, varBinds)
+tuple as pysnmp.hlapi.getCmd, with v1 counters and gauges translated to
+their v2c types.
+SNMPv3 isn't handled here (see collector.acollect).
+"""
+import asyncio
+import itertools
+import random
+import weakref
+import logging
+from pyasn1.codec.ber import decoder, encoder
+from pysnmp.proto import api, rfc1155, rfc1902
+
+logger = logging.getLogger(__name__)
+
+TIMEOUT_INDICATION = 'No SNMP response received before timeout'
+
+_V1_TYPES = {
+    rfc1155.Counter: lambda value: rfc1902.Counter32(int(value)),
+    rfc1155.Gauge: lambda value: rfc1902.Gauge32(int(value)),
+}
+
+
+class SnmpClientProtocol(asyncio.DatagramProtocol):
+    def __init__(self):
+        self.transport = None
+        self.pending = {}  # request-id -> Future
+        self.request_ids = itertools.count(random.randrange(1, 2 ** 30))
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        try:
+            version = int(api.decodeMessageVersion(data))
+            module = api.protoModules[version]
+            message, _ = decoder.decode(data, asn1Spec=module.Message())
+            pdu = module.apiMessage.getPDU(message)
+            request_id = int(module.apiPDU.getRequestID(pdu))
+        except Exception as e:
+            logger.debug(f"Ignoring undecodable SNMP datagram from {addr}: {e}")
+            return
+        future = self.pending.pop(request_id, None)
+        if future is not None and not future.done():
+            future.set_result((version, module, pdu))
+
+    def error_received(self, exc):
+        logger.debug(f"SNMP socket error: {exc}")
+
+    def next_request_id(self):
+        return next(self.request_ids) % (2 ** 31 - 1) or 1
+
+
+_protocols = weakref.WeakKeyDictionary()
+
+
+async def _get_protocol():
+    """The UDP endpoint of the running event loop, created on first use."""
+    loop = asyncio.get_running_loop()
+    protocol = _protocols.get(loop)
+    if protocol is None or protocol.transport is None or protocol.transport.is_closing():
+        _, protocol = await loop.create_datagram_endpoint(SnmpClientProtocol, local_addr=('0.0.0.0', 0))
+        _protocols[loop] = protocol
+    return protocol
+
+
+async def get(address, port, oids, community='public', version='2c', timeout=2, retries=1):
+    """
+    GET oids from one device without blocking the event loop.
+    """
+    module = api.protoModules[api.protoVersion1 if version == '1' else api.protoVersion2c]
+    protocol = await _get_protocol()
+    loop = asyncio.get_running_loop()
+
+    pdu = module.GetRequestPDU()
+    module.apiPDU.setDefaults(pdu)
+    module.apiPDU.setVarBinds(pdu, [(oid, module.Null('')) for oid in oids])
+    message = module.Message()
+    module.apiMessage.setDefaults(message)
+    module.apiMessage.setCommunity(message, community)
+
+    for _ in range(retries + 1):
+        request_id = protocol.next_request_id()
+        module.apiPDU.setRequestID(pdu, request_id)
+        module.apiMessage.setPDU(message, pdu)
+        future = loop.create_future()
+        protocol.pending[request_id] = future
+        protocol.transport.sendto(encoder.encode(message), (address, port))
+        try:
+            _, reply_module, reply = await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            continue
+        finally:
+            protocol.pending.pop(request_id, None)
+
+        var_binds = [(name, _V1_TYPES.get(type(value), lambda v: v)(value))
+                     for name, value in reply_module.apiPDU.getVarBinds(reply)]
+        return None, reply_module.apiPDU.getErrorStatus(reply), reply_module.apiPDU.getErrorIndex(reply), var_binds
+
+    return TIMEOUT_INDICATION, 0, 0, []
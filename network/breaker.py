@@ -0,0 +1,123 @@
+# network/breaker.py
+"""
+Per-device circuit breaker for the pollers.
+
+An unreachable device costs a full timeout and retry budget every cycle. After
+COLLECTOR['BREAKER']['FAILURE_THRESHOLD'] polls in a row go unanswered the
+device's breaker opens: instead of a full poll it only gets a single-OID probe
+(sysUpTime, short timeout, no retries), first BASE_BACKOFF seconds later and
+then at doubling intervals up to MAX_BACKOFF. The first answered probe closes
+the breaker and the device is polled normally in the same cycle.
+
+State lives on the Device row (breaker_failures, breaker_opened_at,
+breaker_next_probe) so every worker sees it, and the API and admin show it.
+Rows are written only when a failure is counted or the state changes, so
+healthy devices cost no writes.
+"""
+from datetime import timedelta
+import logging
+from django.conf import settings
+from django.utils import timezone
+from .models import Device
+from . import collector, metrics, usm
+
+logger = logging.getLogger(__name__)
+
+SYS_UPTIME_OID = '1.3.6.1.2.1.1.3.0'
+
+
+def get_config():
+    defaults = {
+        'FAILURE_THRESHOLD': 3,  # Consecutive unanswered polls before the breaker opens
+        'BASE_BACKOFF': 30,  # Seconds to the first probe
+        'MAX_BACKOFF': 30 * 60,  # Longest gap between probes
+        'PROBE_TIMEOUT': 1,  # Seconds; probes are never retried
+    }
+    defaults.update(getattr(settings, 'COLLECTOR', {}).get('BREAKER', {}))
+    return defaults
+
+
+def backoff(failures, config=None):
+    """Seconds until the next probe after failures consecutive misses."""
+    config = config or get_config()
+    exponent = max(failures - config['FAILURE_THRESHOLD'], 0)
+    return min(config['BASE_BACKOFF'] * 2 ** min(exponent, 32), config['MAX_BACKOFF'])
+
+
+def _save(device, **fields):
+    for name, value in fields.items():
+        setattr(device, name, value)
+    Device.objects.filter(pk=device.pk).update(**fields)
+
+
+def record_success(device):
+    """Close the breaker / reset the failure count after an answered request."""
+    if device.breaker_opened_at is not None:
+        logger.info(f"Circuit breaker closed for {device.name} ({device.ip_address})")
+        metrics.BREAKER_TRANSITIONS.inc(state='closed')
+    if device.breaker_failures or device.breaker_opened_at is not None:
+        _save(device, breaker_failures=0, breaker_opened_at=None, breaker_next_probe=None)
+
+
+def record_failure(device, now=None):
+    """Count an unanswered poll or probe, opening the breaker at the threshold."""
+    config = get_config()
+    now = now or timezone.now()
+    failures = device.breaker_failures + 1
+    if failures < config['FAILURE_THRESHOLD']:
+        _save(device, breaker_failures=failures)
+        return
+    opened_at = device.breaker_opened_at
+    if opened_at is None:
+        opened_at = now
+        logger.warning(f"Circuit breaker opened for {device.name} ({device.ip_address}) after {failures} failed polls")
+        metrics.BREAKER_TRANSITIONS.inc(state='opened')
+    _save(
+        device,
+        breaker_failures=failures,
+        breaker_opened_at=opened_at,
+        breaker_next_probe=now + timedelta(seconds=backoff(failures, config)),
+    )
+
+
+def probe(device):
+    """One cheap GET: True if the device answered at all."""
+    response = collector.snmp_get(
+        device.ip_address, [SYS_UPTIME_OID],
+        community=device.snmp_community or 'public',
+        version=device.snmp_version or '2c',
+        model=device.model,
+        timeout=get_config()['PROBE_TIMEOUT'],
+        retries=0,
+        usm_user=usm.UsmUser.from_device(device) if device.snmp_version == '3' else None,
+    )
+    return not response.timed_out
+
+
+def poll(device, now=None):
+    """
+    collector.collect() guarded by the device's breaker. Returns the values,
+    or None if the device was skipped (breaker open and no probe due, or the
+    probe went unanswered).
+    """
+    now = now or timezone.now()
+    if device.breaker_opened_at is not None:
+        if device.breaker_next_probe is not None and now < device.breaker_next_probe:
+            metrics.BREAKER_SKIPPED_POLLS.inc()
+            return None
+        if not probe(device):
+            record_failure(device, now)
+            return None
+        record_success(device)
+
+    values, response = collector.query(device)
+    if response is not None and response.timed_out:
+        record_failure(device, now)
+    else:
+        record_success(device)
+    return values
+
+
+def reset(devices):
+    """Close the breakers of a queryset of devices so they are polled next cycle."""
+    return devices.update(breaker_failures=0, breaker_opened_at=None, breaker_next_probe=None)
@@ -0,0 +1,251 @@
+# network/bulk.py
+"""
+Bulk device operations behind the DeviceViewSet bulk actions.
+
+Each operation validates every item first. It then applies the valid ones
+with one bulk_create, bulk_update, or queryset update or delete, inside a
+single transaction. The result reports each item:
+
+    {"results": [{"index": 0, "id": 12, "status": "updated"},
+                 {"index": 1, "status": "error", "errors": {...}}],
+     "counts": {"updated": 1, "error": 1}}
+
+Invalid items are reported and skipped. The others are still applied.
+Serial numbers and IP addresses are checked for uniqueness with one query
+per batch instead of one per item. Updates and toggles are applied
+directly, so they don't re-ping the device the way device_edit does.
+
+Operations that act on existing devices select them with either
+"ids": [1, 2, ...] or "filter": {field: value}, over FILTER_FIELDS.
+"""
+import logging
+from collections import Counter
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Case, Q, Value, When
+from .models import Device
+from .serializers import DeviceBulkSerializer
+from . import signals
+
+logger = logging.getLogger(__name__)
+
+FILTER_FIELDS = ('branch', 'model', 'status', 'maintenance_mode', 'snmp_version')
+UNIQUE_FIELDS = ('serial_number', 'ip_address')
+MAX_ITEMS = 10000
+
+
+def _report(results):
+    return {'results': results, 'counts': dict(Counter(result['status'] for result in results))}
+
+
+def _items(data, key):
+    if not isinstance(data, dict) or not isinstance(data.get(key), list):
+        raise ValueError(f'Expected {{"{key}": [...]}}')
+    if len(data[key]) > MAX_ITEMS:
+        raise ValueError(f'At most {MAX_ITEMS} items per request')
+    return data[key]
+
+
+def select(data):
+    """
+    (queryset, requested ids or None) for an "ids" or "filter" selection.
+    """
+    if not isinstance(data, dict):
+        raise ValueError('Expected a JSON object')
+    if 'ids' in data:
+        ids = _items(data, 'ids')
+        if not all(isinstance(pk, int) for pk in ids):
+            raise ValueError('ids must be integers')
+        return Device.objects.filter(pk__in=ids), list(dict.fromkeys(ids))
+    filters = data.get('filter')
+    if not isinstance(filters, dict) or not filters:
+        raise ValueError('Give "ids" or a non-empty "filter"')
+    unknown = set(filters) - set(FILTER_FIELDS)
+    if unknown:
+        raise ValueError(f'Cannot filter on {", ".join(sorted(unknown))}; use {", ".join(FILTER_FIELDS)}')
+    if not all(isinstance(value, (str, bool, int)) for value in filters.values()):
+        raise ValueError('filter values must be strings, numbers or booleans')
+    lookups = {}
+    for field, value in filters.items():
+        try:
+            lookups[field] = Device._meta.get_field(field).to_python(value)
+        except ValidationError as e:
+            raise ValueError(f'filter {field}: {" ".join(e.messages)}')
+    return Device.objects.filter(**lookups), None
+
+
+def _unique_errors(entries):
+    """
+    {index: errors} for entries ((index, pk or None, {field: value}), ...)
+    that reuse a serial number or IP address of another entry or another
+    device. One query covers the whole batch.
+    """
+    errors = {}
+    claimed = {field: {} for field in UNIQUE_FIELDS}
+    for index, pk, values in entries:
+        for field in UNIQUE_FIELDS:
+            if field not in values:
+                continue
+            other = claimed[field].setdefault(values[field], index)
+            if other != index:
+                errors.setdefault(index, {})[field] = [f'Duplicates item {other} in this request.']
+
+    condition = Q()
+    for field in UNIQUE_FIELDS:
+        if claimed[field]:
+            condition |= Q(**{f'{field}__in': list(claimed[field])})
+    if not condition:
+        return errors
+    taken = {field: {} for field in UNIQUE_FIELDS}
+    for row in Device.objects.filter(condition).values('pk', *UNIQUE_FIELDS):
+        for field in UNIQUE_FIELDS:
+            taken[field][row[field]] = row['pk']
+    for index, pk, values in entries:
+        for field in UNIQUE_FIELDS:
+            owner = taken[field].get(values.get(field))
+            if field in values and owner is not None and owner != pk:
+                errors.setdefault(index, {})[field] = [f'device with this {field} already exists.']
+    return errors
+
+
+def create(data):
+    """
+    Create {"devices": [{...}, ...]} with one bulk_create.
+    """
+    items = _items(data, 'devices')
+    results = [None] * len(items)
+    valid = []
+    for index, item in enumerate(items):
+        serializer = DeviceBulkSerializer(data=item)
+        if serializer.is_valid():
+            valid.append((index, None, serializer.validated_data))
+        else:
+            results[index] = {'index': index, 'status': 'error', 'errors': serializer.errors}
+
+    errors = _unique_errors(valid)
+    devices, indexes = [], []
+    for index, _, values in valid:
+        if index in errors:
+            results[index] = {'index': index, 'status': 'error', 'errors': errors[index]}
+        else:
+            devices.append(Device(**values))
+            indexes.append(index)
+
+    with transaction.atomic():
+        created = Device.objects.bulk_create(devices, batch_size=500)
+    for index, device in zip(indexes, created):
+        results[index] = {'index': index, 'id': device.pk, 'status': 'created'}
+    logger.info(f"Bulk created {len(created)} devices")
+    return _report(results)
+
+
+def update(data):
+    """
+    Partially update devices, either per item with {"devices": [{"id": ..., field: value}, ...]}
+    (one bulk_update), or the same "changes" for a selection (one queryset update).
+    """
+    if isinstance(data, dict) and 'devices' in data:
+        return _update_items(_items(data, 'devices'))
+
+    queryset, ids = select(data)
+    if not isinstance(data.get('changes'), dict) or not data['changes']:
+        raise ValueError('Give the "changes" to apply')
+    if set(UNIQUE_FIELDS) & set(data['changes']):
+        raise ValueError(f'{" and ".join(UNIQUE_FIELDS)} can only be changed per item')
+    serializer = DeviceBulkSerializer(data=data['changes'], partial=True)
+    if not serializer.is_valid():
+        return _report([{'index': 0, 'status': 'error', 'errors': serializer.errors}])
+
+    with transaction.atomic():
+        found = list(queryset.values_list('pk', flat=True))
+        Device.objects.filter(pk__in=found).update(**serializer.validated_data)
+    logger.info(f"Bulk updated {len(found)} devices: {', '.join(serializer.validated_data)}")
+    return _report(_selection_results(ids, found, 'updated'))
+
+
+def _update_items(items):
+    results = [None] * len(items)
+    ids = [item.get('id') if isinstance(item, dict) else None for item in items]
+    devices = Device.objects.in_bulk([pk for pk in ids if isinstance(pk, int)])
+
+    valid = []
+    for index, (pk, item) in enumerate(zip(ids, items)):
+        device = devices.get(pk)
+        if device is None:
+            results[index] = {'index': index, 'id': pk, 'status': 'not_found'}
+            continue
+        serializer = DeviceBulkSerializer(device, data=item, partial=True)
+        if serializer.is_valid():
+            valid.append((index, pk, serializer.validated_data))
+        else:
+            results[index] = {'index': index, 'id': pk, 'status': 'error', 'errors': serializer.errors}
+
+    errors = _unique_errors(valid)
+    changed, fields = {}, set()
+    for index, pk, values in valid:
+        if index in errors:
+            results[index] = {'index': index, 'id': pk, 'status': 'error', 'errors': errors[index]}
+            continue
+        device = devices[pk]
+        for field, value in values.items():
+            setattr(device, field, value)
+        changed[pk] = device
+        fields |= set(values)
+        results[index] = {'index': index, 'id': pk, 'status': 'updated'}
+
+    if changed and fields:
+        with transaction.atomic():
+            Device.objects.bulk_update(list(changed.values()), sorted(fields), batch_size=500)
+    logger.info(f"Bulk updated {len(changed)} devices")
+    return _report(results)
+
+
+def delete(data):
+    """
+    Delete a selection of devices with one queryset delete. Their history is
+    purged once for the whole batch after the transaction commits.
+    """
+    queryset, ids = select(data)
+    with signals.deferred_purge():
+        with transaction.atomic():
+            found = list(queryset.values_list('pk', flat=True))
+            Device.objects.filter(pk__in=found).delete()
+    logger.info(f"Bulk deleted {len(found)} devices")
+    return _report(_selection_results(ids, found, 'deleted'))
+
+
+def set_maintenance(data):
+    """
+    Set maintenance_mode on a selection to "maintenance_mode": true/false,
+    or toggle each device's mode when it is omitted. One queryset update.
+    """
+    queryset, ids = select(data)
+    mode = data.get('maintenance_mode')
+    if mode is not None and not isinstance(mode, bool):
+        raise ValueError('maintenance_mode must be true, false or omitted (toggle)')
+
+    with transaction.atomic():
+        current = dict(queryset.values_list('pk', 'maintenance_mode'))
+        if mode is None:
+            Device.objects.filter(pk__in=list(current)).update(maintenance_mode=Case(
+                When(maintenance_mode=True, then=Value(False)), default=Value(True)
+            ))
+        else:
+            Device.objects.filter(pk__in=list(current)).update(maintenance_mode=mode)
+    results = _selection_results(ids, list(current), 'updated')
+    for result in results:
+        if result['status'] == 'updated':
+            result['maintenance_mode'] = (not current[result['id']]) if mode is None else mode
+    logger.info(f"Bulk set maintenance mode on {len(current)} devices")
+    return _report(results)
+
+
+def _selection_results(ids, found, status):
+    """Results for the devices a selection matched, plus the requested ids that matched none."""
+    if ids is None:
+        return [{'index': index, 'id': pk, 'status': status} for index, pk in enumerate(found)]
+    found = set(found)
+    return [
+        {'index': index, 'id': pk, 'status': status if pk in found else 'not_found'}
+        for index, pk in enumerate(ids)
+    ]
@@ -0,0 +1,592 @@
+# network/collector.py
+"""
+SNMP collector: the single place that knows which OIDs to poll.
+
+- A registry of metric definitions (metric name -> default OID).
+- Per-Device.model OID profiles from settings.COLLECTOR['MODEL_PROFILES'],
+  which can swap a metric's OID or drop it (None) for a given model.
+- A negative cache of OIDs a device answered with noSuchObject/noSuchInstance
+  (or noSuchName on v1). Those OIDs are skipped for
+  COLLECTOR['UNSUPPORTED_TTL'] seconds.
+- All supported OIDs of a device are requested in one GET PDU over a reused
+  per-thread SnmpEngine.
+- SNMPv3 devices authenticate with their USM credentials (see network/usm.py).
+- Counter metrics are turned into per-second rates (see network/rates.py).
+- Per-attempt timeouts adapt to each device's RTT history (see network/rto.py).
+- live_read() serves API reads: the poller's latest sample when fresh, else a
+  short-TTL cached result, else one coalesced SNMP query per device. Devices
+  whose circuit breaker is open (see network/breaker.py) aren't queried.
+- acollect()/alive_read() are the async equivalents for async views (see
+  network/asyncsnmp.py).
+"""
+import asyncio
+import threading
+import time
+import weakref
+import logging
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from pysnmp.hlapi import (
+    SnmpEngine,
+    CommunityData,
+    UdpTransportTarget,
+    ContextData,
+    ObjectType,
+    ObjectIdentity,
+    getCmd
+)
+from pysnmp.carrier.asyncore.dispatch import AsyncoreDispatcher
+from pysnmp.proto.rfc1902 import Counter32, Counter64
+from pysnmp.proto.rfc1905 import NoSuchObject, NoSuchInstance, EndOfMibView
+from . import asyncsnmp, metrics, rates, recent, rto, usm
+
+logger = logging.getLogger(__name__)
+
+UNSUPPORTED_CACHE_PREFIX = 'collector:unsupported:'
+LIVE_CACHE_PREFIX = 'collector:live:'
+LIVE_LOCK_PREFIX = 'collector:live-lock:'
+NO_SUCH_NAME = 2  # SNMPv1 error-status for an unknown OID
+SNMP_RETRIES = 1
+TIMER_RESOLUTION = 0.05  # Seconds; granularity of pysnmp's timeouts
+
+
+class MetricDefinition:
+    """
+    kind is 'gauge' (stored as read) or 'counter' (stored as a per-second
+    rate). Values are multiplied by scale before they are stored.
+    """
+    def __init__(self, name, oid, description='', kind='gauge', scale=1.0):
+        self.name = name
+        self.oid = oid
+        self.description = description
+        self.kind = kind
+        self.scale = scale
+
+
+METRIC_REGISTRY = {}
+
+
+def register_metric(name, oid, description='', kind='gauge', scale=1.0):
+    """Add a metric polled from every device unless its model profile drops it."""
+    METRIC_REGISTRY[name] = MetricDefinition(name, oid, description, kind, scale)
+    return METRIC_REGISTRY[name]
+
+
+register_metric('cpu_usage', '1.3.6.1.4.1.2021.11.10.0', 'CPU usage (%), UCD-SNMP-MIB ssCpuSystem')
+register_metric('temperature', '1.3.6.1.4.1.2021.13.16.0', 'Temperature (°C), UCD-SNMP-MIB lmSensors')
+register_metric('latency', '1.3.6.1.2.1.31.1.1.1.10.1', 'Outbound traffic (Mbps), IF-MIB ifHCOutOctets.1',
+                kind='counter', scale=8 / 1_000_000)
+register_metric('bandwidth', '1.3.6.1.2.1.31.1.1.1.15.1', 'IF-MIB ifHighSpeed.1 (Mbps)')
+
+
+def get_config():
+    return getattr(settings, 'COLLECTOR', {})
+
+
+def get_profile(model):
+    """
+    Return {metric name: OID} to poll for a Device.model.
+    """
+    profile = {name: definition.oid for name, definition in METRIC_REGISTRY.items()}
+    for name, oid in get_config().get('MODEL_PROFILES', {}).get(model, {}).items():
+        if oid is None:
+            profile.pop(name, None)
+        else:
+            profile[name] = oid
+    return profile
+
+
+class UnsupportedOidCache:
+    """
+    Remembers (device address, OID) pairs the device doesn't implement.
+    Backed by the Django cache so all workers share what they learn, with an
+    in-process layer so hot lookups don't hit the cache backend.
+    """
+    def __init__(self):
+        self._local = {}
+        self._lock = threading.Lock()
+
+    def _key(self, address, oid):
+        return f'{UNSUPPORTED_CACHE_PREFIX}{address}:{oid}'
+
+    def is_unsupported(self, address, oid):
+        now = time.monotonic()
+        expires = self._local.get((address, oid))
+        if expires is not None:
+            if expires > now:
+                return True
+            with self._lock:
+                self._local.pop((address, oid), None)
+        ttl = cache.get(self._key(address, oid))
+        if ttl:
+            with self._lock:
+                self._local[(address, oid)] = now + min(ttl, 60)
+            return True
+        return False
+
+    def mark(self, address, oid):
+        ttl = get_config().get('UNSUPPORTED_TTL', 6 * 60 * 60)
+        logger.info(f"{address} does not support {oid}; skipping it for {ttl}s")
+        cache.set(self._key(address, oid), ttl, ttl)
+        with self._lock:
+            self._local[(address, oid)] = time.monotonic() + ttl
+
+    def clear(self, address, oid):
+        cache.delete(self._key(address, oid))
+        with self._lock:
+            self._local.pop((address, oid), None)
+
+
+unsupported_oids = UnsupportedOidCache()
+
+_engines = threading.local()
+
+
+def get_engine():
+    """
+    One SnmpEngine per thread. Building an engine loads MIB modules and costs
+    far more than the GET itself.
+    """
+    engine = getattr(_engines, 'engine', None)
+    if engine is None:
+        engine = _engines.engine = SnmpEngine()
+        # pysnmp counts timeouts in timer ticks (0.5 s by default), which would
+        # round sub-second adaptive timeouts up
+        dispatcher = AsyncoreDispatcher()
+        dispatcher.setTimerResolution(TIMER_RESOLUTION)
+        engine.registerTransportDispatcher(dispatcher)
+    return engine
+
+
+class SnmpResponse:
+    def __init__(self):
+        self.values = {}  # OID -> value
+        self.counter_bits = {}  # OID -> 32 or 64, for Counter32/Counter64 values
+        self.received_at = None
+        self.unsupported = set()
+        self.timed_out = False
+        self.error = None
+
+
+def _to_python(value):
+    if isinstance(value, (Counter32, Counter64)):
+        return int(value)  # Keep full precision for rate computation
+    try:
+        return float(value)  # Convert to float if possible
+    except (ValueError, TypeError):
+        return str(value)  # Otherwise, return as string
+
+
+def snmp_get(address, oids, community='public', version='2c', model='', timeout=None, retries=SNMP_RETRIES,
+             usm_user=None):
+    """
+    GET several OIDs from one device in a single PDU.
+    OIDs the device reports as nonexistent end up in response.unsupported.
+    Version '3' authenticates as usm_user (a usm.UsmUser).
+    timeout (seconds per attempt) defaults to the device's adaptive timeout.
+    """
+    response = SnmpResponse()
+    remaining = list(oids)
+    port = getattr(settings, 'SNMP_PORT', 161)
+    engine = get_engine()
+    adaptive = timeout is None
+    if adaptive:
+        timeout = rto.timeout(address)
+
+    if version == '3':
+        try:
+            auth = usm.auth_data(engine, usm_user, address, port, timeout, retries)
+        except Exception as e:
+            auth = None
+            response.error = str(e)
+        if auth is None:
+            response.error = response.error or 'SNMPv3 engine discovery failed'
+            response.timed_out = True
+            if adaptive:
+                rto.timed_out(address, timeout, retries)
+            metrics.SNMP_FAILURES.inc(device=address, model=model, kind='timeout')
+            logger.error(f"SNMP Error for {address}: {response.error}")
+            return response
+    else:
+        snmp_version = 0 if version == '1' else 1  # SNMP v1 = 0, SNMP v2c = 1
+        auth = CommunityData(community, mpModel=snmp_version)
+
+    # SNMPv1 fails the whole PDU on the first unknown OID, so retry without it
+    while remaining:
+        try:
+            started = time.perf_counter()
+            iterator = getCmd(
+                engine,
+                auth,
+                UdpTransportTarget((address, port), timeout=timeout, retries=retries),
+                ContextData(),
+                *[ObjectType(ObjectIdentity(oid)) for oid in remaining]
+            )
+            errorIndication, errorStatus, errorIndex, varBinds = next(iterator)
+            rtt = time.perf_counter() - started
+            # A new engine loads its MIB modules during the first GET, which isn't network time
+            cold, _engines.warm = not getattr(_engines, 'warm', False), True
+        except Exception as e:
+            metrics.SNMP_FAILURES.inc(device=address, model=model, kind='error')
+            logger.error(f"SNMP Request Failed for {address}: {e}")
+            response.error = str(e)
+            return response
+
+        if errorIndication and version == '3' and 'timeout' not in str(errorIndication).lower():
+            # Wrong digest, unknown engine ID etc.: rediscover on the next poll
+            usm.forget(engine, address, port)
+        repeat = _handle_reply(response, address, model, remaining, errorIndication, errorStatus, errorIndex, varBinds, rtt)
+        _observe_rtt(response, address, None if cold else rtt, timeout, retries, adaptive)
+        if repeat:
+            continue
+        if version == '3' and response.error is None:
+            usm.learn(engine, address, port)
+        return response
+    return response
+
+
+def _observe_rtt(response, address, rtt, timeout, retries, adaptive):
+    """Feed one GET's outcome to the adaptive timeout estimator (rtt None: don't sample)."""
+    if response.timed_out:
+        if adaptive:
+            rto.timed_out(address, timeout, retries)
+    elif response.error is None and rtt is not None:
+        rto.observe(address, rtt, timeout)
+
+
+def _handle_reply(response, address, model, remaining, errorIndication, errorStatus, errorIndex, varBinds, rtt):
+    """
+    Fold one GET reply into response and record metrics. Returns True if the
+    GET should be repeated for what is left in remaining (v1 noSuchName).
+    """
+    if errorIndication:
+        response.timed_out = 'timeout' in str(errorIndication).lower()
+        metrics.SNMP_FAILURES.inc(device=address, model=model, kind='timeout' if response.timed_out else 'error')
+        logger.error(f"SNMP Error for {address}: {errorIndication}")
+        response.error = str(errorIndication)
+        return False
+
+    if errorStatus:
+        if int(errorStatus) == NO_SUCH_NAME and errorIndex and int(errorIndex) <= len(remaining):
+            response.unsupported.add(remaining.pop(int(errorIndex) - 1))
+            return bool(remaining)
+        metrics.SNMP_FAILURES.inc(device=address, model=model, kind='error')
+        logger.error(f"SNMP Error for {address}: {errorStatus.prettyPrint()}")
+        response.error = errorStatus.prettyPrint()
+        return False
+
+    response.received_at = time.time()
+    for oid in remaining:
+        metrics.SNMP_RTT_SECONDS.observe(rtt, device=address, oid=oid)
+    for oid, (name, value) in zip(remaining, varBinds):
+        if isinstance(value, (NoSuchObject, NoSuchInstance, EndOfMibView)):
+            response.unsupported.add(oid)
+        else:
+            response.values[oid] = _to_python(value)
+            if isinstance(value, (Counter32, Counter64)):
+                response.counter_bits[oid] = 32 if isinstance(value, Counter32) else 64
+    return False
+
+
+async def asnmp_get(address, oids, community='public', version='2c', model='', timeout=None,
+                    retries=SNMP_RETRIES):
+    """
+    Non-blocking snmp_get() for v1/v2c, for use in async views.
+    """
+    response = SnmpResponse()
+    remaining = list(oids)
+    port = getattr(settings, 'SNMP_PORT', 161)
+    adaptive = timeout is None
+    if adaptive:
+        timeout = rto.timeout(address)
+    while remaining:
+        try:
+            started = time.perf_counter()
+            errorIndication, errorStatus, errorIndex, varBinds = await asyncsnmp.get(
+                address, port, remaining, community, version, timeout, retries
+            )
+            rtt = time.perf_counter() - started
+        except Exception as e:
+            metrics.SNMP_FAILURES.inc(device=address, model=model, kind='error')
+            logger.error(f"SNMP Request Failed for {address}: {e}")
+            response.error = str(e)
+            return response
+        repeat = _handle_reply(response, address, model, remaining, errorIndication, errorStatus, errorIndex, varBinds, rtt)
+        _observe_rtt(response, address, rtt, timeout, retries, adaptive)
+        if not repeat:
+            return response
+    return response
+
+
+def collect(device, metric_names=None):
+    """
+    Poll a device for its model's metrics. Returns {metric name: value} for
+    every registered metric (or just metric_names), with None for metrics that
+    are unsupported, skipped or failed.
+    """
+    return query(device, metric_names)[0]
+
+
+def query(device, metric_names=None):
+    """
+    collect() that also returns the SnmpResponse (None if no OID was worth
+    requesting), for callers that need to know whether the device answered.
+    """
+    result, requested = _plan(device, metric_names)
+    if not requested:
+        return result, None
+
+    response = snmp_get(
+        device.ip_address, list(dict.fromkeys(requested.values())),
+        community=device.snmp_community or 'public',
+        version=device.snmp_version or '2c',
+        model=device.model,
+        usm_user=usm.UsmUser.from_device(device) if device.snmp_version == '3' else None,
+    )
+    return _results(device, result, requested, response), response
+
+
+async def acollect(device, metric_names=None):
+    """
+    collect() for async views. v1/v2c devices are queried without blocking the
+    event loop; v3 devices go through the threaded pysnmp engine.
+    """
+    if device.snmp_version == '3':
+        return await sync_to_async(collect, thread_sensitive=False)(device, metric_names)
+
+    result, requested = _plan(device, metric_names)
+    if not requested:
+        return result
+
+    response = await asnmp_get(
+        device.ip_address, list(dict.fromkeys(requested.values())),
+        community=device.snmp_community or 'public',
+        version=device.snmp_version or '2c',
+        model=device.model,
+    )
+    return _results(device, result, requested, response)
+
+
+def request_oids(device):
+    """The OIDs a poll of device requests, in request order."""
+    return list(dict.fromkeys(_plan(device, None)[1].values()))
+
+
+def from_response(device, response, metric_names=None):
+    """
+    Metric values from an SnmpResponse fetched elsewhere (e.g. by a
+    standalone collector, see network/remote.py), processed like collect().
+    """
+    result, requested = _plan(device, metric_names)
+    return _results(device, result, requested, response)
+
+
+def _plan(device, metric_names):
+    """Empty result dict and {metric name: OID} still worth requesting."""
+    result = {name: None for name in (metric_names or METRIC_REGISTRY)}
+    requested = {
+        name: oid for name, oid in get_profile(device.model).items()
+        if name in result and not unsupported_oids.is_unsupported(device.ip_address, oid)
+    }
+    return result, requested
+
+
+def _results(device, result, requested, response):
+    """Fill result from a response: mark unsupported OIDs, convert counters to rates, scale."""
+    for oid in response.unsupported:
+        unsupported_oids.mark(device.ip_address, oid)
+    for name, oid in requested.items():
+        value = response.values.get(oid)
+        if not isinstance(value, (int, float)):
+            continue
+        definition = METRIC_REGISTRY[name]
+        if definition.kind == 'counter':
+            if device.pk is None:
+                continue  # Nothing to key the previous sample on yet
+            value = rates.rate(device.pk, oid, value, response.received_at, response.counter_bits.get(oid, 64))
+            if value is None:
+                continue
+        result[name] = float(value) * definition.scale
+    return result
+
+
+def fetch_snmp_data(ip, oid, community='public', version='2c', model='', usm_user=None):
+    """
+    Fetch a single OID from a device. Returns a float, a string for
+    non-numeric values, or None on failure.
+    """
+    return snmp_get(ip, [oid], community, version, model, usm_user=usm_user).values.get(oid)
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time within this process; concurrent
+    callers for the same key wait for and share the leader's result.
+    """
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """Return (result, True if this caller ran fn)."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {'event': threading.Event(), 'result': None}
+        if not leader:
+            call['event'].wait()
+            return call['result'], False
+        try:
+            call['result'] = fn()
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call['event'].set()
+        return call['result'], True
+
+
+live_flights = SingleFlight()
+
+
+def _poller_sample(device, max_age):
+    """
+    The values of the device's latest written sample, if recent enough.
+    Judged by the sample's own timestamp, not Device.last_updated, which any
+    save of the device (an edit, a bulk update) moves forward.
+    """
+    if not max_age or device.pk is None:
+        return None
+    latest = recent.latest([device.pk]).get(device.pk)
+    if not latest or (timezone.now() - latest[-1]['timestamp']).total_seconds() > max_age:
+        return None
+    values = {name: latest[-1].get(name) for name in METRIC_REGISTRY}
+    return values if any(value is not None for value in values.values()) else None
+
+
+def _breaker_open(device):
+    """
+    True if the poller's circuit breaker has given up on the device (see
+    network/breaker.py). Live reads then return the last stored values
+    instead of spending a timeout on it.
+    """
+    return getattr(device, 'breaker_opened_at', None) is not None
+
+
+def _query_shared(device, ttl):
+    """
+    Query the device once across processes: the process holding the cache
+    lock polls, the others wait for its result to land in the cache.
+    """
+    cache_key = f'{LIVE_CACHE_PREFIX}{device.pk}'
+    lock_key = f'{LIVE_LOCK_PREFIX}{device.pk}'
+    # Long enough for a GET and its retries to time out
+    lock_seconds = rto.timeout(device.ip_address) * (SNMP_RETRIES + 1) + 1
+    if cache.add(lock_key, 1, lock_seconds):
+        try:
+            values = collect(device)
+            cache.set(cache_key, values, ttl)
+            return values, True
+        finally:
+            cache.delete(lock_key)
+
+    deadline = time.monotonic() + lock_seconds
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        values = cache.get(cache_key)
+        if values is not None:
+            return values, False
+        if cache.get(lock_key) is None:
+            break
+    values = collect(device)
+    cache.set(cache_key, values, ttl)
+    return values, True
+
+
+def live_read(device):
+    """
+    Current metric values for an API request. Uses, in order: the poller's
+    latest sample if younger than COLLECTOR['LIVE_FRESH_SECONDS'], a result
+    cached for COLLECTOR['LIVE_CACHE_SECONDS'], or a new SNMP query shared
+    by all concurrent readers of the device.
+    Returns (values, True if this call queried the device).
+    """
+    config = get_config()
+    values = _poller_sample(device, config.get('LIVE_FRESH_SECONDS', 30))
+    if values is not None:
+        return values, False
+    if _breaker_open(device):
+        return {name: getattr(device, name, None) for name in METRIC_REGISTRY}, False
+
+    ttl = config.get('LIVE_CACHE_SECONDS', 5)
+    if device.pk is None or not ttl:
+        return collect(device), True
+    values = cache.get(f'{LIVE_CACHE_PREFIX}{device.pk}')
+    if values is not None:
+        return values, False
+
+    (values, queried), leader = live_flights.do(device.pk, lambda: _query_shared(device, ttl))
+    return values, queried and leader
+
+
+# In-flight async live reads per event loop: {loop: {device id: Future}}
+_async_flights = weakref.WeakKeyDictionary()
+
+
+async def _aquery_shared(device, ttl):
+    """_query_shared() for async views."""
+    cache_key = f'{LIVE_CACHE_PREFIX}{device.pk}'
+    lock_key = f'{LIVE_LOCK_PREFIX}{device.pk}'
+    lock_seconds = rto.timeout(device.ip_address) * (SNMP_RETRIES + 1) + 1
+    if await cache.aadd(lock_key, 1, lock_seconds):
+        try:
+            values = await acollect(device)
+            await cache.aset(cache_key, values, ttl)
+            return values, True
+        finally:
+            await cache.adelete(lock_key)
+
+    deadline = time.monotonic() + lock_seconds
+    while time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+        values = await cache.aget(cache_key)
+        if values is not None:
+            return values, False
+        if await cache.aget(lock_key) is None:
+            break
+    values = await acollect(device)
+    await cache.aset(cache_key, values, ttl)
+    return values, True
+
+
+async def alive_read(device):
+    """
+    live_read() for async views; concurrent readers in this event loop await
+    the same query instead of holding threads.
+    """
+    config = get_config()
+    values = await sync_to_async(_poller_sample)(device, config.get('LIVE_FRESH_SECONDS', 30))
+    if values is not None:
+        return values, False
+    if _breaker_open(device):
+        return {name: getattr(device, name, None) for name in METRIC_REGISTRY}, False
+
+    ttl = config.get('LIVE_CACHE_SECONDS', 5)
+    if device.pk is None or not ttl:
+        return await acollect(device), True
+    values = await cache.aget(f'{LIVE_CACHE_PREFIX}{device.pk}')
+    if values is not None:
+        return values, False
+
+    flights = _async_flights.setdefault(asyncio.get_running_loop(), {})
+    flight = flights.get(device.pk)
+    if flight is not None:
+        values, _ = await asyncio.shield(flight)
+        return values, False
+    flight = flights[device.pk] = asyncio.ensure_future(_aquery_shared(device, ttl))
+    try:
+        return await asyncio.shield(flight)
+    finally:
+        flights.pop(device.pk, None)
@@ -1,43 +1,106 @@
 # network/consumers.py
+import asyncio
 import json
+import time
+from urllib.parse import parse_qs
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
-from .models import Device, DeviceStats
+from .models import Device
+from . import metrics, stream
+
+
+def parse_subscription(data):
+    """
+    Validate a subscription (a subscribe message, or the connect query
+    parameters split into lists) into {'branch', 'device_ids', 'metrics',
+    'max_rate'}. Raises ValueError when a field is malformed.
+    """
+    branch = data.get('branch') or None
+    if branch is not None and not isinstance(branch, str):
+        raise ValueError('branch must be a string')
+    device_ids = data.get('device_ids')
+    if device_ids is not None:
+        if not isinstance(device_ids, list) or not all(isinstance(i, int) or str(i).isdigit() for i in device_ids):
+            raise ValueError('device_ids must be a list of integers')
+        device_ids = {int(i) for i in device_ids}
+    selected = data.get('metrics')
+    if selected is not None:
+        if not isinstance(selected, list) or not set(selected) <= set(stream.METRICS):
+            raise ValueError(f'metrics must be a list of {", ".join(stream.METRICS)}')
+        selected = tuple(selected)
+    max_rate = data.get('max_rate')
+    if max_rate is not None:
+        try:
+            max_rate = float(max_rate)
+        except (TypeError, ValueError):
+            raise ValueError('max_rate must be a number')
+        if max_rate <= 0:
+            raise ValueError('max_rate must be positive')
+    return {'branch': branch, 'device_ids': device_ids, 'metrics': selected, 'max_rate': max_rate}
+
 
 class DeviceStatsConsumer(AsyncWebsocketConsumer):
     """
-    WebSocket consumer for real-time device stats
+    WebSocket consumer for real-time device stats.
+    Every message carries the stream sequence number (see network/stream.py);
+    reconnect with ?since=<last seq> to receive only the missed deltas.
+
+    Clients narrow what they receive with a subscription, as a message
+        {"type": "subscribe", "branch": "Branch A", "device_ids": [1, 2],
+         "metrics": ["cpu_usage", "latency"], "max_rate": 1, "since": 42}
+    or as query parameters on connect (?branch=...&device_ids=1,2&metrics=...&max_rate=1).
+    A branch subscription joins the branch's group and follows its stream, so
+    seq numbers are the branch's own. Devices and metrics are filtered on the
+    server.
+
+    Group messages never wait on the socket: they only merge their rows into
+    `pending`, which keeps each device's latest unsent row, so the channel-layer
+    queue drains even for a slow client. A sender task sends whatever is pending
+    as one delta once the previous send has returned (the server has taken the
+    bytes) and the client's message rate (max_rate, capped by
+    STREAM['CLIENT_MAX_RATE']) and byte budget (STREAM['CLIENT_BYTE_BUDGET'] per
+    second) allow it. Rows replaced before they were sent count as conflated.
     """
     async def connect(self):
         # Get the device ID from the URL
         self.device_id = self.scope['url_route']['kwargs'].get('device_id')
-        
-        # Create a unique group name for this connection
-        self.room_group_name = f"device_stats_{self.device_id}" if self.device_id else "all_devices_stats"
-        
-        # Join the room group
-        await self.channel_layer.group_add(
-            self.room_group_name,
-            self.channel_name
-        )
+        self.room_group_name = None
+        self.subscription = parse_subscription({})
+        self.last_seq = 0
+        self.pending = {}  # device id -> latest unsent row
+        self.pending_seq = 0
+        self.last_sent = 0
+        self.byte_allowance = 0  # Bytes the client may still receive now; negative while in debt
+        self.allowance_at = time.monotonic()
+        self.wake = asyncio.Event()
         
         # Accept the connection
         await self.accept()
+        self.sender_task = asyncio.ensure_future(self.sender())
         
-        # Send initial data
-        if self.device_id:
-            device_stats = await self.get_device_stats(self.device_id)
-            await self.send(text_data=json.dumps(device_stats))
-        else:
-            all_stats = await self.get_all_devices_stats()
-            await self.send(text_data=json.dumps(all_stats))
+        params = {name: values[-1] for name, values in parse_qs(self.scope.get('query_string', b'').decode()).items()}
+        for name in ('device_ids', 'metrics'):
+            if name in params:
+                params[name] = [value for value in params[name].split(',') if value]
+        try:
+            subscription = parse_subscription(params)
+        except ValueError as e:
+            await self.send(text_data=json.dumps({'type': 'error', 'message': str(e)}))
+            subscription = parse_subscription({})
+        
+        since = params.get('since', '')
+        await self.subscribe(subscription, int(since) if since.isdigit() else None)
     
     async def disconnect(self, close_code):
+        if getattr(self, 'sender_task', None) is not None:
+            self.sender_task.cancel()
+        self.drop_pending()
         # Leave the room group
-        await self.channel_layer.group_discard(
-            self.room_group_name,
-            self.channel_name
-        )
+        if self.room_group_name:
+            await self.channel_layer.group_discard(
+                self.room_group_name,
+                self.channel_name
+            )
     
     async def receive(self, text_data):
         """
@@ -48,105 +111,165 @@ class DeviceStatsConsumer(AsyncWebsocketConsumer):
         
         if message_type == 'get_stats':
             device_id = data.get('device_id', self.device_id)
-            if device_id:
-                device_stats = await self.get_device_stats(device_id)
-                await self.send(text_data=json.dumps(device_stats))
-            else:
-                all_stats = await self.get_all_devices_stats()
-                await self.send(text_data=json.dumps(all_stats))
+            message = await self.get_snapshot(device_id)
+            await self.send(text_data=json.dumps(message))
+        elif message_type == 'resume' and isinstance(data.get('since'), int):
+            await self.send_changes_since(data['since'])
+        elif message_type == 'subscribe':
+            try:
+                subscription = parse_subscription(data)
+            except ValueError as e:
+                await self.send(text_data=json.dumps({'type': 'error', 'message': str(e)}))
+                return
+            since = data.get('since')
+            await self.subscribe(subscription, since if isinstance(since, int) else None)
+    
+    async def subscribe(self, subscription, since=None):
+        """
+        Switch to a subscription: join its group, then send the deltas after
+        `since` in its stream or a snapshot.
+        """
+        if self.device_id:
+            # A device's updates are all in its branch's stream
+            subscription['device_ids'] = {self.device_id}
+            subscription['branch'] = await self.get_device_branch(self.device_id)
+        group = stream.group_name(subscription['branch'])
+        
+        # Join the new group before reading the buffer so no delta falls in between
+        if group != self.room_group_name:
+            await self.channel_layer.group_add(group, self.channel_name)
+            if self.room_group_name:
+                await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
+            self.room_group_name = group
+        
+        self.drop_pending()
+        self.subscription = subscription
+        self.last_seq = 0
+        if since is not None:
+            await self.send_changes_since(since)
+        else:
+            await self.send_snapshot()
     
     async def device_stats_update(self, event):
         """
         Receive message from room group (server to clients)
         """
-        # Send the updated stats to the WebSocket
-        await self.send(text_data=json.dumps(event['data']))
+        if event.get('group', stream.GROUP) != self.room_group_name:
+            return  # Queued before switching to another subscription
+        seq = event['seq']
+        if seq <= self.last_seq:
+            return  # Already sent as part of a snapshot or replay
+        if seq > self.last_seq + 1:
+            # The channel layer dropped deltas (e.g. ChannelFull): replay them, this one included
+            metrics.WEBSOCKET_MISSED_DELTAS.inc(seq - self.last_seq - 1)
+            await self.send_changes_since(self.last_seq, until=seq)
+            return
+        self.last_seq = seq
+        await self.push(seq, event['data'])
+        if 'sent_at' in event:
+            metrics.WEBSOCKET_FANOUT_SECONDS.observe(max(time.time() - event['sent_at'], 0))
     
-    @database_sync_to_async
-    def get_device_stats(self, device_id):
+    async def push(self, seq, rows):
         """
-        Get latest stats for a specific device
+        Queue the subscribed slice of a delta for the sender task, replacing
+        the devices' older unsent rows.
         """
-        try:
-            device = Device.objects.get(id=device_id)
-            latest_stats = DeviceStats.objects.filter(device=device).first()
-            
-            if latest_stats:
-                return {
-                    'device_id': device.id,
-                    'name': device.name,
-                    'ip_address': device.ip_address,
-                    'model': device.model,
-                    'status': device.status,
-                    'maintenance_mode': device.maintenance_mode,
-                    'cpu_usage': latest_stats.cpu_usage,
-                    'temperature': latest_stats.temperature,
-                    'latency': latest_stats.latency,
-                    'bandwidth': latest_stats.bandwidth,
-                    'timestamp': latest_stats.timestamp.isoformat(),
-                    'alert_triggered': latest_stats.alert_triggered,
-                    'alert_message': latest_stats.alert_message if latest_stats.alert_triggered else None
-                }
-            else:
-                return {
-                    'device_id': device.id,
-                    'name': device.name,
-                    'ip_address': device.ip_address,
-                    'model': device.model,
-                    'status': device.status,
-                    'maintenance_mode': device.maintenance_mode,
-                    'cpu_usage': device.cpu_usage,
-                    'temperature': device.temperature,
-                    'latency': device.latency,
-                    'bandwidth': device.bandwidth,
-                    'timestamp': device.last_updated.isoformat(),
-                    'alert_triggered': False,
-                    'alert_message': None
-                }
-        except Device.DoesNotExist:
-            return {'error': f'Device with ID {device_id} not found'}
+        rows = stream.select(rows, self.subscription['device_ids'], self.subscription['metrics'])
+        if not rows:
+            return
+        conflated = sum(1 for row in rows if row['device_id'] in self.pending)
+        if conflated:
+            metrics.WEBSOCKET_UPDATES.inc(conflated, outcome='conflated')
+        for row in rows:
+            self.pending[row['device_id']] = row
+        self.pending_seq = seq
+        self.wake.set()
+    
+    def send_delay(self):
+        """Seconds until the message rate and byte budget allow the next delta."""
+        config = stream.get_config()
+        now = time.monotonic()
+        delay = 0
+        rates = [rate for rate in (self.subscription['max_rate'], config['CLIENT_MAX_RATE']) if rate]
+        if rates:
+            delay = self.last_sent + 1 / min(rates) - now
+        budget = config['CLIENT_BYTE_BUDGET']
+        if budget:
+            self.byte_allowance = min(budget, self.byte_allowance + (now - self.allowance_at) * budget)
+            self.allowance_at = now
+            if self.byte_allowance < 0:
+                delay = max(delay, -self.byte_allowance / budget)
+        return delay
+    
+    async def sender(self):
+        """
+        Send the pending rows as one delta whenever there are some and the
+        limits allow. Each send returns once the server has taken the bytes, so
+        a slow socket makes rows wait (and conflate) here instead of in the
+        channel layer.
+        """
+        while True:
+            await self.wake.wait()
+            delay = self.send_delay()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            self.wake.clear()
+            if not self.pending:
+                continue
+            rows, self.pending = list(self.pending.values()), {}
+            text_data = json.dumps({'type': 'delta', 'seq': self.pending_seq, 'data': rows})
+            self.last_sent = time.monotonic()
+            self.byte_allowance -= len(text_data)
+            await self.send(text_data=text_data)
+            metrics.WEBSOCKET_UPDATES.inc(len(rows), outcome='sent')
+    
+    def drop_pending(self, outcome='dropped'):
+        if self.pending:
+            metrics.WEBSOCKET_UPDATES.inc(len(self.pending), outcome=outcome)
+        self.pending = {}
+        self.pending_seq = 0
+    
+    async def send_snapshot(self, covers=0):
+        """
+        Send a snapshot. It also covers delta `covers` when that delta has
+        already arrived: samples are stored before their delta is published.
+        """
+        message = await self.get_snapshot(self.device_id)
+        self.last_seq = max(self.last_seq, message['seq'], covers)
+        if self.pending_seq <= self.last_seq:
+            # The pending rows are all in the snapshot
+            self.drop_pending('conflated')
+        text_data = json.dumps(message)
+        self.last_sent = time.monotonic()
+        self.byte_allowance -= len(text_data)
+        await self.send(text_data=text_data)
+    
+    async def send_changes_since(self, since, until=0):
+        """
+        Replay the deltas after `since`. Sends a snapshot instead when the
+        buffer no longer holds them all, or doesn't reach delta `until`, which
+        already arrived live.
+        """
+        seq, deltas = await database_sync_to_async(stream.changes_since)(
+            since, self.subscription['device_ids'], self.subscription['branch']
+        )
+        if deltas is None or seq < until:
+            await self.send_snapshot(covers=until)
+            return
+        for delta in deltas:
+            await self.push(delta['seq'], delta['data'])
+        self.last_seq = max(self.last_seq, seq)
     
     @database_sync_to_async
-    def get_all_devices_stats(self):
+    def get_snapshot(self, device_id):
         """
-        Get latest stats for all devices
+        Get latest stats for a specific device, or the subscribed devices
         """
-        devices = Device.objects.all()
-        result = []
-        
-        for device in devices:
-            latest_stats = DeviceStats.objects.filter(device=device).first()
-            
-            device_data = {
-                'device_id': device.id,
-                'name': device.name,
-                'ip_address': device.ip_address,
-                'model': device.model,
-                'status': device.status,
-                'maintenance_mode': device.maintenance_mode
-            }
-            
-            if latest_stats:
-                device_data.update({
-                    'cpu_usage': latest_stats.cpu_usage,
-                    'temperature': latest_stats.temperature,
-                    'latency': latest_stats.latency,
-                    'bandwidth': latest_stats.bandwidth,
-                    'timestamp': latest_stats.timestamp.isoformat(),
-                    'alert_triggered': latest_stats.alert_triggered,
-                    'alert_message': latest_stats.alert_message if latest_stats.alert_triggered else None
-                })
-            else:
-                device_data.update({
-                    'cpu_usage': device.cpu_usage,
-                    'temperature': device.temperature,
-                    'latency': device.latency,
-                    'bandwidth': device.bandwidth,
-                    'timestamp': device.last_updated.isoformat(),
-                    'alert_triggered': False,
-                    'alert_message': None
-                })
-                
-            result.append(device_data)
-            
-        return {'devices': result}
\ No newline at end of file
+        return stream.snapshot_message(
+            device_id, self.subscription['branch'], self.subscription['device_ids'], self.subscription['metrics']
+        )
+    
+    @database_sync_to_async
+    def get_device_branch(self, device_id):
+        return Device.objects.filter(id=device_id).values_list('branch', flat=True).first()
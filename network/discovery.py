@@ -0,0 +1,313 @@
+# network/discovery.py
+"""
+Subnet discovery: sweep CIDR ranges per branch and register the SNMP agents found.
+
+Each address gets an ICMP echo and, for every DISCOVERY['COMMUNITIES']
+entry, one SNMP GET of sysObjectID, sysName and entPhysicalSerialNum.1, all
+at the same time. SNMP goes through network/asyncsnmp.py (one UDP socket, no
+threads). ping3 blocks, so the pings run in a thread pool.
+
+DISCOVERY['CONCURRENCY'] addresses are in flight at once, and new ones start
+at most DISCOVERY['RATE'] per second. A /16 with no live hosts takes about
+65536 / CONCURRENCY * TIMEOUT * (RETRIES + 1) seconds.
+
+Hosts that answer SNMP are upserted every DISCOVERY['BATCH_SIZE'] hosts:
+- A host is matched to a Device by IP address, then by serial number (the
+  device moved). Otherwise it is created in the swept range's branch.
+- Its model comes from the longest sysObjectID prefix in DISCOVERY['MODELS'],
+  so the poller applies that model's COLLECTOR['MODEL_PROFILES'] entry.
+  Agents with no matching prefix get their sysObjectID as the model.
+
+Hosts that only answer pings are counted but not registered, since there is
+nothing to poll on them.
+"""
+import asyncio
+import ipaddress
+import time
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from ping3 import ping
+from pysnmp.proto.rfc1905 import NoSuchObject, NoSuchInstance, EndOfMibView
+from .models import Device
+from . import asyncsnmp, metrics
+
+logger = logging.getLogger(__name__)
+
+SYS_OBJECT_ID = '1.3.6.1.2.1.1.2.0'
+SYS_NAME = '1.3.6.1.2.1.1.5.0'
+SERIAL_NUMBER = '1.3.6.1.2.1.47.1.1.1.1.11.1'  # ENTITY-MIB entPhysicalSerialNum of the chassis
+IDENTITY_OIDS = (SYS_OBJECT_ID, SYS_NAME, SERIAL_NUMBER)
+PLACEHOLDER_SERIAL_PREFIX = 'auto-'  # Serial of agents that don't report one: auto-<ip>
+# RFC 1918 space; anything else must lie inside a configured DISCOVERY['RANGES'] network
+PRIVATE_NETWORKS = tuple(ipaddress.ip_network(n) for n in ('10.0.0.0/8', '172.16.0.0/12', '192.168.0.0/16'))
+
+
+def get_config():
+    defaults = {
+        'RANGES': {},  # {branch: [CIDR, ...]} swept when no ranges are given
+        'COMMUNITIES': ['public'],
+        'SNMP_VERSION': '2c',
+        'TIMEOUT': 1,  # Seconds per SNMP attempt and per ping
+        'RETRIES': 1,
+        'ICMP': True,
+        'CONCURRENCY': 256,  # Addresses in flight at once
+        'RATE': 1000,  # New addresses per second
+        'BATCH_SIZE': 500,  # Discovered devices per upsert transaction
+        'MAX_ADDRESSES': 4 * 65536,  # Per sweep
+        'MODELS': {},  # {sysObjectID prefix: Device.model}
+    }
+    defaults.update(getattr(settings, 'DISCOVERY', {}))
+    return defaults
+
+
+def parse_ranges(ranges):
+    """
+    Validate {branch: [CIDR, ...]} into normalized network strings. Raises
+    ValueError on bad input, a sweep larger than MAX_ADDRESSES, or a network
+    outside RFC 1918 that isn't inside a configured DISCOVERY['RANGES'] one.
+    """
+    if not isinstance(ranges, dict) or not ranges:
+        raise ValueError('ranges must be a non-empty {branch: [CIDR, ...]} object')
+    allowed = PRIVATE_NETWORKS + tuple(
+        ipaddress.ip_network(cidr, strict=False) for cidrs in get_config()['RANGES'].values() for cidr in cidrs
+    )
+    parsed, total = {}, 0
+    for branch, cidrs in ranges.items():
+        if not isinstance(branch, str) or not branch or not isinstance(cidrs, list):
+            raise ValueError('ranges must map branch names to lists of CIDRs')
+        networks = []
+        for cidr in cidrs:
+            try:
+                network = ipaddress.ip_network(str(cidr), strict=False)
+            except ValueError as e:
+                raise ValueError(f'{branch}: {e}')
+            if not any(network.version == a.version and network.subnet_of(a) for a in allowed):
+                raise ValueError(f"{branch}: {network} is outside RFC 1918 and DISCOVERY['RANGES']")
+            total += network.num_addresses
+            networks.append(str(network))
+        parsed[branch] = networks
+    if total > get_config()['MAX_ADDRESSES']:
+        raise ValueError(f"{total} addresses exceed DISCOVERY['MAX_ADDRESSES'] ({get_config()['MAX_ADDRESSES']})")
+    return parsed
+
+
+def addresses(ranges):
+    """
+    (address, branch) for every host address of {branch: [CIDR, ...]}, each
+    address once. Where ranges overlap, the first range listed claims it.
+    """
+    seen = set()
+    for branch, cidrs in ranges.items():
+        for cidr in cidrs:
+            for address in ipaddress.ip_network(cidr, strict=False).hosts():
+                if address not in seen:
+                    seen.add(address)
+                    yield str(address), branch
+
+
+def model_for(sys_object_id, models):
+    """The Device.model of the longest matching sysObjectID prefix, and whether one matched."""
+    best = None
+    for prefix, model in models.items():
+        prefix = prefix.strip('.')
+        if sys_object_id == prefix or sys_object_id.startswith(prefix + '.'):
+            if best is None or len(prefix) > len(best[0]):
+                best = (prefix, model)
+    if best is None:
+        return sys_object_id[:100], False
+    return best[1], True
+
+
+class RateLimiter:
+    """Spaces out starts to at most `rate` per second across all workers."""
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self.next_start = 0
+
+    async def wait(self):
+        now = asyncio.get_running_loop().time()
+        start = max(now, self.next_start)
+        self.next_start = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+def _ping(address, timeout):
+    try:
+        return bool(ping(address, timeout=timeout))
+    except Exception as e:
+        logger.debug(f"Discovery ping of {address} failed: {e}")
+        return False
+
+
+async def _identify(address, community, config):
+    """{OID: value string} of the identity OIDs one agent answered, or None."""
+    oids = IDENTITY_OIDS
+    for _ in range(2):
+        error_indication, error_status, _, var_binds = await asyncsnmp.get(
+            address, getattr(settings, 'SNMP_PORT', 161), oids, community=community, version=config['SNMP_VERSION'],
+            timeout=config['TIMEOUT'], retries=config['RETRIES'],
+        )
+        if error_indication:
+            return None
+        if not error_status:
+            return {
+                str(oid): value.prettyPrint() for oid, value in var_binds
+                if not isinstance(value, (NoSuchObject, NoSuchInstance, EndOfMibView))
+            }
+        oids = IDENTITY_OIDS[:2]  # v1 agents reject the whole GET over an unknown serial OID
+    return None
+
+
+async def probe(address, config, executor=None):
+    """
+    (discovered device fields or None, answered ping) for one address. All
+    communities and the ping are tried at once; the first community that
+    answers wins.
+    """
+    loop = asyncio.get_running_loop()
+    pinged = loop.run_in_executor(executor, _ping, address, config['TIMEOUT']) if executor else None
+    communities = config['COMMUNITIES']
+    replies = await asyncio.gather(*(_identify(address, community, config) for community in communities))
+    answered = await pinged if pinged is not None else False
+
+    for community, values in zip(communities, replies):
+        if not values or SYS_OBJECT_ID not in values:
+            continue
+        model, profiled = model_for(values[SYS_OBJECT_ID], config['MODELS'])
+        serial = values.get(SERIAL_NUMBER, '').strip()
+        return {
+            'ip_address': address,
+            'serial_number': serial[:50] if serial else '',
+            'name': (values.get(SYS_NAME) or address)[:255],
+            'model': model,
+            'profiled': profiled,
+            'snmp_community': community,
+        }, answered
+    return None, answered
+
+
+def upsert(found):
+    """
+    Register or refresh a batch of discovered devices in one transaction.
+    Returns Counter(created=..., updated=..., skipped=...).
+    """
+    config = get_config()
+    counts = Counter()
+    serials = [record['serial_number'] for record in found if record['serial_number']]
+    by_ip = {device.ip_address: device for device in Device.objects.filter(ip_address__in=[r['ip_address'] for r in found])}
+    by_serial = {device.serial_number: device for device in Device.objects.filter(serial_number__in=serials)}
+
+    new, changed, claimed = [], {}, set()
+    for record in found:
+        serial = record['serial_number']
+        device = by_ip.get(record['ip_address']) or by_serial.get(serial)
+        owner = by_serial.get(serial)
+        if serial in claimed or (device is not None and owner is not None and owner.pk != device.pk):
+            logger.warning(f"Discovery: serial {serial} of {record['ip_address']} belongs to another device, skipped")
+            counts['skipped'] += 1
+            continue
+        if serial:
+            claimed.add(serial)
+
+        if device is None:
+            new.append(Device(
+                serial_number=serial or f"{PLACEHOLDER_SERIAL_PREFIX}{record['ip_address']}",
+                ip_address=record['ip_address'],
+                name=record['name'],
+                model=record['model'],
+                branch=record['branch'],
+                status='Up',
+                snmp_community=record['snmp_community'],
+                snmp_version=config['SNMP_VERSION'],
+            ))
+            continue
+        device.ip_address = record['ip_address']
+        device.status = 'Up'
+        if serial:
+            device.serial_number = serial
+        if record['profiled']:
+            device.model = record['model']
+        if device.snmp_version != '3':
+            device.snmp_community = record['snmp_community']
+        changed[device.pk] = device
+
+    with transaction.atomic():
+        Device.objects.bulk_create(new, batch_size=500)
+        Device.objects.bulk_update(
+            list(changed.values()), ['ip_address', 'serial_number', 'status', 'model', 'snmp_community'], batch_size=500
+        )
+    counts['created'] += len(new)
+    counts['updated'] += len(changed)
+    return counts
+
+
+async def sweep(ranges, config=None):
+    """
+    Probe every host address of {branch: [CIDR, ...]} and upsert the SNMP
+    agents found in batches. Returns the sweep's Counter.
+    """
+    config = config or get_config()
+    targets = addresses(ranges)
+    counts = Counter()
+    found = []
+    limiter = RateLimiter(config['RATE'])
+    executor = ThreadPoolExecutor(config['CONCURRENCY'], thread_name_prefix='discovery-ping') if config['ICMP'] else None
+
+    async def flush():
+        batch = list(found)
+        found.clear()
+        try:
+            counts.update(await sync_to_async(upsert)(batch))
+        except Exception as e:
+            logger.error(f"Discovery failed to register a batch of {len(batch)} devices: {e}")
+            counts['skipped'] += len(batch)
+
+    async def worker():
+        for address, branch in targets:  # Shared generator: each address goes to one worker
+            await limiter.wait()
+            counts['addresses'] += 1
+            try:
+                record, pinged = await probe(address, config, executor)
+            except Exception as e:
+                logger.debug(f"Discovery probe of {address} failed: {e}")
+                counts['errors'] += 1
+                continue
+            outcome = 'snmp' if record else 'icmp' if pinged else 'silent'
+            counts[outcome] += 1
+            metrics.DISCOVERY_ADDRESSES.inc(outcome=outcome)
+            if record:
+                record['branch'] = branch
+                found.append(record)
+                if len(found) >= config['BATCH_SIZE']:
+                    await flush()
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(config['CONCURRENCY'])))
+        if found:
+            await flush()
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=False)
+    return counts
+
+
+def discover(ranges=None):
+    """
+    Sweep `ranges` (default DISCOVERY['RANGES']) and return a summary of
+    addresses probed, hosts answering SNMP or only ICMP, and devices
+    created, updated or skipped.
+    """
+    ranges = parse_ranges(ranges if ranges is not None else get_config()['RANGES'])
+    started = time.perf_counter()
+    counts = asyncio.run(sweep(ranges))
+    summary = {key: counts.get(key, 0) for key in ('addresses', 'snmp', 'icmp', 'silent', 'errors', 'created', 'updated', 'skipped')}
+    summary['seconds'] = round(time.perf_counter() - started, 1)
+    logger.info(f"Discovery swept {summary['addresses']} addresses in {summary['seconds']}s: "
+                f"{summary['snmp']} SNMP agents ({summary['created']} new, {summary['updated']} updated, "
+                f"{summary['skipped']} skipped), {summary['icmp']} only answering ping")
+    return summary
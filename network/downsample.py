@@ -0,0 +1,110 @@
+# network/downsample.py
+"""
+Server-side downsampling for chart endpoints.
+
+lttb() implements Largest-Triangle-Three-Buckets (Steinarsson, 2013). The
+series keeps its first and last points. The rest is split into points - 2
+equal buckets, and from each bucket LTTB keeps the point that forms the
+largest triangle with the point kept from the previous bucket and the
+average of the next bucket. Peaks and dips survive, which plain decimation
+(every n-th sample) loses.
+
+Bucket bounds and next-bucket averages are computed for all buckets at once.
+Only the choice of point, which depends on the previous choice, loops over
+buckets: O(points) Python steps on top of O(n) NumPy work, so cost and payload
+are bounded by `points` however long the range is.
+"""
+import numpy as np
+
+DEFAULT_POINTS = 1000
+MAX_POINTS = 5000
+
+
+def parse_points(value, default=DEFAULT_POINTS):
+    """The points= query parameter, clamped to [3, MAX_POINTS]; None/'' -> default."""
+    if value in (None, ''):
+        return default
+    return min(max(int(value), 3), MAX_POINTS)
+
+
+def lttb(x, y, points):
+    """
+    Indices of the points of (x, y) to keep, at most `points` of them.
+    x must be sorted; NaNs in y must already be removed.
+    """
+    n = len(x)
+    if points >= n or points < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # Bucket edges over the interior points 1 .. n-2
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+    starts, ends = edges[:-1], edges[1:]
+
+    # Average of each bucket, plus the last point as the "next bucket" of the final one
+    sizes = ends - starts
+    x_avg = np.append(np.add.reduceat(x[:-1], starts) / sizes, x[-1])
+    y_avg = np.append(np.add.reduceat(y[:-1], starts) / sizes, y[-1])
+
+    selected = np.empty(points, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for bucket, (start, end) in enumerate(zip(starts.tolist(), ends.tolist())):
+        ax, ay = x[previous], y[previous]
+        cx, cy = x_avg[bucket + 1], y_avg[bucket + 1]
+        # Twice the triangle area; the constant factor doesn't change the argmax
+        areas = np.abs((ax - cx) * (y[start:end] - ay) - (ax - x[start:end]) * (cy - ay))
+        previous = start + int(areas.argmax())
+        selected[bucket + 1] = previous
+    return selected
+
+
+def downsample_series(timestamps, values, points):
+    """
+    LTTB one metric. NaN (missing) readings are dropped first.
+    Returns (timestamps, values) arrays.
+    """
+    present = ~np.isnan(values)
+    timestamps, values = timestamps[present], values[present]
+    keep = lttb(timestamps, values, points)
+    return timestamps[keep], values[keep]
+
+
+def downsample_columns(timestamps, columns, points):
+    """
+    LTTB each metric of a read_columns()-style (timestamps, {metric: values})
+    independently. Returns {metric: {'timestamps': [epoch ms], 'values': [...]}}.
+    """
+    result = {}
+    for metric, values in columns.items():
+        ts, vs = downsample_series(timestamps, np.asarray(values, dtype=np.float64), points)
+        result[metric] = {'timestamps': ts.tolist(), 'values': vs.tolist()}
+    return result
+
+
+def shared_indices(timestamps, columns, points):
+    """
+    Row indices for endpoints that return one row per timestamp: the union of
+    each metric's LTTB selection, so at most len(columns) * points rows.
+    """
+    if len(timestamps) <= points:
+        return np.arange(len(timestamps))
+    keep = []
+    for values in columns.values():
+        values = np.asarray(values, dtype=np.float64)
+        present = np.flatnonzero(~np.isnan(values))
+        keep.append(present[lttb(timestamps[present], values[present], points)])
+    return np.unique(np.concatenate(keep)) if keep else np.arange(0)
+
+
+def columns_from_rows(rows, metrics):
+    """
+    (timestamps, {metric: values}) arrays from values_list('timestamp', *metrics)
+    rows, with None stored as NaN.
+    """
+    rows = list(rows)
+    timestamps = np.array([int(row[0].timestamp() * 1000) for row in rows], dtype=np.int64)
+    matrix = np.array([row[1:] for row in rows], dtype=np.float64).reshape(len(rows), len(metrics))
+    return timestamps, {metric: matrix[:, i] for i, metric in enumerate(metrics)}
@@ -0,0 +1,202 @@
+# network/edge.py
+"""
+Standalone SNMP collector for small hosts near a branch.
+
+    python -m network.edge --server https://signalsync.example.com --token <token> --branch "Branch A"
+
+It imports neither Django nor the ORM. It needs only this file, network/asyncsnmp.py
+and pysnmp's protocol modules, so it starts in well under a second. The loop:
+
+1. Fetch the device assignment for its branches from the central server
+   (GET /network/api/collector/assignment/, see network/remote.py) and
+   re-fetch it every `refresh` seconds.
+2. Every `interval` seconds, GET each device's OIDs concurrently over one
+   UDP socket (network/asyncsnmp.py).
+3. POST the raw readings as one compact JSON batch to
+   /network/api/collector/results/. There the central server turns counters
+   into rates and hands the samples to ingest.
+
+Batches that can't be delivered are kept (up to --max-pending) and resent in
+order once the server is reachable again; batches it rejects as invalid are
+dropped. OIDs a device reports as nonexistent are reported back and dropped
+until the next assignment.
+"""
+import argparse
+import asyncio
+import collections
+import json
+import os
+import socket
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import logging
+from pysnmp.proto import rfc1902, rfc1905
+from . import asyncsnmp
+
+logger = logging.getLogger(__name__)
+
+ASSIGNMENT_PATH = '/network/api/collector/assignment/'
+RESULTS_PATH = '/network/api/collector/results/'
+NO_SUCH_NAME = 2  # SNMPv1 error-status for an unknown OID
+HTTP_TIMEOUT = 10
+RETRYABLE_STATUSES = (408, 429)  # 4xx replies worth resending the batch for
+
+
+def _to_json_value(value):
+    if isinstance(value, (rfc1902.Counter32, rfc1902.Counter64)):
+        return int(value)
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return str(value)
+
+
+class EdgeCollector:
+    def __init__(self, server, token, branches, name=None, port=161, concurrency=256, max_pending=100):
+        self.server = server.rstrip('/')
+        self.token = token
+        self.branches = branches
+        self.name = name or socket.gethostname()
+        self.port = port
+        self.concurrency = asyncio.Semaphore(concurrency)
+        self.pending = collections.deque(maxlen=max_pending)  # Undelivered batches, oldest first
+        self.assignment = None
+        self.assignment_fetched = 0
+        self.unsupported = []
+
+    def _request(self, method, path, body=None):
+        """Blocking HTTP call to the central server; returns the decoded JSON reply."""
+        request = urllib.request.Request(
+            self.server + path,
+            data=json.dumps(body, separators=(',', ':')).encode() if body is not None else None,
+            method=method,
+            headers={'Authorization': f'Bearer {self.token}', 'Content-Type': 'application/json'},
+        )
+        with urllib.request.urlopen(request, timeout=HTTP_TIMEOUT) as reply:
+            return json.loads(reply.read())
+
+    async def refresh_assignment(self):
+        query = urllib.parse.urlencode([('branch', branch) for branch in self.branches])
+        try:
+            assignment = await asyncio.to_thread(self._request, 'GET', f'{ASSIGNMENT_PATH}?{query}')
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            logger.error(f"Failed to fetch device assignment: {e}")
+            return
+        if set(assignment['branches']) != set(self.branches):
+            logger.warning(f"Server only assigned branches {assignment['branches']} of {self.branches}")
+        self.assignment = assignment
+        self.assignment_fetched = time.monotonic()
+        logger.info(f"Assigned {len(assignment['devices'])} devices")
+
+    async def poll_device(self, device):
+        """
+        One GET for all of a device's OIDs.
+        Returns [device id, epoch ms, {oid: value} or None, [Counter32 OIDs]].
+        """
+        oids = list(device['oids'])
+        values, counter32 = {}, []
+        async with self.concurrency:
+            while oids:
+                errorIndication, errorStatus, errorIndex, varBinds = await asyncsnmp.get(
+                    device['address'], self.port, oids, device['community'], device['version'],
+                    self.assignment['timeout'], self.assignment['retries'],
+                )
+                if errorIndication:
+                    return [device['id'], int(time.time() * 1000), None, []]
+                if errorStatus:
+                    if int(errorStatus) == NO_SUCH_NAME and errorIndex and int(errorIndex) <= len(oids):
+                        self._drop(device, oids.pop(int(errorIndex) - 1))
+                        continue
+                    logger.error(f"SNMP Error for {device['address']}: {errorStatus.prettyPrint()}")
+                    return [device['id'], int(time.time() * 1000), None, []]
+                for oid, (_, value) in zip(oids, varBinds):
+                    if isinstance(value, (rfc1905.NoSuchObject, rfc1905.NoSuchInstance, rfc1905.EndOfMibView)):
+                        self._drop(device, oid)
+                        continue
+                    values[oid] = _to_json_value(value)
+                    if isinstance(value, rfc1902.Counter32):
+                        counter32.append(oid)
+                break
+        return [device['id'], int(time.time() * 1000), values, counter32]
+
+    def _drop(self, device, oid):
+        """Stop requesting an OID the device doesn't have and tell the server."""
+        if oid in device['oids']:
+            device['oids'].remove(oid)
+        self.unsupported.append([device['id'], oid])
+
+    async def poll_cycle(self):
+        devices = [device for device in self.assignment['devices'] if device['oids']]
+        samples = await asyncio.gather(*(self.poll_device(device) for device in devices))
+        batch = {'collector': self.name, 'samples': samples, 'unsupported': self.unsupported}
+        self.unsupported = []
+        self.pending.append(batch)
+        return len(samples), sum(1 for sample in samples if sample[2] is None)
+
+    async def ship(self):
+        """
+        Send pending batches in order; stop at the first failure and retry next
+        cycle. A batch the server rejects (4xx other than 408/429) would be
+        rejected again, so it is logged and dropped instead.
+        """
+        while self.pending:
+            try:
+                await asyncio.to_thread(self._request, 'POST', RESULTS_PATH, self.pending[0])
+            except urllib.error.HTTPError as e:
+                if 400 <= e.code < 500 and e.code not in RETRYABLE_STATUSES:
+                    batch = self.pending.popleft()
+                    logger.error(f"Server rejected a batch of {len(batch['samples'])} samples, dropping it: {e}")
+                    continue
+                logger.error(f"Failed to ship results ({len(self.pending)} batches pending): {e}")
+                return
+            except (urllib.error.URLError, OSError, ValueError) as e:
+                logger.error(f"Failed to ship results ({len(self.pending)} batches pending): {e}")
+                return
+            self.pending.popleft()
+
+    async def run(self, cycles=None):
+        while self.assignment is None:
+            await self.refresh_assignment()
+            if self.assignment is None:
+                await asyncio.sleep(5)
+
+        completed = 0
+        while cycles is None or completed < cycles:
+            started = time.monotonic()
+            if started - self.assignment_fetched > self.assignment['refresh']:
+                await self.refresh_assignment()
+            polled, unanswered = await self.poll_cycle()
+            await self.ship()
+            elapsed = time.monotonic() - started
+            logger.info(f"Polled {polled} devices ({unanswered} unanswered) in {elapsed:.2f}s")
+            completed += 1
+            await asyncio.sleep(max(self.assignment['interval'] - elapsed, 0))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Standalone SignalSync SNMP collector.')
+    parser.add_argument('--server', default=os.getenv('SIGNALSYNC_SERVER', 'http://localhost:8000'))
+    parser.add_argument('--token', default=os.getenv('COLLECTOR_REMOTE_TOKEN', ''))
+    parser.add_argument('--branch', action='append', required=True, help='Branch to poll (repeatable)')
+    parser.add_argument('--name', help='Collector name reported to the server (default: hostname)')
+    parser.add_argument('--snmp-port', type=int, default=int(os.getenv('SNMP_PORT', 161)))
+    parser.add_argument('--concurrency', type=int, default=256, help='Devices queried at once')
+    parser.add_argument('--max-pending', type=int, default=100, help='Undelivered batches kept while the server is down')
+    parser.add_argument('--cycles', type=int, help='Stop after this many poll cycles')
+    parser.add_argument('--log-level', default='INFO')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=args.log_level, format='%(asctime)s %(levelname)s %(message)s')
+    collector = EdgeCollector(
+        args.server, args.token, args.branch, args.name, args.snmp_port, args.concurrency, args.max_pending
+    )
+    try:
+        asyncio.run(collector.run(args.cycles))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
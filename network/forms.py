@@ -10,9 +10,21 @@ class DeviceForm(forms.ModelForm):
     """
     class Meta:
         model = Device
-        fields = ['serial_number', 'ip_address', 'name', 'model', 'branch', 'snmp_community', 'snmp_version']
+        fields = [
+            'serial_number', 'ip_address', 'name', 'model', 'branch', 'snmp_community', 'snmp_version',
+            'snmp_v3_username', 'snmp_v3_auth_protocol', 'snmp_v3_auth_key', 'snmp_v3_priv_protocol', 'snmp_v3_priv_key',
+        ]
         widgets = {
             'snmp_version': forms.Select(choices=[('1', 'SNMP v1'), ('2c', 'SNMP v2c'), ('3', 'SNMP v3')]),
+            'snmp_v3_auth_key': forms.PasswordInput(),
+            'snmp_v3_priv_key': forms.PasswordInput(),
+        }
+        labels = {
+            'snmp_v3_username': 'SNMPv3 username',
+            'snmp_v3_auth_protocol': 'SNMPv3 auth protocol',
+            'snmp_v3_auth_key': 'SNMPv3 auth passphrase',
+            'snmp_v3_priv_protocol': 'SNMPv3 privacy protocol',
+            'snmp_v3_priv_key': 'SNMPv3 privacy passphrase',
         }
 
     def __init__(self, *args, **kwargs):
@@ -33,3 +45,24 @@ class DeviceForm(forms.ModelForm):
         except ValueError:
             raise forms.ValidationError("Invalid IP address format. Please enter a valid IPv4 or IPv6 address.")
         return ip_address
+
+    def clean_snmp_v3_auth_key(self):
+        # Passphrases aren't rendered back, so a blank field keeps the stored one
+        return self.cleaned_data.get('snmp_v3_auth_key') or self.instance.snmp_v3_auth_key
+
+    def clean_snmp_v3_priv_key(self):
+        return self.cleaned_data.get('snmp_v3_priv_key') or self.instance.snmp_v3_priv_key
+
+    def clean(self):
+        """
+        SNMPv3 devices need a username, and passphrases of at least 8 characters (RFC 3414).
+        """
+        cleaned_data = super().clean()
+        if cleaned_data.get('snmp_version') == '3':
+            if not cleaned_data.get('snmp_v3_username'):
+                self.add_error('snmp_v3_username', 'A username is required for SNMP v3.')
+            for field in ('snmp_v3_auth_key', 'snmp_v3_priv_key'):
+                key = cleaned_data.get(field)
+                if key and len(key) < 8:
+                    self.add_error(field, 'SNMP v3 passphrases must be at least 8 characters.')
+        return cleaned_data
@@ -0,0 +1,299 @@
+# network/ingest.py
+"""
+Write-behind ingest buffer between the pollers and the database.
+
+Pollers call submit() with one sample per device and return straight to SNMP
+collection. When settings.INGEST['ENABLED'] is set, samples are appended to a
+Redis Stream (or a local SQLite-backed queue) and the drain_ingest_buffer task
+writes them in large batched transactions. Delivery is at-least-once: entries
+are only acknowledged after the batch commits, and writes are idempotent on
+(device, timestamp), so replaying a batch is harmless.
+
+With the buffer disabled, submit() writes the sample immediately.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import logging
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from django.db import transaction
+from .models import Device, DeviceAlert, DeviceStats
+from .routers import TIMESERIES_DB
+from . import rangecache, recent, tsstore, metrics, stream
+
+logger = logging.getLogger(__name__)
+
+METRICS = ('cpu_usage', 'temperature', 'latency', 'bandwidth')
+
+
+def get_config():
+    return getattr(settings, 'INGEST', {})
+
+
+def make_sample(device_id, timestamp, values, status=None, alert_triggered=False, alert_message=''):
+    """
+    Build the JSON-serializable sample dict carried through the buffer.
+    """
+    sample = {
+        'device_id': device_id,
+        'timestamp': tsstore.to_epoch_ms(timestamp),
+        'alert_triggered': alert_triggered,
+        'alert_message': alert_message,
+    }
+    for metric in METRICS:
+        sample[metric] = values.get(metric)
+    if status is not None:
+        sample['status'] = status
+    return sample
+
+
+def write_samples(samples):
+    """
+    Persist a batch of samples: one bulk insert into DeviceStats (duplicates of
+    an existing (device, timestamp) are ignored), one into DeviceAlert for the
+    samples that raised an alert, and one bulk update of the latest values on
+    each Device.
+    """
+    if not samples:
+        return 0
+
+    rows = []
+    alerts = []
+    latest = {}
+    for sample in samples:
+        timestamp = datetime.fromtimestamp(sample['timestamp'] / 1000, tz=dt_timezone.utc)
+        rows.append(DeviceStats(
+            device_id=sample['device_id'],
+            timestamp=timestamp,
+            **{metric: sample.get(metric) for metric in METRICS}
+        ))
+        if sample.get('alert_triggered'):
+            alerts.append(DeviceAlert(
+                device_id=sample['device_id'], timestamp=timestamp, message=sample.get('alert_message', '')
+            ))
+        current = latest.get(sample['device_id'])
+        if current is None or sample['timestamp'] >= current[0]['timestamp']:
+            latest[sample['device_id']] = (sample, timestamp)
+
+    with transaction.atomic(using=TIMESERIES_DB):
+        DeviceStats.objects.bulk_create(rows, batch_size=500, ignore_conflicts=True)
+        if alerts:
+            DeviceAlert.objects.bulk_create(alerts, batch_size=500, ignore_conflicts=True)
+    # Late samples (e.g. a backlogged edge collector) change chunks the range cache treats as closed
+    closed = rangecache.closed_before()
+    rangecache.invalidate({sample['device_id'] for sample in samples if sample['timestamp'] < closed})
+
+    devices = Device.objects.in_bulk(list(latest))
+    update_fields = set(METRICS) | {'last_updated'}
+    for device_id, (sample, timestamp) in latest.items():
+        device = devices.get(device_id)
+        if device is None:
+            continue
+        for metric in METRICS:
+            setattr(device, metric, sample.get(metric))
+        device.last_updated = timestamp
+        if 'status' in sample:
+            device.status = sample['status']
+            update_fields.add('status')
+    with transaction.atomic():
+        Device.objects.bulk_update(list(devices.values()), sorted(update_fields), batch_size=500)
+
+    for sample in samples:
+        store_values = {metric: sample.get(metric) for metric in METRICS}
+        tsstore.record(sample['device_id'], datetime.fromtimestamp(sample['timestamp'] / 1000, tz=dt_timezone.utc), store_values)
+    tsstore.flush()
+    recent.record(samples)
+    stream.publish(samples, {device_id: device.branch for device_id, device in devices.items()})
+
+    return len(rows)
+
+
+class RedisStreamBuffer:
+    """
+    Ingest buffer backed by a Redis Stream and a consumer group.
+    """
+    def __init__(self, config):
+        import redis
+        self.client = redis.Redis.from_url(config.get('REDIS_URL', settings.CELERY_BROKER_URL))
+        self.stream = config.get('STREAM', 'signalsync:ingest')
+        self.group = config.get('GROUP', 'ingest')
+        self.consumer = f"{os.uname().nodename}-{os.getpid()}"
+        self.max_length = config.get('MAX_LENGTH', 1_000_000)
+        self.claim_idle_ms = int(config.get('CLAIM_IDLE_SECONDS', 60) * 1000)
+        self._group_ready = False
+
+    def _ensure_group(self):
+        if self._group_ready:
+            return
+        import redis
+        try:
+            self.client.xgroup_create(self.stream, self.group, id='0', mkstream=True)
+        except redis.ResponseError as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+        self._group_ready = True
+
+    def put(self, samples):
+        pipe = self.client.pipeline(transaction=False)
+        for sample in samples:
+            pipe.xadd(self.stream, {'data': json.dumps(sample)}, maxlen=self.max_length, approximate=True)
+        pipe.execute()
+
+    def take(self, count):
+        """
+        Return up to count (entry_id, sample) pairs: first entries another
+        consumer claimed but never acknowledged, then new ones.
+        """
+        self._ensure_group()
+        _, entries, *_ = self.client.xautoclaim(
+            self.stream, self.group, self.consumer, min_idle_time=self.claim_idle_ms, start_id='0-0', count=count
+        )
+        if len(entries) < count:
+            response = self.client.xreadgroup(self.group, self.consumer, {self.stream: '>'}, count=count - len(entries))
+            for _, new_entries in response or []:
+                entries.extend(new_entries)
+        return [(entry_id, json.loads(fields[b'data'])) for entry_id, fields in entries if fields]
+
+    def ack(self, entry_ids):
+        if entry_ids:
+            pipe = self.client.pipeline(transaction=False)
+            pipe.xack(self.stream, self.group, *entry_ids)
+            pipe.xdel(self.stream, *entry_ids)
+            pipe.execute()
+
+    def lag(self):
+        """Number of samples waiting to be written."""
+        self._ensure_group()
+        for group in self.client.xinfo_groups(self.stream):
+            if group['name'].decode() == self.group:
+                return (group.get('lag') or 0) + group.get('pending', 0)
+        return 0
+
+
+class LocalQueueBuffer:
+    """
+    Durable single-host ingest buffer stored in a local SQLite file.
+    Claimed entries become visible again if they aren't acknowledged in time.
+    """
+    def __init__(self, config):
+        self.path = str(config.get('LOCAL_PATH', settings.BASE_DIR / 'ingest_queue.sqlite3'))
+        self.claim_idle = config.get('CLAIM_IDLE_SECONDS', 60)
+        self._local = threading.local()
+
+    @property
+    def db(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS queue '
+                '(id INTEGER PRIMARY KEY AUTOINCREMENT, data TEXT NOT NULL, claimed_at REAL)'
+            )
+            self._local.conn = conn
+        return conn
+
+    def _execute_many(self, sql, params):
+        db = self.db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            db.executemany(sql, params)
+            db.execute('COMMIT')
+        except Exception:
+            db.execute('ROLLBACK')
+            raise
+
+    def put(self, samples):
+        self._execute_many('INSERT INTO queue (data) VALUES (?)', [(json.dumps(s),) for s in samples])
+
+    def take(self, count):
+        now = time.time()
+        db = self.db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            rows = db.execute(
+                'SELECT id, data FROM queue WHERE claimed_at IS NULL OR claimed_at < ? ORDER BY id LIMIT ?',
+                (now - self.claim_idle, count)
+            ).fetchall()
+            db.executemany('UPDATE queue SET claimed_at = ? WHERE id = ?', [(now, row[0]) for row in rows])
+            db.execute('COMMIT')
+        except Exception:
+            db.execute('ROLLBACK')
+            raise
+        return [(row[0], json.loads(row[1])) for row in rows]
+
+    def ack(self, entry_ids):
+        if entry_ids:
+            self._execute_many('DELETE FROM queue WHERE id = ?', [(entry_id,) for entry_id in entry_ids])
+
+    def lag(self):
+        return self.db.execute('SELECT COUNT(*) FROM queue').fetchone()[0]
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    """
+    Return the process-wide ingest buffer, or None when write-behind is disabled.
+    """
+    global _buffer
+    config = get_config()
+    if not config.get('ENABLED'):
+        return None
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                backend = config.get('BACKEND', 'redis')
+                _buffer = LocalQueueBuffer(config) if backend == 'local' else RedisStreamBuffer(config)
+    return _buffer
+
+
+def submit(samples):
+    """
+    Hand a list of samples (see make_sample) to the ingest pipeline.
+    Falls back to a direct write if the buffer can't be reached, so a buffer
+    outage degrades to the old behaviour instead of losing data.
+    """
+    buffer = get_buffer()
+    if buffer is not None:
+        try:
+            buffer.put(samples)
+            return
+        except Exception as e:
+            logger.error(f"Ingest buffer unavailable, writing {len(samples)} samples directly: {e}")
+    write_samples(samples)
+
+
+def drain(max_batches=None):
+    """
+    Write buffered samples in batches of INGEST['BATCH_SIZE'] until the buffer
+    is empty (or max_batches is reached). Returns the number of samples written.
+    """
+    buffer = get_buffer()
+    if buffer is None:
+        return 0
+    batch_size = get_config().get('BATCH_SIZE', 1000)
+    written = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        entries = buffer.take(batch_size)
+        if not entries:
+            break
+        samples = [sample for _, sample in entries]
+        write_samples(samples)
+        buffer.ack([entry_id for entry_id, _ in entries])
+        metrics.INGEST_BATCH_SIZE.observe(len(samples))
+        oldest = min(sample['timestamp'] for sample in samples)
+        metrics.INGEST_LAG_SECONDS.observe(max(time.time() - oldest / 1000, 0))
+        written += len(entries)
+        batches += 1
+        if len(entries) < batch_size:
+            break
+    metrics.INGEST_BACKLOG.set(buffer.lag())
+    return written
@@ -0,0 +1,389 @@
+# network/metrics.py
+"""
+Low-overhead Prometheus-format metrics for the poller, ingest pipeline and
+WebSocket layer.
+
+Each process updates plain dicts in memory, and a daemon thread pushes the
+deltas to Redis hashes (one per metric) every FLUSH_INTERVAL seconds, so
+counters and histograms from every Celery worker and web process add up and
+inc()/observe() never wait on Redis, not even inside async consumers. Gauges
+are last-writer-wins across processes; they are only used for global values
+(queue depths, backlog) that any process measures the same. The /metrics
+view renders the merged values from Redis, or this process' own values when
+Redis isn't configured or can't be reached.
+
+Labels include device IP addresses, so /metrics requires either a staff
+session or "Authorization: Bearer <METRICS['TOKEN']>".
+"""
+import bisect
+import hmac
+import os
+import threading
+import time
+import logging
+from django.conf import settings
+from django.http import HttpResponse
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'signalsync:metrics:'
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def get_config():
+    return getattr(settings, 'METRICS', {})
+
+
+def _format_value(value):
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def _label_string(labels):
+    """Render label pairs in Prometheus exposition syntax (also used as the Redis hash field)."""
+    if not labels:
+        return ''
+    parts = []
+    for name, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{name}="{value}"')
+    return ','.join(parts)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, registry, name, documentation, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}  # unflushed deltas, keyed by Redis hash field
+        self._local = {}  # cumulative values for this process
+
+    def _key(self, labels):
+        return _label_string(tuple((name, labels.get(name, '')) for name in self.labelnames))
+
+    def _add(self, field, amount):
+        self._values[field] = self._values.get(field, 0) + amount
+        self._local[field] = self._local.get(field, 0) + amount
+
+    def drain(self):
+        values, self._values = self._values, {}
+        return values
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        with self.registry.lock:
+            self._add(self._key(labels), amount)
+        self.registry.maybe_flush()
+
+
+class Gauge(Metric):
+    """
+    A value stored with HSET, so the process that flushed last wins. Only
+    use it for global measurements, not per-process state.
+    """
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        field = self._key(labels)
+        with self.registry.lock:
+            self._values[field] = value
+            self._local[field] = value
+        self.registry.maybe_flush()
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.registry.lock:
+            # Buckets are stored non-cumulatively and summed up when rendering
+            le = self.buckets[index] if index < len(self.buckets) else '+Inf'
+            self._add(f'{key}|{le}', 1)
+            self._add(f'{key}|sum', value)
+            self._add(f'{key}|count', 1)
+        self.registry.maybe_flush()
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+class Registry:
+    """
+    Holds metric definitions and pushes their deltas to Redis from a daemon
+    thread every METRICS['FLUSH_INTERVAL'] seconds.
+    """
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+        self.collectors = []  # callables run before rendering, e.g. to sample queue depths
+        self._flusher_pid = None  # Threads don't survive fork, so each worker starts its own
+        self._redis = None
+
+    def _register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(self, name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def collector(self, func):
+        """Register a function called on every scrape (used as a decorator)."""
+        self.collectors.append(func)
+        return func
+
+    @property
+    def redis(self):
+        url = get_config().get('REDIS_URL')
+        if not url:
+            return None
+        if self._redis is None:
+            import redis
+            self._redis = redis.Redis.from_url(url, socket_timeout=1)
+        return self._redis
+
+    def maybe_flush(self):
+        """Start this process' flusher thread if it isn't running yet."""
+        if self._flusher_pid == os.getpid():
+            return
+        with self.lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+        threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True).start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(get_config().get('FLUSH_INTERVAL', 5))
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Metrics flush failed: {e}")
+
+    def flush(self):
+        """Push unflushed deltas to Redis. Failures are logged and the deltas dropped."""
+        client = self.redis
+        with self.lock:
+            pending = [(metric, metric.drain()) for metric in self.metrics.values()]
+        if client is None:
+            return
+        try:
+            pipe = client.pipeline(transaction=False)
+            for metric, values in pending:
+                key = KEY_PREFIX + metric.name
+                for field, value in values.items():
+                    if metric.kind == 'gauge':
+                        pipe.hset(key, field, value)
+                    else:
+                        pipe.hincrbyfloat(key, field, value)
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to push metrics to Redis: {e}")
+
+    def _merged_values(self):
+        client = self.redis
+        if client is None:
+            return {name: dict(metric._local) for name, metric in self.metrics.items()}
+        import redis
+        try:
+            pipe = client.pipeline(transaction=False)
+            for name in self.metrics:
+                pipe.hgetall(KEY_PREFIX + name)
+            results = pipe.execute()
+        except (redis.exceptions.RedisError, OSError) as e:
+            logger.error(f"Failed to read metrics from Redis, rendering this process' values: {e}")
+            return {name: dict(metric._local) for name, metric in self.metrics.items()}
+        return {
+            name: {field.decode(): float(value) for field, value in result.items()}
+            for name, result in zip(self.metrics, results)
+        }
+
+    def render(self):
+        """Return all metrics in Prometheus text exposition format."""
+        for collect in self.collectors:
+            try:
+                collect()
+            except Exception as e:
+                logger.error(f"Metrics collector {collect.__name__} failed: {e}")
+        self.flush()
+
+        lines = []
+        for name, values in self._merged_values().items():
+            metric = self.metrics[name]
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            if metric.kind != 'histogram':
+                for labels, value in sorted(values.items()):
+                    lines.append(f'{name}{{{labels}}} {_format_value(value)}' if labels else f'{name} {_format_value(value)}')
+                continue
+
+            series = {}
+            for field, value in values.items():
+                labels, _, part = field.rpartition('|')
+                series.setdefault(labels, {})[part] = value
+            for labels, parts in sorted(series.items()):
+                prefix = f'{labels},' if labels else ''
+                cumulative = 0
+                for le in metric.buckets:
+                    cumulative += parts.get(str(le), 0)
+                    lines.append(f'{name}_bucket{{{prefix}le="{le}"}} {_format_value(cumulative)}')
+                cumulative += parts.get('+Inf', 0)
+                lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {_format_value(cumulative)}')
+                suffix = f'{{{labels}}}' if labels else ''
+                lines.append(f'{name}_sum{suffix} {_format_value(parts.get("sum", 0))}')
+                lines.append(f'{name}_count{suffix} {_format_value(parts.get("count", 0))}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+# Poller
+POLL_CYCLE_SECONDS = registry.histogram(
+    'signalsync_poll_cycle_seconds', 'Duration of a full polling cycle.', ['task'],
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1200),
+)
+SNMP_RTT_SECONDS = registry.histogram(
+    'signalsync_snmp_rtt_seconds', 'Round-trip time of successful SNMP GETs.', ['device', 'oid'],
+)
+SNMP_FAILURES = registry.counter(
+    'signalsync_snmp_failures_total', 'Failed SNMP GETs by device, model and kind (timeout or error).',
+    ['device', 'model', 'kind'],
+)
+SNMP_TIMEOUT_SAVED_SECONDS = registry.counter(
+    'signalsync_snmp_timeout_saved_seconds_total',
+    'Wait on timed-out GETs saved (or added, direction="extra") by adaptive timeouts versus the fixed timeout.',
+    ['direction'],
+)
+SNMP_SLOW_REPLIES = registry.counter(
+    'signalsync_snmp_slow_replies_total', 'Replies slower than the fixed timeout, which it would have dropped.',
+)
+REMOTE_SAMPLES = registry.counter(
+    'signalsync_remote_samples_total', 'Samples received from standalone collectors.', ['collector'],
+)
+BREAKER_TRANSITIONS = registry.counter(
+    'signalsync_breaker_transitions_total', 'Device circuit breakers opened or closed.', ['state'],
+)
+BREAKER_SKIPPED_POLLS = registry.counter(
+    'signalsync_breaker_skipped_polls_total', 'Polls skipped because the breaker was open and no probe was due.',
+)
+
+DISCOVERY_ADDRESSES = registry.counter(
+    'signalsync_discovery_addresses_total', 'Addresses probed by subnet discovery, by what answered (snmp, icmp, silent).',
+    ['outcome'],
+)
+
+# Ingest
+INGEST_BATCH_SIZE = registry.histogram(
+    'signalsync_ingest_batch_size', 'Samples written per ingest batch.',
+    buckets=(1, 10, 50, 100, 250, 500, 1000, 2500, 5000),
+)
+INGEST_LAG_SECONDS = registry.histogram(
+    'signalsync_ingest_lag_seconds', 'Age of the oldest sample in each ingest batch when it was written.',
+    buckets=(0.1, 0.5, 1, 2, 5, 10, 30, 60, 300),
+)
+INGEST_BACKLOG = registry.gauge(
+    'signalsync_ingest_backlog', 'Samples waiting in the ingest buffer.',
+)
+
+# Historical queries
+RANGE_CACHE_CHUNKS = registry.counter(
+    'signalsync_range_cache_chunks_total', 'Range-query chunks served from the cache (hit) or computed (miss).',
+    ['result'],
+)
+
+# WebSocket layer
+WEBSOCKET_FANOUT_SECONDS = registry.histogram(
+    'signalsync_websocket_fanout_seconds', 'Delay between publishing a stats update and sending it to a client.',
+)
+WEBSOCKET_UPDATES = registry.counter(
+    'signalsync_websocket_updates_total',
+    'Device rows sent to WebSocket clients, replaced by a newer row or snapshot before sending (conflated), '
+    'or discarded unsent on disconnect or resubscribe (dropped).',
+    ['outcome'],
+)
+WEBSOCKET_MISSED_DELTAS = registry.counter(
+    'signalsync_websocket_missed_deltas_total', 'Deltas a client missed in the channel layer and had replayed.',
+)
+CHANNEL_LAYER_QUEUE_DEPTH = registry.gauge(
+    'signalsync_channel_layer_queue_depth', 'Messages waiting in channel-layer queues (total and deepest channel).',
+    ['stat'],
+)
+
+
+_channel_layer_clients = {}  # channel-layer host -> Redis client, reused across scrapes
+
+
+@registry.collector
+def collect_channel_layer_depth():
+    """
+    Sample channel-layer queue depth from Redis. channels_redis stores each
+    channel's pending messages in a sorted set under the layer prefix.
+    """
+    layer = getattr(settings, 'CHANNEL_LAYERS', {}).get('default', {})
+    if 'redis' not in layer.get('BACKEND', '').lower():
+        return
+    import redis
+    config = layer.get('CONFIG', {})
+    host = config.get('hosts', [('127.0.0.1', 6379)])[0]
+    client = _channel_layer_clients.get(repr(host))
+    if client is None:
+        client = redis.Redis.from_url(host, socket_timeout=1) if isinstance(host, str) else redis.Redis(*host, socket_timeout=1)
+        _channel_layer_clients[repr(host)] = client
+    prefix = config.get('prefix', 'asgi')
+    keys = list(client.scan_iter(match=f'{prefix}*', count=1000, _type='zset'))
+    pipe = client.pipeline(transaction=False)
+    for key in keys:
+        pipe.zcard(key)
+    depths = pipe.execute() if keys else []
+    CHANNEL_LAYER_QUEUE_DEPTH.set(sum(depths), stat='total')
+    CHANNEL_LAYER_QUEUE_DEPTH.set(max(depths, default=0), stat='max')
+
+
+def _authorized(request):
+    """A staff session or the configured bearer token."""
+    if request.user.is_authenticated and request.user.is_staff:
+        return True
+    token = get_config().get('TOKEN')
+    scheme, _, credentials = request.headers.get('Authorization', '').partition(' ')
+    return bool(token) and scheme.lower() == 'bearer' and hmac.compare_digest(credentials.strip(), token)
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint.
+    """
+    if not _authorized(request):
+        response = HttpResponse('Authentication required\n', status=401, content_type='text/plain')
+        response['WWW-Authenticate'] = 'Bearer realm="metrics"'
+        return response
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,19 @@
+# Generated by Django 5.1 on 2026-10-19 09:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network', '0007_alter_notificationpreference_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='devicestats',
+            name='device',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='stats', to='network.device'),
+        ),
+    ]
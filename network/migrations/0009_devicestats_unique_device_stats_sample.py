@@ -0,0 +1,34 @@
+# Generated by Django 5.1 on 2026-10-19 10:00
+
+from django.db import migrations, models
+
+
+def remove_duplicate_samples(apps, schema_editor):
+    """Keep the first row of any (device, timestamp) duplicates before adding the constraint."""
+    DeviceStats = apps.get_model('network', 'DeviceStats')
+    db_alias = schema_editor.connection.alias
+    seen = set()
+    duplicate_ids = []
+    for pk, device_id, timestamp in DeviceStats.objects.using(db_alias).order_by('id').values_list('id', 'device_id', 'timestamp').iterator():
+        key = (device_id, timestamp)
+        if key in seen:
+            duplicate_ids.append(pk)
+        else:
+            seen.add(key)
+    for start in range(0, len(duplicate_ids), 500):
+        DeviceStats.objects.using(db_alias).filter(id__in=duplicate_ids[start:start + 500]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network', '0008_devicestats_device_no_db_constraint'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_samples, migrations.RunPython.noop, hints={'model_name': 'devicestats'}),
+        migrations.AddConstraint(
+            model_name='devicestats',
+            constraint=models.UniqueConstraint(fields=('device', 'timestamp'), name='unique_device_stats_sample'),
+        ),
+    ]
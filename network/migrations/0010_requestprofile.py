@@ -0,0 +1,34 @@
+# Generated by Django 5.1 on 2026-10-19 12:53
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network', '0009_devicestats_unique_device_stats_sample'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('request', 'Request'), ('task', 'Celery task')], default='request', max_length=10)),
+                ('name', models.CharField(max_length=255)),
+                ('method', models.CharField(blank=True, max_length=10)),
+                ('status_code', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('timestamp', models.DateTimeField(default=django.utils.timezone.now)),
+                ('wall_ms', models.FloatField()),
+                ('sql_ms', models.FloatField()),
+                ('query_count', models.PositiveIntegerField()),
+                ('n_plus_one', models.BooleanField(default=False)),
+                ('duplicate_queries', models.JSONField(default=list)),
+            ],
+            options={
+                'ordering': ['-wall_ms'],
+                'indexes': [models.Index(fields=['timestamp'], name='network_req_timesta_82df0e_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1 on 2026-10-19 12:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network', '0010_requestprofile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='device',
+            name='snmp_v3_auth_key',
+            field=models.CharField(blank=True, max_length=128),
+        ),
+        migrations.AddField(
+            model_name='device',
+            name='snmp_v3_auth_protocol',
+            field=models.CharField(choices=[('none', 'None'), ('MD5', 'MD5'), ('SHA', 'SHA'), ('SHA224', 'SHA-224'), ('SHA256', 'SHA-256'), ('SHA384', 'SHA-384'), ('SHA512', 'SHA-512')], default='SHA', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='device',
+            name='snmp_v3_priv_key',
+            field=models.CharField(blank=True, max_length=128),
+        ),
+        migrations.AddField(
+            model_name='device',
+            name='snmp_v3_priv_protocol',
+            field=models.CharField(choices=[('none', 'None'), ('DES', 'DES'), ('3DES', '3DES'), ('AES', 'AES-128'), ('AES192', 'AES-192'), ('AES256', 'AES-256')], default='AES', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='device',
+            name='snmp_v3_username',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1 on 2026-10-19 13:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network', '0011_device_snmp_v3_credentials'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='device',
+            name='breaker_failures',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='device',
+            name='breaker_next_probe',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='device',
+            name='breaker_opened_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,209 @@
+# Generated by Django 5.1 on 2026-10-19 13:30
+
+import django.db.models.deletion
+import django.utils.timezone
+import network.models
+from django.core.management.color import no_style
+from django.db import migrations, models, transaction
+from django.db.migrations.loader import MigrationLoader
+
+LEGACY_TABLE = 'network_devicestats'
+NEW_TABLE = 'network_devicestats_new'
+OLD_TABLE = 'network_devicestats_old'
+PREVIOUS_MIGRATION = ('network', '0012_device_circuit_breaker')
+BATCH_SIZE = 10000
+METRICS = ('cpu_usage', 'temperature', 'latency', 'bandwidth')
+
+
+def _copy_rows(cursor, quote, first_id, last_id, alert_table):
+    """Copy legacy rows first_id < id <= last_id into the new table, and their alerts into DeviceAlert."""
+    columns = ', '.join(quote(column) for column in ('id', 'device_id', 'timestamp') + METRICS)
+    cursor.execute(
+        f'INSERT INTO {quote(NEW_TABLE)} ({columns}) SELECT {columns} FROM {quote(LEGACY_TABLE)} '
+        f'WHERE {quote("id")} > %s AND {quote("id")} <= %s',
+        [first_id, last_id],
+    )
+    cursor.execute(
+        f'INSERT INTO {quote(alert_table)} ({quote("device_id")}, {quote("timestamp")}, {quote("message")}) '
+        f'SELECT {quote("device_id")}, {quote("timestamp")}, {quote("alert_message")} FROM {quote(LEGACY_TABLE)} '
+        f'WHERE {quote("alert_triggered")} = %s AND {quote("id")} > %s AND {quote("id")} <= %s',
+        [True, first_id, last_id],
+    )
+
+
+def rebuild_devicestats(apps, schema_editor):
+    """
+    Build the slim DeviceStats table next to the legacy one and copy the rows
+    over in batches, each in its own short transaction, so pollers keep
+    writing to the legacy table meanwhile. Only the final catch-up, the drop
+    and the rename share one transaction.
+    """
+    DeviceStats = apps.get_model('network', 'DeviceStats')
+    DeviceAlert = apps.get_model('network', 'DeviceAlert')
+    connection = schema_editor.connection
+    quote = schema_editor.quote_name
+
+    DeviceStats._meta.db_table = NEW_TABLE
+    try:
+        schema_editor.create_model(DeviceStats)
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT MIN({quote("id")}) FROM {quote(LEGACY_TABLE)}')
+            copied = (cursor.fetchone()[0] or 1) - 1  # Rows up to this id are copied
+            while True:
+                cursor.execute(f'SELECT MAX({quote("id")}) FROM {quote(LEGACY_TABLE)}')
+                last_id = cursor.fetchone()[0] or 0
+                if last_id - copied <= BATCH_SIZE:
+                    break
+                with transaction.atomic(using=connection.alias):
+                    _copy_rows(cursor, quote, copied, copied + BATCH_SIZE, DeviceAlert._meta.db_table)
+                copied += BATCH_SIZE
+
+            with transaction.atomic(using=connection.alias):
+                if connection.vendor == 'postgresql':
+                    # Hold off writers (readers may continue) so no row lands between MAX(id) and the drop.
+                    # SQLite needs nothing extra: the timeseries database's transaction_mode is IMMEDIATE.
+                    cursor.execute(f'LOCK TABLE {quote(LEGACY_TABLE)} IN EXCLUSIVE MODE')
+                cursor.execute(f'SELECT MAX({quote("id")}) FROM {quote(LEGACY_TABLE)}')
+                _copy_rows(cursor, quote, copied, cursor.fetchone()[0] or 0, DeviceAlert._meta.db_table)
+                cursor.execute(f'DROP TABLE {quote(LEGACY_TABLE)}')
+                schema_editor.alter_db_table(DeviceStats, NEW_TABLE, LEGACY_TABLE)
+    finally:
+        DeviceStats._meta.db_table = LEGACY_TABLE
+
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), [DeviceStats]):
+            cursor.execute(sql)
+
+
+def restore_devicestats(apps, schema_editor):
+    """
+    Reverse of rebuild_devicestats: rebuild the legacy table (as of 0012) and
+    fold each sample's DeviceAlert back into alert_triggered/alert_message.
+    Alerts without a sample at the same device and timestamp are dropped
+    with the DeviceAlert table. Runs in one transaction; stop the pollers first.
+    """
+    DeviceAlert = apps.get_model('network', 'DeviceAlert')
+    connection = schema_editor.connection
+    quote = schema_editor.quote_name
+    LegacyStats = MigrationLoader(connection, ignore_no_migrations=True).project_state(
+        PREVIOUS_MIGRATION
+    ).apps.get_model('network', 'DeviceStats')
+
+    columns = ('id', 'device_id', 'timestamp') + METRICS
+    alerts = quote(DeviceAlert._meta.db_table)
+    LegacyStats._meta.db_table = OLD_TABLE
+    try:
+        with transaction.atomic(using=connection.alias):
+            schema_editor.create_model(LegacyStats)
+            with connection.cursor() as cursor:
+                if connection.vendor == 'postgresql':
+                    cursor.execute(f'LOCK TABLE {quote(LEGACY_TABLE)} IN EXCLUSIVE MODE')
+                cursor.execute(
+                    f'INSERT INTO {quote(OLD_TABLE)} '
+                    f'({", ".join(quote(column) for column in columns)}, {quote("alert_triggered")}, {quote("alert_message")}) '
+                    f'SELECT {", ".join("s." + quote(column) for column in columns)}, '
+                    f'CASE WHEN a.{quote("id")} IS NULL THEN %s ELSE %s END, COALESCE(a.{quote("message")}, %s) '
+                    f'FROM {quote(LEGACY_TABLE)} s LEFT JOIN {alerts} a '
+                    f'ON a.{quote("device_id")} = s.{quote("device_id")} AND a.{quote("timestamp")} = s.{quote("timestamp")}',
+                    [False, True, ''],
+                )
+                cursor.execute(f'DROP TABLE {quote(LEGACY_TABLE)}')
+            schema_editor.alter_db_table(LegacyStats, OLD_TABLE, LEGACY_TABLE)
+    finally:
+        LegacyStats._meta.db_table = LEGACY_TABLE
+
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), [LegacyStats]):
+            cursor.execute(sql)
+
+
+class Migration(migrations.Migration):
+    # Each copy batch commits on its own instead of one transaction locking the table throughout
+    atomic = False
+
+    dependencies = [
+        ('network', '0012_device_circuit_breaker'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeviceAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField(default=django.utils.timezone.now)),
+                ('message', models.TextField(blank=True)),
+                ('device', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='alerts', to='network.device')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-timestamp'], name='devicealert_recent_idx')],
+                'constraints': [models.UniqueConstraint(fields=('device', 'timestamp'), name='unique_device_alert')],
+            },
+        ),
+        # The new DeviceStats schema is only recorded here; rebuild_devicestats creates it
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterModelOptions(
+                    name='devicestats',
+                    options={},
+                ),
+                migrations.RemoveConstraint(
+                    model_name='devicestats',
+                    name='unique_device_stats_sample',
+                ),
+                migrations.RemoveIndex(
+                    model_name='devicestats',
+                    name='network_dev_device__5ae78d_idx',
+                ),
+                migrations.RemoveIndex(
+                    model_name='devicestats',
+                    name='network_dev_timesta_a0dc2a_idx',
+                ),
+                migrations.AlterField(
+                    model_name='devicestats',
+                    name='device',
+                    field=models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='stats', to='network.device'),
+                ),
+                migrations.RemoveField(
+                    model_name='devicestats',
+                    name='alert_message',
+                ),
+                migrations.RemoveField(
+                    model_name='devicestats',
+                    name='alert_triggered',
+                ),
+                migrations.AlterField(
+                    model_name='devicestats',
+                    name='bandwidth',
+                    field=network.models.Float32Field(blank=True, null=True),
+                ),
+                migrations.AlterField(
+                    model_name='devicestats',
+                    name='cpu_usage',
+                    field=network.models.Float32Field(blank=True, null=True),
+                ),
+                migrations.AlterField(
+                    model_name='devicestats',
+                    name='latency',
+                    field=network.models.Float32Field(blank=True, null=True),
+                ),
+                migrations.AlterField(
+                    model_name='devicestats',
+                    name='temperature',
+                    field=network.models.Float32Field(blank=True, null=True),
+                ),
+                migrations.AddIndex(
+                    model_name='devicestats',
+                    index=models.Index(fields=['timestamp'], name='devicestats_timestamp_idx'),
+                ),
+                migrations.AddIndex(
+                    model_name='devicestats',
+                    index=models.Index(fields=['device', '-timestamp'], include=('cpu_usage', 'temperature', 'latency', 'bandwidth'), name='devicestats_latest_idx'),
+                ),
+                migrations.AddConstraint(
+                    model_name='devicestats',
+                    constraint=models.UniqueConstraint(fields=('device', 'timestamp'), name='unique_device_stats_row'),
+                ),
+            ],
+        ),
+        migrations.RunPython(rebuild_devicestats, restore_devicestats, hints={'model_name': 'devicestats'}),
+    ]
@@ -3,6 +3,16 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
 import datetime
+from . import recent
+
+# Single-precision float column: REAL on PostgreSQL, FLOAT on MySQL (SQLite stores every REAL in 8 bytes)
+class Float32Field(models.FloatField):
+    def db_type(self, connection):
+        if connection.vendor in ('postgresql', 'sqlite'):
+            return 'real'
+        if connection.vendor == 'mysql':
+            return 'float'
+        return super().db_type(connection)
 
 # Device model to store device information
 class Device(models.Model):
@@ -21,41 +31,80 @@ class Device(models.Model):
     # SNMP-related fields (latest values)
     cpu_usage = models.FloatField(null=True, blank=True)  # CPU usage as percentage
     temperature = models.FloatField(null=True, blank=True)  # Device temperature in Celsius
-    latency = models.FloatField(null=True, blank=True)  # Latency in milliseconds
+    latency = models.FloatField(null=True, blank=True)  # Outbound traffic in Mbps (ifHCOutOctets rate)
     bandwidth = models.FloatField(null=True, blank=True)  # Bandwidth usage in Mbps
 
     # SNMP configuration
     snmp_community = models.CharField(max_length=50, default='public')  # SNMP community string
     snmp_version = models.CharField(max_length=10, choices=[('1', 'v1'), ('2c', 'v2c'), ('3', 'v3')], default='2c')
 
+    # SNMPv3 USM credentials (used when snmp_version is '3', see network/usm.py)
+    SNMP_AUTH_PROTOCOL_CHOICES = [
+        ('none', 'None'), ('MD5', 'MD5'), ('SHA', 'SHA'), ('SHA224', 'SHA-224'),
+        ('SHA256', 'SHA-256'), ('SHA384', 'SHA-384'), ('SHA512', 'SHA-512'),
+    ]
+    SNMP_PRIV_PROTOCOL_CHOICES = [
+        ('none', 'None'), ('DES', 'DES'), ('3DES', '3DES'),
+        ('AES', 'AES-128'), ('AES192', 'AES-192'), ('AES256', 'AES-256'),
+    ]
+    snmp_v3_username = models.CharField(max_length=32, blank=True)
+    snmp_v3_auth_protocol = models.CharField(max_length=10, choices=SNMP_AUTH_PROTOCOL_CHOICES, default='SHA')
+    snmp_v3_auth_key = models.CharField(max_length=128, blank=True)  # Authentication passphrase
+    snmp_v3_priv_protocol = models.CharField(max_length=10, choices=SNMP_PRIV_PROTOCOL_CHOICES, default='AES')
+    snmp_v3_priv_key = models.CharField(max_length=128, blank=True)  # Privacy passphrase
+
+    # Poller circuit breaker (see network/breaker.py)
+    breaker_failures = models.PositiveIntegerField(default=0)  # Consecutive unanswered polls/probes
+    breaker_opened_at = models.DateTimeField(null=True, blank=True)  # Set while the breaker is open
+    breaker_next_probe = models.DateTimeField(null=True, blank=True)  # When an open device is probed next
+
     class Meta:
         ordering = ['serial_number']  # Devices ordered by serial number (ascending)
 
     def __str__(self):
         return f"{self.name} ({self.ip_address})"
+
+    @property
+    def breaker_state(self):
+        """'open' while the poller only probes this device, else 'closed'."""
+        return 'open' if self.breaker_opened_at else 'closed'
     
     def get_latest_stats(self, limit=10):
-        """Return the most recent stats for this device"""
-        return self.stats.all()[:limit]
+        """Return the most recent stats for this device (from the recent-samples buffer when it holds enough)"""
+        buffered = recent.latest([self.pk], limit).get(self.pk)
+        if buffered is None:
+            return self.stats.order_by('-timestamp')[:limit]
+        return [
+            DeviceStats(device=self, timestamp=row['timestamp'], **{metric: row[metric] for metric in recent.METRICS})
+            for row in reversed(buffered)
+        ]
 
 # Model to store historical SNMP stats for trend analysis
 class DeviceStats(models.Model):
-    device = models.ForeignKey(Device, on_delete=models.CASCADE, related_name='stats')
+    # Lives in the time-series database (see network/routers.py), so the FK has no
+    # database constraint and stats are removed by the Device post_delete signal. The indexes below
+    # lead with device, so the FK doesn't get an index of its own.
+    device = models.ForeignKey(Device, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name='stats')
     timestamp = models.DateTimeField(default=timezone.now)  # Auto timestamp
-    cpu_usage = models.FloatField(null=True, blank=True)
-    temperature = models.FloatField(null=True, blank=True)
-    latency = models.FloatField(null=True, blank=True)
-    bandwidth = models.FloatField(null=True, blank=True)
-    
-    # Alert fields
-    alert_triggered = models.BooleanField(default=False)  # Added alert_triggered field
-    alert_message = models.TextField(blank=True)  # Added alert_message field
+    cpu_usage = Float32Field(null=True, blank=True)
+    temperature = Float32Field(null=True, blank=True)
+    latency = Float32Field(null=True, blank=True)
+    bandwidth = Float32Field(null=True, blank=True)
+    # Alerts raised with a sample are stored in DeviceAlert
 
     class Meta:
-        ordering = ['-timestamp']  # Show latest stats first
+        # No default ordering: unordered querysets (filters, counts, deletes) shouldn't pay for a sort
         indexes = [
-            models.Index(fields=['timestamp']),  # Add index for faster date-based queries
-            models.Index(fields=['device', 'timestamp']),  # Add composite index
+            models.Index(fields=['timestamp'], name='devicestats_timestamp_idx'),  # Date-range scans and cleanup
+            # Latest samples of a device; covers the metric columns on PostgreSQL (include is ignored elsewhere)
+            models.Index(
+                fields=['device', '-timestamp'], include=['cpu_usage', 'temperature', 'latency', 'bandwidth'],
+                name='devicestats_latest_idx',
+            ),
+        ]
+        constraints = [
+            # One sample per device and timestamp, so replayed ingest batches are idempotent
+            models.UniqueConstraint(fields=['device', 'timestamp'], name='unique_device_stats_row'),
         ]
 
     def __str__(self):
@@ -67,6 +116,31 @@ class DeviceStats(models.Model):
         threshold_date = timezone.now() - datetime.timedelta(days=30)
         cls.objects.filter(timestamp__lt=threshold_date).delete()
 
+# Alerts raised while ingesting samples. Almost no sample raises one, so they live in their own
+# table next to DeviceStats (same time-series database) instead of two columns on every sample.
+class DeviceAlert(models.Model):
+    device = models.ForeignKey(Device, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name='alerts')
+    timestamp = models.DateTimeField(default=timezone.now)  # Timestamp of the sample that raised it
+    message = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-timestamp'], name='devicealert_recent_idx'),  # Newest alerts across devices
+        ]
+        constraints = [
+            # Also serves per-device lookups; replayed ingest batches don't duplicate alerts
+            models.UniqueConstraint(fields=['device', 'timestamp'], name='unique_device_alert'),
+        ]
+
+    def __str__(self):
+        return f"{self.device.name} alert at {self.timestamp}"
+
+    @classmethod
+    def cleanup_old_records(cls):
+        """Delete alerts older than 30 days"""
+        threshold_date = timezone.now() - datetime.timedelta(days=30)
+        cls.objects.filter(timestamp__lt=threshold_date).delete()
+
 # NotificationPreference model to store user notification preferences
 class NotificationPreference(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -81,4 +155,33 @@ class NotificationPreference(models.Model):
         verbose_name_plural = "Notification Preferences"
 
     def __str__(self):
-        return f"Notifications for {self.user.username}"
\ No newline at end of file
+        return f"Notifications for {self.user.username}"
+
+# Slow requests/tasks and N+1 query patterns recorded by network/profiling.py
+class RequestProfile(models.Model):
+    KIND_CHOICES = [('request', 'Request'), ('task', 'Celery task')]
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, default='request')
+    name = models.CharField(max_length=255)  # View name, path or task name
+    method = models.CharField(max_length=10, blank=True)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    timestamp = models.DateTimeField(default=timezone.now)
+    wall_ms = models.FloatField()
+    sql_ms = models.FloatField()
+    query_count = models.PositiveIntegerField()
+    n_plus_one = models.BooleanField(default=False)
+    duplicate_queries = models.JSONField(default=list)  # [{'fingerprint': ..., 'count': ...}]
+
+    class Meta:
+        ordering = ['-wall_ms']  # Slowest first
+        indexes = [
+            models.Index(fields=['timestamp']),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.wall_ms:.0f} ms, {self.query_count} queries)"
+
+    @classmethod
+    def cleanup_old_records(cls):
+        """Delete profiles older than 7 days"""
+        threshold_date = timezone.now() - datetime.timedelta(days=7)
+        cls.objects.filter(timestamp__lt=threshold_date).delete()
@@ -0,0 +1,227 @@
+# network/profiling.py
+"""
+Opt-in per-request and per-task query profiler.
+
+For a sampled fraction of requests (and Celery tasks) this records the number
+of queries, total SQL time, wall time and repeated query fingerprints. Slow
+requests and likely N+1 patterns are written as JSON lines to a rotating log
+(the 'network.profiling' logger) and stored as RequestProfile rows for the
+admin. Controlled by settings.PROFILING.
+"""
+import contextvars
+import json
+import random
+import re
+import threading
+import time
+import logging
+from collections import Counter
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\bIN \([^()]*\)", re.IGNORECASE)
+
+# Profile of the current async request. Context variables follow the request
+# into the sync_to_async threads that run its views and queries.
+_active_profile = contextvars.ContextVar('query_profile', default=None)
+
+
+def get_config():
+    return getattr(settings, 'PROFILING', {})
+
+
+def fingerprint(sql):
+    """
+    Normalize a SQL statement so queries differing only in literals or IN-list
+    length share a fingerprint.
+    """
+    sql = _IN_LIST_RE.sub('IN (...)', sql)
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    return ' '.join(sql.split())
+
+
+class QueryProfile:
+    """
+    Context manager collecting every query run on this thread's database
+    connections (all aliases) while it is active. Used with "async with", it
+    collects the queries of the current context instead, on whichever thread
+    they run.
+    """
+    def __init__(self):
+        self.queries = Counter()
+        self.query_count = 0
+        self.sql_seconds = 0.0
+        self.wall_seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_seconds += time.perf_counter() - started
+            self.query_count += 1
+            self.queries[fingerprint(sql)] += 1
+
+    def __enter__(self):
+        self._wrappers = [connections[alias].execute_wrapper(self) for alias in connections]
+        for wrapper in self._wrappers:
+            wrapper.__enter__()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.wall_seconds = time.perf_counter() - self._started
+        for wrapper in reversed(self._wrappers):
+            wrapper.__exit__(*exc)
+
+    async def __aenter__(self):
+        self._token = _active_profile.set(self)
+        self._started = time.perf_counter()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.wall_seconds = time.perf_counter() - self._started
+        _active_profile.reset(self._token)
+
+    def duplicates(self, threshold):
+        """Fingerprints executed at least `threshold` times, most frequent first."""
+        return [
+            {'fingerprint': sql, 'count': count}
+            for sql, count in self.queries.most_common()
+            if count >= threshold
+        ]
+
+
+def _profile_context(execute, sql, params, many, context):
+    """Execute wrapper on every connection, feeding the async request's profile if any."""
+    profile = _active_profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    return profile(execute, sql, params, many, context)
+
+
+def _install_context_wrapper(sender, connection, **kwargs):
+    if _profile_context not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_profile_context)
+
+
+def should_sample():
+    config = get_config()
+    return config.get('ENABLED') and random.random() < config.get('SAMPLE_RATE', 1.0)
+
+
+def report(profile, kind, name, method='', status_code=None):
+    """
+    Log and store the profile if it was slow or showed an N+1 pattern.
+    """
+    from .models import RequestProfile
+
+    config = get_config()
+    duplicates = profile.duplicates(config.get('N_PLUS_ONE_THRESHOLD', 10))
+    wall_ms = profile.wall_seconds * 1000
+    if wall_ms < config.get('SLOW_MS', 500) and not duplicates:
+        return None
+
+    record = {
+        'kind': kind,
+        'name': name,
+        'method': method,
+        'status_code': status_code,
+        'wall_ms': round(wall_ms, 2),
+        'sql_ms': round(profile.sql_seconds * 1000, 2),
+        'query_count': profile.query_count,
+        'n_plus_one': bool(duplicates),
+        'duplicate_queries': duplicates,
+    }
+    logger.warning(json.dumps(record))
+    try:
+        # Stored outside the profiled block so these writes aren't counted
+        return RequestProfile.objects.create(**record)
+    except Exception as e:
+        logger.error(f"Failed to store request profile for {name}: {e}")
+        return None
+
+
+class ProfilingMiddleware:
+    """
+    Profiles a sampled fraction of requests. Does nothing unless
+    settings.PROFILING['ENABLED'] is set.
+    Under ASGI the whole chain runs async, sync views included. Those
+    requests are profiled through the request's context, since their queries
+    run on sync_to_async threads rather than this one.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not should_sample():
+            return self.get_response(request)
+
+        with QueryProfile() as profile:
+            response = self.get_response(request)
+        report(profile, 'request', self._view_name(request), request.method, response.status_code)
+        return response
+
+    async def __acall__(self, request):
+        if not should_sample():
+            return await self.get_response(request)
+
+        async with QueryProfile() as profile:
+            response = await self.get_response(request)
+        await sync_to_async(report)(profile, 'request', self._view_name(request), request.method, response.status_code)
+        return response
+
+    @staticmethod
+    def _view_name(request):
+        match = getattr(request, 'resolver_match', None)
+        return match.view_name if match and match.view_name else request.path
+
+
+# Celery task hook: profiles sampled tasks between task_prerun and task_postrun
+_task_profiles = {}
+_task_lock = threading.Lock()
+
+
+def _task_prerun(task_id=None, task=None, **kwargs):
+    if not should_sample():
+        return
+    profile = QueryProfile().__enter__()
+    with _task_lock:
+        _task_profiles[task_id] = profile
+
+
+def _task_postrun(task_id=None, task=None, **kwargs):
+    with _task_lock:
+        profile = _task_profiles.pop(task_id, None)
+    if profile is None:
+        return
+    profile.__exit__(None, None, None)
+    report(profile, 'task', task.name if task else str(task_id))
+
+
+def connect_query_wrapper():
+    """Add the async request profiler's execute wrapper to every new connection."""
+    connection_created.connect(_install_context_wrapper, weak=False, dispatch_uid='network.profiling')
+
+
+def connect_celery_signals():
+    try:
+        from celery.signals import task_prerun, task_postrun
+    except ImportError:
+        return
+    task_prerun.connect(_task_prerun, weak=False)
+    task_postrun.connect(_task_postrun, weak=False)
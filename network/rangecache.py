@@ -0,0 +1,176 @@
+# network/rangecache.py
+"""
+Cache for historical range queries, split into immutable time chunks.
+
+Samples for a past hour don't change once ingested, so a range query is cut
+into chunks aligned to multiples of the chunk length, and each device's
+result per chunk is cached on its own. A chunk counts as closed once it ended
+more than RANGE_CACHE['CLOSE_DELAY'] seconds ago. That margin covers ingest
+lag and collector backlogs. Closed chunks are cached without expiry. The open
+head chunk, and any chunk not in the cache yet, is computed in a single call
+spanning all missing chunks.
+
+Chunk keys include a per-device version ('range:version:<device id>').
+invalidate() replaces it when a device's closed chunks change anyway: its
+history was purged (signals.purge_history) or a sample landed in a closed
+chunk (a late edge-collector batch, see ingest.write_samples). The old
+chunks are then never read again and age out of the cache. Versions are
+fresh time_ns() values rather than counters, so a version evicted from the
+cache can't come back as one that old chunks were stored under.
+
+Chunks live in the 'series' cache alias (settings.CACHES). Options:
+- Redis: run it with maxmemory-policy allkeys-lru.
+- LRUFileBasedCache below: Django's file cache, with least-recently-used
+  culling instead of random culling.
+"""
+import os
+import time
+import logging
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import InvalidCacheBackendError
+from django.core.cache.backends.filebased import FileBasedCache
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+CACHE_ALIAS = 'series'
+KEY_PREFIX = 'range:'
+VERSION_PREFIX = 'range:version:'
+
+
+class LRUFileBasedCache(FileBasedCache):
+    """
+    FileBasedCache that evicts the least recently used entries: hits touch the
+    file's mtime and culling removes the oldest files first.
+    """
+    def get(self, key, default=None, version=None):
+        value = super().get(key, default, version)
+        if value is not default:
+            try:
+                os.utime(self._key_to_file(key, version))
+            except OSError:
+                pass
+        return value
+
+    def _cull(self):
+        filelist = self._list_cache_files()
+        num_entries = len(filelist)
+        if num_entries < self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            return self.clear()
+
+        def mtime(fname):
+            try:
+                return os.path.getmtime(fname)
+            except OSError:
+                return 0
+        for fname in sorted(filelist, key=mtime)[:int(num_entries / self._cull_frequency)]:
+            self._delete(fname)
+
+
+def get_config():
+    defaults = {
+        'ENABLED': True,
+        'CLOSE_DELAY': 10 * 60,  # Seconds after a chunk ends before it is treated as immutable
+    }
+    defaults.update(getattr(settings, 'RANGE_CACHE', {}))
+    return defaults
+
+
+def get_cache():
+    try:
+        return caches[CACHE_ALIAS]
+    except InvalidCacheBackendError:
+        return caches['default']
+
+
+def closed_before(now_ms=None):
+    """Epoch ms before which a chunk must end to be cached."""
+    now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+    return now_ms - get_config()['CLOSE_DELAY'] * 1000
+
+
+def invalidate(device_ids):
+    """Stop serving the cached chunks of these devices."""
+    if not device_ids:
+        return
+    try:
+        get_cache().set_many({f'{VERSION_PREFIX}{device_id}': time.time_ns() for device_id in device_ids}, None)
+    except Exception as e:
+        logger.error(f"Range cache invalidation failed: {e}")
+
+
+def _versions(cache, device_ids):
+    """Chunk key version per device, starting a fresh one for devices without."""
+    keys = {f'{VERSION_PREFIX}{device_id}': device_id for device_id in device_ids}
+    found = cache.get_many(list(keys))
+    fresh = {key: time.time_ns() for key in keys if key not in found}
+    if fresh:
+        cache.set_many(fresh, None)
+    return {keys[key]: version for key, version in {**found, **fresh}.items()}
+
+
+def fetch(namespace, device_ids, start_ms, end_ms, chunk_ms, compute, now_ms=None):
+    """
+    Per-device, per-chunk results for every chunk overlapping [start_ms, end_ms]:
+    {device id: {chunk start: value}}.
+
+    compute(device_ids, first_ms, last_ms) must return the same structure for
+    the whole chunks in [first_ms, last_ms). It is called at most once, for
+    the devices with a missing chunk and the span of their missing chunks.
+    """
+    config = get_config()
+    closed = closed_before(now_ms)
+    chunk_starts = list(range(start_ms // chunk_ms * chunk_ms, end_ms + 1, chunk_ms))
+
+    result = {device_id: {} for device_id in device_ids}
+    cache = get_cache()
+    versions = {}
+    if config['ENABLED'] and chunk_starts[0] + chunk_ms <= closed:
+        try:
+            versions = _versions(cache, device_ids)
+        except Exception as e:
+            logger.error(f"Range cache read failed: {e}")
+    keys = {
+        f'{KEY_PREFIX}{namespace}:{device_id}:{versions[device_id]}:{chunk_start}': (device_id, chunk_start)
+        for device_id in device_ids if device_id in versions
+        for chunk_start in chunk_starts if chunk_start + chunk_ms <= closed
+    }
+    if keys:
+        try:
+            for key, value in cache.get_many(list(keys)).items():
+                device_id, chunk_start = keys[key]
+                result[device_id][chunk_start] = value
+        except Exception as e:
+            logger.error(f"Range cache read failed: {e}")
+
+    missing = {
+        device_id: [chunk_start for chunk_start in chunk_starts if chunk_start not in chunks]
+        for device_id, chunks in result.items()
+    }
+    missing = {device_id: chunks for device_id, chunks in missing.items() if chunks}
+    hits = sum(len(chunks) for chunks in result.values())
+    metrics.RANGE_CACHE_CHUNKS.inc(hits, result='hit')
+    if not missing:
+        return result
+
+    first_ms = min(chunks[0] for chunks in missing.values())
+    last_ms = max(chunks[-1] for chunks in missing.values()) + chunk_ms
+    metrics.RANGE_CACHE_CHUNKS.inc(sum(len(chunks) for chunks in missing.values()), result='miss')
+    computed = compute(list(missing), first_ms, last_ms)
+
+    to_cache = {}
+    for device_id, chunks in missing.items():
+        for chunk_start in chunks:
+            value = computed.get(device_id, {}).get(chunk_start)
+            result[device_id][chunk_start] = value
+            if device_id in versions and chunk_start + chunk_ms <= closed:
+                to_cache[f'{KEY_PREFIX}{namespace}:{device_id}:{versions[device_id]}:{chunk_start}'] = value
+    if to_cache:
+        try:
+            cache.set_many(to_cache, None)
+        except Exception as e:
+            logger.error(f"Range cache write failed: {e}")
+    return result
@@ -0,0 +1,117 @@
+# network/rates.py
+"""
+Counter-to-rate stage for SNMP counters (ifHCOutOctets and friends).
+
+Keeps the previous raw value and timestamp per (device, OID) in memory and
+turns each new reading into a per-second rate, handling 32/64-bit wraps and
+counter resets (device reboots). The previous samples are snapshotted to
+the Django cache ('rates:prev:<device id>') so a restarted worker carries
+on without a gap. DeviceStats is never read back.
+"""
+import threading
+import time
+import logging
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = 'rates:prev:'
+CACHE_TTL = 24 * 60 * 60
+# Snapshot dirty entries at least this often (seconds) even without an explicit flush()
+FLUSH_INTERVAL = 30
+# A previous sample older than this (seconds) is discarded: a 32-bit counter may have
+# wrapped more than once in between
+MAX_AGE = 60 * 60
+
+
+class CounterCache:
+    """
+    Previous (raw value, timestamp) per device and OID.
+    """
+    def __init__(self):
+        self._samples = {}  # device id -> {oid: (value, timestamp)}
+        self._dirty = set()
+        self._loaded = set()
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _device_samples(self, device_id):
+        if device_id not in self._loaded:
+            # First sight of this device in this process: pick up the snapshot
+            stored = cache.get(f'{CACHE_PREFIX}{device_id}') or {}
+            with self._lock:
+                current = self._samples.setdefault(device_id, {})
+                for oid, sample in stored.items():
+                    if oid not in current or current[oid][1] < sample[1]:
+                        current[oid] = tuple(sample)
+                self._loaded.add(device_id)
+        return self._samples.setdefault(device_id, {})
+
+    def rate(self, device_id, oid, value, timestamp, bits=64):
+        """
+        Store the new raw counter value and return the per-second rate since
+        the previous one, or None if there is no usable previous sample
+        (first reading, reset, stale or out-of-order sample).
+        """
+        samples = self._device_samples(device_id)
+        previous = samples.get(oid)
+        with self._lock:
+            if previous is not None and timestamp <= previous[1]:
+                return None  # Out-of-order reading; keep the newer sample
+            samples[oid] = (value, timestamp)
+            self._dirty.add(device_id)
+
+        if time.monotonic() - self._last_flush > FLUSH_INTERVAL:
+            self.flush()
+
+        if previous is None:
+            return None
+        previous_value, previous_timestamp = previous
+        elapsed = timestamp - previous_timestamp
+        if elapsed > MAX_AGE:
+            return None
+
+        delta = value - previous_value
+        if delta < 0:
+            if bits == 32 and previous_value > 2 ** 31 and value < 2 ** 31:
+                # Wrapped past 2^32
+                delta += 2 ** 32
+            else:
+                # A 64-bit counter doesn't wrap in practice: the device was restarted
+                logger.info(f"Counter {oid} on device {device_id} reset ({previous_value} -> {value})")
+                return None
+        return delta / elapsed
+
+    def flush(self):
+        """Snapshot changed devices to the Django cache."""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            snapshot = {
+                f'{CACHE_PREFIX}{device_id}': dict(self._samples.get(device_id, {}))
+                for device_id in dirty
+            }
+            self._last_flush = time.monotonic()
+        if not snapshot:
+            return
+        try:
+            cache.set_many(snapshot, CACHE_TTL)
+        except Exception as e:
+            logger.error(f"Failed to persist counter samples: {e}")
+
+    def forget(self, device_id):
+        with self._lock:
+            self._samples.pop(device_id, None)
+            self._dirty.discard(device_id)
+            self._loaded.discard(device_id)
+        cache.delete(f'{CACHE_PREFIX}{device_id}')
+
+
+counters = CounterCache()
+
+
+def rate(device_id, oid, value, timestamp, bits=64):
+    return counters.rate(device_id, oid, value, timestamp, bits)
+
+
+def flush():
+    counters.flush()
@@ -0,0 +1,259 @@
+# network/recent.py
+"""
+The last RECENT_SAMPLES['CAPACITY'] samples of each device, kept out of the
+database for latest-value and short-window reads.
+
+Ingest appends every written sample to a ring of preallocated NumPy arrays
+for its device (epoch-ms timestamps plus one float64 column per metric) in
+the writing process. It also mirrors the sample to Redis, where each device
+has a list key trimmed to the same capacity:
+
+    signalsync:recent:<device id>  ->  [packed RECORD (+ UTF-8 alert message), ...]
+
+Readers use the Redis lists, so every web and worker process sees the
+samples any ingest worker wrote. When REDIS_URL is empty, the in-process
+rings answer instead. That is only complete when a single process writes
+samples.
+
+A buffer covers a window only if it already holds a sample from before the
+window's start. Only then can no older sample be missing. Otherwise the
+caller falls back to DeviceStats. If a mirror write fails, the device's list
+is dropped on the next successful write, so a list never has holes.
+"""
+import threading
+import logging
+from datetime import datetime, timezone as dt_timezone
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+METRICS = ('cpu_usage', 'temperature', 'latency', 'bandwidth')
+KEY_PREFIX = 'signalsync:recent:'
+RECORD = np.dtype([('timestamp', '<i8')] + [(metric, '<f8') for metric in METRICS] + [('alert', 'u1')])
+KEY_TTL = 24 * 60 * 60  # Lists of devices that stopped reporting expire
+
+
+def get_config():
+    defaults = {
+        'CAPACITY': 1200,  # Samples per device: one hour at the 3-second poll interval
+        'REDIS_URL': None,
+    }
+    defaults.update(getattr(settings, 'RECENT_SAMPLES', {}))
+    return defaults
+
+
+def _pack(sample):
+    record = np.zeros(1, dtype=RECORD)
+    record['timestamp'] = sample['timestamp']
+    for metric in METRICS:
+        value = sample.get(metric)
+        record[metric] = np.nan if value is None else value
+    record['alert'] = bool(sample.get('alert_triggered'))
+    message = (sample.get('alert_message') or '') if sample.get('alert_triggered') else ''
+    return record.tobytes() + message.encode()
+
+
+def _unpack(items):
+    """Packed list items -> (records sorted by timestamp, {timestamp ms: alert message})."""
+    if all(len(item) == RECORD.itemsize for item in items):
+        records = np.frombuffer(b''.join(items), dtype=RECORD)
+        messages = {}
+    else:
+        records = np.frombuffer(b''.join(item[:RECORD.itemsize] for item in items), dtype=RECORD)
+        messages = {
+            int(record['timestamp']): item[RECORD.itemsize:].decode()
+            for record, item in zip(records, items) if len(item) > RECORD.itemsize
+        }
+    return _deduplicated(records), messages
+
+
+def _deduplicated(records):
+    """Sorted by timestamp, with replayed ingest batches' duplicates dropped."""
+    _, first = np.unique(records['timestamp'], return_index=True)
+    return records[first]
+
+
+class Ring:
+    """
+    Fixed-capacity ring of one device's samples in preallocated arrays.
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.records = np.zeros(capacity, dtype=RECORD)
+        self.messages = {}  # timestamp ms -> alert message
+        self.head = 0  # Next slot to write
+        self.count = 0
+
+    def append(self, sample):
+        slot = self.head
+        if self.count == self.capacity:
+            self.messages.pop(int(self.records['timestamp'][slot]), None)
+        self.records[slot] = np.frombuffer(_pack(sample)[:RECORD.itemsize], dtype=RECORD)[0]
+        if sample.get('alert_triggered') and sample.get('alert_message'):
+            self.messages[sample['timestamp']] = sample['alert_message']
+        self.head = (slot + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def ordered(self):
+        """(records sorted by timestamp, alert messages)."""
+        if self.count < self.capacity:
+            records = self.records[:self.count]
+        else:
+            records = np.concatenate([self.records[self.head:], self.records[:self.head]])
+        return _deduplicated(records), dict(self.messages)
+
+
+class RecentSamples:
+    def __init__(self):
+        self._rings = {}  # device id -> Ring
+        self._broken = set()  # Devices whose Redis list missed a sample
+        self._redis = None
+        self._lock = threading.Lock()
+
+    @property
+    def redis(self):
+        url = get_config().get('REDIS_URL')
+        if not url:
+            return None
+        if self._redis is None:
+            import redis
+            self._redis = redis.Redis.from_url(url, socket_timeout=1)
+        return self._redis
+
+    def record(self, samples):
+        """Append written samples to their devices' rings and the Redis mirror."""
+        capacity = get_config()['CAPACITY']
+        with self._lock:
+            for sample in samples:
+                ring = self._rings.get(sample['device_id'])
+                if ring is None or ring.capacity != capacity:
+                    ring = self._rings[sample['device_id']] = Ring(capacity)
+                ring.append(sample)
+            broken = set(self._broken)
+
+        client = self.redis
+        if client is None:
+            return
+        device_ids = {sample['device_id'] for sample in samples}
+        try:
+            pipe = client.pipeline(transaction=False)
+            for device_id in broken & device_ids:
+                pipe.delete(f'{KEY_PREFIX}{device_id}')
+            for sample in samples:
+                pipe.rpush(f'{KEY_PREFIX}{sample["device_id"]}', _pack(sample))
+            for device_id in device_ids:
+                pipe.ltrim(f'{KEY_PREFIX}{device_id}', -capacity, -1)
+                pipe.expire(f'{KEY_PREFIX}{device_id}', KEY_TTL)
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to mirror recent samples to Redis: {e}")
+            with self._lock:
+                self._broken |= device_ids
+            return
+        with self._lock:
+            self._broken -= device_ids
+
+    def _load(self, device_ids, count=None):
+        """{device id: (records, messages)} for the devices with samples, newest `count` only if given."""
+        client = self.redis
+        if client is None:
+            with self._lock:
+                loaded = {device_id: self._rings[device_id].ordered() for device_id in device_ids if device_id in self._rings}
+            if count is not None:
+                loaded = {device_id: (records[-count:], messages) for device_id, (records, messages) in loaded.items()}
+            return loaded
+        pipe = client.pipeline(transaction=False)
+        for device_id in device_ids:
+            pipe.lrange(f'{KEY_PREFIX}{device_id}', -count if count else 0, -1)
+        return {device_id: _unpack(items) for device_id, items in zip(device_ids, pipe.execute()) if items}
+
+    def _oldest(self, device_ids):
+        """{device id: timestamp ms of the oldest buffered sample}."""
+        client = self.redis
+        if client is None:
+            return {
+                device_id: int(records['timestamp'][0])
+                for device_id, (records, _) in self._load(device_ids).items() if len(records)
+            }
+        pipe = client.pipeline(transaction=False)
+        for device_id in device_ids:
+            pipe.lindex(f'{KEY_PREFIX}{device_id}', 0)
+        return {
+            device_id: int(np.frombuffer(item[:RECORD.itemsize], dtype=RECORD)['timestamp'][0])
+            for device_id, item in zip(device_ids, pipe.execute()) if item
+        }
+
+    def latest(self, device_ids, count=1):
+        """
+        {device id: [sample dict, ...]} with each device's newest `count`
+        samples, oldest first. Devices with fewer buffered samples are left out.
+        """
+        try:
+            loaded = self._load(list(device_ids), count)
+        except Exception as e:
+            logger.error(f"Failed to read recent samples: {e}")
+            return {}
+        return {
+            device_id: _rows(records, messages)
+            for device_id, (records, messages) in loaded.items() if len(records) >= count
+        }
+
+    def read_columns(self, device_id, start_ms, end_ms):
+        """
+        (timestamps, {metric: values}) for [start_ms, end_ms] like
+        tsstore.read_columns, or None when the buffer doesn't cover start_ms.
+        """
+        try:
+            oldest = self._oldest([device_id]).get(device_id)
+            if oldest is None or oldest > start_ms:
+                return None
+            records, _ = self._load([device_id])[device_id]
+        except Exception as e:
+            logger.error(f"Failed to read recent samples: {e}")
+            return None
+        if not len(records) or records['timestamp'][0] > start_ms:
+            return None  # Trimmed between the two reads
+        timestamps = records['timestamp']
+        lo, hi = np.searchsorted(timestamps, start_ms, 'left'), np.searchsorted(timestamps, end_ms, 'right')
+        return timestamps[lo:hi].copy(), {metric: records[metric][lo:hi].astype(np.float64) for metric in METRICS}
+
+    def forget(self, device_id):
+        with self._lock:
+            self._rings.pop(device_id, None)
+            self._broken.discard(device_id)
+        client = self.redis
+        if client is not None:
+            try:
+                client.delete(f'{KEY_PREFIX}{device_id}')
+            except Exception as e:
+                logger.error(f"Failed to drop recent samples of device {device_id}: {e}")
+
+
+def _rows(records, messages):
+    rows = []
+    for record in records:
+        timestamp = int(record['timestamp'])
+        row = {'timestamp': datetime.fromtimestamp(timestamp / 1000, tz=dt_timezone.utc)}
+        for metric in METRICS:
+            value = float(record[metric])
+            row[metric] = None if np.isnan(value) else value
+        row['alert_triggered'] = bool(record['alert'])
+        row['alert_message'] = messages.get(timestamp, '')
+        rows.append(row)
+    return rows
+
+
+samples = RecentSamples()
+
+
+def record(written):
+    samples.record(written)
+
+
+def latest(device_ids, count=1):
+    return samples.latest(device_ids, count)
+
+
+def read_columns(device_id, start_ms, end_ms):
+    return samples.read_columns(device_id, start_ms, end_ms)
@@ -0,0 +1,146 @@
+# network/remote.py
+"""
+Central side of the standalone collectors (see network/edge.py).
+
+Branches listed in COLLECTOR['REMOTE_BRANCHES'] are polled by a collector
+running near the branch instead of by the Celery pollers. A collector only
+talks HTTP and never touches the database:
+
+- GET  /network/api/collector/assignment/?branch=<name>[&branch=...]
+  returns the devices to poll and the exact OIDs for each one. Model
+  profiles and unsupported OIDs are already applied.
+- POST /network/api/collector/results/ ships a batch of raw readings. Here
+  they go through the same unsupported-OID cache, counter-to-rate and
+  scaling steps as a local poll (collector.from_response), and then through
+  ingest.submit().
+
+Both endpoints require "Authorization: Bearer <COLLECTOR['REMOTE_TOKEN']>"
+and are disabled while no token is configured.
+
+SNMPv3 devices are never assigned, because the collector only speaks
+v1/v2c. They stay with the Celery pollers.
+"""
+import hmac
+import json
+import logging
+from datetime import datetime, timezone as dt_timezone
+from django.db.models import Q
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from .models import Device
+from . import collector, ingest, metrics, rto
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL = 3  # Seconds between collector polls (matches the Celery beat schedule)
+DEFAULT_REFRESH = 60  # Seconds between assignment fetches
+
+
+def get_config():
+    return collector.get_config()
+
+
+def remote_branches():
+    return set(get_config().get('REMOTE_BRANCHES') or ())
+
+
+def _remote_q(branches):
+    return Q(branch__in=branches) & ~Q(snmp_version='3')
+
+
+def centrally_polled(devices):
+    """Leave out the devices a standalone collector polls."""
+    branches = remote_branches()
+    return devices.exclude(_remote_q(branches)) if branches else devices
+
+
+def _authorized(request):
+    token = get_config().get('REMOTE_TOKEN')
+    header = request.headers.get('Authorization', '')
+    return bool(token) and hmac.compare_digest(header, f'Bearer {token}')
+
+
+@csrf_exempt
+@require_GET
+def assignment_view(request):
+    """
+    The devices of the requested branches, with their OIDs in poll order.
+    """
+    if not _authorized(request):
+        return JsonResponse({'error': 'Invalid collector token'}, status=403)
+    branches = set(request.GET.getlist('branch')) & remote_branches()
+    config = get_config()
+
+    devices = []
+    queryset = Device.objects.filter(_remote_q(branches)).only(
+        'id', 'ip_address', 'model', 'snmp_community', 'snmp_version'
+    )
+    for device in queryset:
+        oids = collector.request_oids(device)
+        if oids:
+            devices.append({
+                'id': device.id,
+                'address': device.ip_address,
+                'community': device.snmp_community or 'public',
+                'version': device.snmp_version or '2c',
+                'oids': oids,
+            })
+
+    return JsonResponse({
+        'branches': sorted(branches),
+        'interval': config.get('REMOTE_INTERVAL', DEFAULT_INTERVAL),
+        'refresh': config.get('REMOTE_REFRESH', DEFAULT_REFRESH),
+        'timeout': rto.get_config()['INITIAL_TIMEOUT'],
+        'retries': collector.SNMP_RETRIES,
+        'devices': devices,
+    })
+
+
+@csrf_exempt
+@require_POST
+def results_view(request):
+    """
+    Accept a batch from a collector:
+    {"collector": name,
+     "samples": [[device id, epoch ms, {oid: value} or null if unanswered, [Counter32 OIDs]], ...],
+     "unsupported": [[device id, oid], ...]}
+    """
+    if not _authorized(request):
+        return JsonResponse({'error': 'Invalid collector token'}, status=403)
+    try:
+        batch = json.loads(request.body)
+        samples = [
+            (int(device_id), int(timestamp_ms), values, set(counter32 or ()))
+            for device_id, timestamp_ms, values, counter32 in batch.get('samples', [])
+        ]
+        unsupported = [(int(device_id), str(oid)) for device_id, oid in batch.get('unsupported', [])]
+    except (ValueError, TypeError, AttributeError):
+        return JsonResponse({'error': 'Malformed batch'}, status=400)
+
+    device_ids = {sample[0] for sample in samples} | {device_id for device_id, _ in unsupported}
+    devices = Device.objects.only('id', 'ip_address', 'model').in_bulk(device_ids)
+
+    for device_id, oid in unsupported:
+        device = devices.get(device_id)
+        if device is not None:
+            collector.unsupported_oids.mark(device.ip_address, oid)
+
+    pending = []
+    for device_id, timestamp_ms, values, counter32 in samples:
+        device = devices.get(device_id)
+        if device is None:
+            continue
+        response = collector.SnmpResponse()
+        if not isinstance(values, dict):
+            response.timed_out = True  # null: the device didn't answer
+        else:
+            response.values = values
+            response.counter_bits = {oid: 32 for oid in counter32}
+            response.received_at = timestamp_ms / 1000
+        sampled_at = datetime.fromtimestamp(timestamp_ms / 1000, tz=dt_timezone.utc)
+        pending.append(ingest.make_sample(device.id, sampled_at, collector.from_response(device, response)))
+
+    ingest.submit(pending)
+    metrics.REMOTE_SAMPLES.inc(len(pending), collector=str(batch.get('collector', ''))[:64])
+    return JsonResponse({'accepted': len(pending)})
@@ -0,0 +1,62 @@
+# network/routers.py
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# Database alias used for high-rate time-series tables
+TIMESERIES_DB = getattr(settings, 'TIMESERIES_DATABASE', 'timeseries')
+
+# Lowercase model names (within the network app) that live in the time-series database.
+# Rollup and alert tables added later should be registered here as well.
+TIMESERIES_MODELS = {
+    'devicestats',
+    'devicealert',
+}
+
+
+def is_timeseries_model(model):
+    """
+    Return True if the given model class is stored in the time-series database.
+    """
+    return model._meta.app_label == 'network' and model._meta.model_name in TIMESERIES_MODELS
+
+
+class TimeSeriesRouter:
+    """
+    Routes time-series tables (DeviceStats, rollups, alerts) to a dedicated
+    append-tuned database so poller writes never hold the writer lock that
+    inventory, auth, sessions and Celery beat depend on.
+    Everything else stays on the default database.
+    """
+
+    def _timeseries_enabled(self):
+        return TIMESERIES_DB in settings.DATABASES
+
+    def _db_for_model(self, model):
+        if not self._timeseries_enabled():
+            return None
+        # Be explicit for other models too: otherwise Django falls back to the
+        # hinted instance's database, e.g. resolving stat.device in 'timeseries'.
+        return TIMESERIES_DB if is_timeseries_model(model) else DEFAULT_DB_ALIAS
+
+    def db_for_read(self, model, **hints):
+        return self._db_for_model(model)
+
+    def db_for_write(self, model, **hints):
+        return self._db_for_model(model)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # DeviceStats -> Device crosses databases; the FK is kept without a
+        # database constraint so Django can still resolve it lazily.
+        if obj1._meta.app_label == 'network' and obj2._meta.app_label == 'network':
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if not self._timeseries_enabled():
+            return None
+        if app_label == 'network' and model_name in TIMESERIES_MODELS:
+            return db == TIMESERIES_DB
+        # Nothing else belongs in the time-series database
+        if db == TIMESERIES_DB:
+            return False
+        return None
@@ -0,0 +1,8 @@
+# network/routing.py
+from django.urls import path
+from . import consumers
+
+websocket_urlpatterns = [
+    path('ws/device-stats/', consumers.DeviceStatsConsumer.as_asgi()),
+    path('ws/device-stats/<int:device_id>/', consumers.DeviceStatsConsumer.as_asgi()),
+]
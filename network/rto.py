@@ -0,0 +1,155 @@
+# network/rto.py
+"""
+Adaptive per-device SNMP timeouts, estimated like TCP's retransmission
+timeout (RFC 6298).
+
+Each answered GET updates a smoothed RTT and RTT variance for the device:
+
+    RTTVAR = (1 - BETA) * RTTVAR + BETA * |SRTT - RTT|
+    SRTT   = (1 - ALPHA) * SRTT + ALPHA * RTT
+    RTO    = SRTT + K * RTTVAR, clamped to [MIN_TIMEOUT, MAX_TIMEOUT]
+
+A GET that times out doubles the device's RTO (up to MAX_TIMEOUT), so a link
+whose RTT rose gets answered on a later cycle. Replies to retried requests
+aren't sampled (Karn's algorithm), because it is unknown which attempt they
+answer. Until a device has answered once it gets INITIAL_TIMEOUT (the old
+fixed timeout) and timeouts don't back off, so a dead device costs no more
+per cycle than it did before.
+
+Estimates are kept in memory and snapshotted to the Django cache
+('collector:rto:<address>') by flush(), which the pollers call once per
+cycle, so every worker starts from what the others learned.
+
+Timeouts are the only place a shorter wait saves time, so for each timed-out
+GET the difference to the fixed INITIAL_TIMEOUT budget is added to
+signalsync_snmp_timeout_saved_seconds_total ({direction="saved"}, or
+{direction="extra"} for slow links that now get more time). Replies slower
+than INITIAL_TIMEOUT, which the fixed timeout would have lost, are counted
+in signalsync_snmp_slow_replies_total.
+"""
+import threading
+import logging
+from django.conf import settings
+from django.core.cache import cache
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = 'collector:rto:'
+CACHE_TTL = 24 * 60 * 60
+ALPHA = 1 / 8
+BETA = 1 / 4
+K = 4
+
+
+def get_config():
+    defaults = {
+        'ENABLED': True,
+        'INITIAL_TIMEOUT': 2,  # Seconds, before a device has answered
+        'MIN_TIMEOUT': 0.25,  # Floor: agents answer slowly while busy even on a LAN
+        'MAX_TIMEOUT': 10,  # Cap for high-latency links
+    }
+    defaults.update(getattr(settings, 'COLLECTOR', {}).get('ADAPTIVE_TIMEOUT', {}))
+    return defaults
+
+
+class RtoEstimator:
+    """
+    SRTT, RTTVAR and the current timeout per device address.
+    """
+    def __init__(self):
+        self._estimates = {}  # address -> (srtt, rttvar, rto); srtt is None until the first answer
+        self._dirty = set()
+        self._loaded = set()
+        self._lock = threading.Lock()
+        self.saved_seconds = 0.0  # Running total for this process
+
+    def _estimate(self, address):
+        if address not in self._loaded:
+            stored = cache.get(f'{CACHE_PREFIX}{address}')
+            with self._lock:
+                if stored is not None and address not in self._estimates:
+                    self._estimates[address] = tuple(stored)
+                self._loaded.add(address)
+        return self._estimates.get(address)
+
+    def timeout(self, address):
+        """Seconds to wait for one attempt of a GET to address."""
+        config = get_config()
+        if not config['ENABLED']:
+            return config['INITIAL_TIMEOUT']
+        estimate = self._estimate(address)
+        if estimate is None or estimate[0] is None:  # Also snapshots from before timed_out kept INITIAL_TIMEOUT
+            return config['INITIAL_TIMEOUT']
+        return estimate[2]
+
+    def observe(self, address, rtt, timeout):
+        """Sample the RTT of a GET sent with the given per-attempt timeout."""
+        config = get_config()
+        if rtt > config['INITIAL_TIMEOUT']:
+            metrics.SNMP_SLOW_REPLIES.inc()
+        if rtt > timeout:
+            return  # Answered a retry (Karn's algorithm)
+        estimate = self._estimate(address)
+        if estimate is None or estimate[0] is None:
+            srtt, rttvar = rtt, rtt / 2
+        else:
+            srtt, rttvar, _ = estimate
+            rttvar = (1 - BETA) * rttvar + BETA * abs(srtt - rtt)
+            srtt = (1 - ALPHA) * srtt + ALPHA * rtt
+        rto = min(max(srtt + K * rttvar, config['MIN_TIMEOUT']), config['MAX_TIMEOUT'])
+        with self._lock:
+            self._estimates[address] = (srtt, rttvar, rto)
+            self._dirty.add(address)
+
+    def timed_out(self, address, timeout, retries):
+        """Back off after a GET got no answer, and record the time saved."""
+        config = get_config()
+        saved = (config['INITIAL_TIMEOUT'] - timeout) * (retries + 1)
+        if saved:
+            metrics.SNMP_TIMEOUT_SAVED_SECONDS.inc(abs(saved), direction='saved' if saved > 0 else 'extra')
+        srtt, rttvar, _ = self._estimate(address) or (None, None, None)
+        with self._lock:
+            self.saved_seconds += saved
+            if srtt is None:
+                return  # No RTT sample yet: stay at INITIAL_TIMEOUT
+            self._estimates[address] = (srtt, rttvar, min(timeout * 2, config['MAX_TIMEOUT']))
+            self._dirty.add(address)
+
+    def flush(self):
+        """Snapshot changed estimates to the Django cache."""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            snapshot = {f'{CACHE_PREFIX}{address}': self._estimates[address] for address in dirty}
+        if not snapshot:
+            return
+        try:
+            cache.set_many(snapshot, CACHE_TTL)
+        except Exception as e:
+            logger.error(f"Failed to persist SNMP RTT estimates: {e}")
+
+    def forget(self, address):
+        with self._lock:
+            self._estimates.pop(address, None)
+            self._dirty.discard(address)
+            self._loaded.discard(address)
+        cache.delete(f'{CACHE_PREFIX}{address}')
+
+
+estimator = RtoEstimator()
+
+
+def timeout(address):
+    return estimator.timeout(address)
+
+
+def observe(address, rtt, timeout):
+    estimator.observe(address, rtt, timeout)
+
+
+def timed_out(address, timeout, retries):
+    estimator.timed_out(address, timeout, retries)
+
+
+def flush():
+    estimator.flush()
@@ -3,9 +3,29 @@ from rest_framework import serializers
 from .models import Device, DeviceStats
 
 class DeviceSerializer(serializers.ModelSerializer):
+    breaker_state = serializers.ReadOnlyField()
+
     class Meta:
         model = Device
         fields = '__all__'
+        read_only_fields = ['breaker_failures', 'breaker_opened_at', 'breaker_next_probe']
+        extra_kwargs = {
+            'snmp_v3_auth_key': {'write_only': True},
+            'snmp_v3_priv_key': {'write_only': True},
+        }
+
+
+class DeviceBulkSerializer(DeviceSerializer):
+    """
+    DeviceSerializer for the bulk actions. network/bulk.py checks serial
+    number and IP address uniqueness once per batch instead of per item.
+    """
+    class Meta(DeviceSerializer.Meta):
+        extra_kwargs = {
+            **DeviceSerializer.Meta.extra_kwargs,
+            'serial_number': {'validators': []},
+            'ip_address': {'validators': []},
+        }
         
 class DeviceStatsSerializer(serializers.ModelSerializer):
     device_name = serializers.CharField(source='device.name', read_only=True)
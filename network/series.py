@@ -0,0 +1,159 @@
+# network/series.py
+"""
+Multi-device time series on a shared timestamp axis.
+
+The range is cut into fixed buckets of `resolution` seconds, aligned to
+multiples of the resolution so the same range always yields the same
+buckets. Each bucket holds the mean of a device's samples in it, or None
+when there are none. All devices and metrics come from one read:
+
+- with the columnar store enabled, one memory-mapped read per device (no
+  query);
+- otherwise one GROUP BY (device, bucket) query over DeviceStats, so the
+  database returns at most devices x buckets rows however many samples the
+  range holds. Bucket means are cached per chunk of CHUNK_BUCKETS buckets
+  (network/rangecache.py), so past chunks come from the cache and the query
+  only spans chunks that are still open or not cached yet.
+"""
+from datetime import datetime, timezone as dt_timezone
+import numpy as np
+from django.db.models import Avg, FloatField, Func, IntegerField, Value
+from django.db.models.functions import Cast, Floor
+from .models import DeviceStats
+from . import rangecache, tsstore
+
+# Bucket sizes (seconds) picked from when no resolution is requested
+RESOLUTIONS = (1, 5, 10, 15, 30, 60, 120, 300, 600, 900, 1800, 3600, 7200, 21600, 43200, 86400)
+DEFAULT_POINTS = 1000
+MAX_POINTS = 5000
+MAX_DEVICES = 200
+CHUNK_BUCKETS = 96  # Buckets per cached chunk (one day at 15-minute resolution)
+
+
+class EpochSeconds(Func):
+    """
+    Seconds since the Unix epoch of a DateTimeField, per database vendor.
+    SQLite drops the fraction, which doesn't change whole-second buckets.
+    """
+    output_field = FloatField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template="CAST(strftime('%%%%s', %(expressions)s) AS REAL)",
+                           **extra_context)
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template='EXTRACT(EPOCH FROM %(expressions)s)', **extra_context)
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template='UNIX_TIMESTAMP(%(expressions)s)', **extra_context)
+
+
+def pick_resolution(start_ms, end_ms, points=DEFAULT_POINTS, requested=None):
+    """
+    Bucket size in seconds: the requested one if given (made coarse enough for
+    MAX_POINTS buckets), else the finest of RESOLUTIONS giving at most points buckets.
+    """
+    span = max(end_ms - start_ms, 1) / 1000
+    floor = span / MAX_POINTS
+    if requested:
+        return max(int(requested), int(np.ceil(floor)), 1)
+    for resolution in RESOLUTIONS:
+        if span / resolution <= points:
+            return resolution
+    return max(RESOLUTIONS[-1], int(np.ceil(span / points)))
+
+
+def bucket_axis(start_ms, end_ms, resolution):
+    """Start (epoch ms) of every bucket overlapping [start_ms, end_ms]."""
+    step = resolution * 1000
+    first = start_ms // step * step
+    return np.arange(first, end_ms + 1, step, dtype=np.int64)
+
+
+def _bucket_means(timestamps, values, axis, step):
+    """Mean of values per bucket of axis, NaN for empty buckets; NaN values are ignored."""
+    present = ~np.isnan(values)
+    index = (timestamps[present] - axis[0]) // step
+    inside = (index >= 0) & (index < len(axis))
+    index, values = index[inside], values[present][inside].astype(np.float64)
+    sums = np.bincount(index, weights=values, minlength=len(axis))
+    counts = np.bincount(index, minlength=len(axis))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+def read(device_ids, metrics, start_ms, end_ms, resolution):
+    """
+    Return (axis, {device id: {metric: array}}) with bucket means on axis.
+    """
+    axis = bucket_axis(start_ms, end_ms, resolution)
+    step = resolution * 1000
+    series = {device_id: {metric: np.full(len(axis), np.nan) for metric in metrics} for device_id in device_ids}
+    if not len(axis) or not device_ids:
+        return axis, series
+
+    store = tsstore.get_store()
+    if store is not None:
+        for device_id in device_ids:
+            timestamps, columns = store.read_columns(device_id, int(axis[0]), end_ms, metrics)
+            for metric in metrics:
+                series[device_id][metric] = _bucket_means(timestamps, columns[metric], axis, step)
+        return axis, series
+
+    chunk_ms = CHUNK_BUCKETS * step
+
+    def compute(missing_ids, first_ms, last_ms):
+        return _query_chunks(missing_ids, metrics, first_ms, last_ms, resolution, chunk_ms)
+
+    namespace = f"series:{resolution}:{','.join(metrics)}"
+    chunks = rangecache.fetch(namespace, device_ids, int(axis[0]), end_ms, chunk_ms, compute)
+    for device_id, device_chunks in chunks.items():
+        for chunk_start, columns in device_chunks.items():
+            # Chunks are aligned to chunk_ms, so the first and last may stick out of the axis
+            offset = (chunk_start - int(axis[0])) // step
+            lo, hi = max(offset, 0), min(offset + CHUNK_BUCKETS, len(axis))
+            for metric in metrics:
+                series[device_id][metric][lo:hi] = columns[metric][lo - offset:hi - offset]
+    return axis, series
+
+
+def _query_chunks(device_ids, metrics, first_ms, last_ms, resolution, chunk_ms):
+    """
+    Bucket means of the whole chunks in [first_ms, last_ms) from one GROUP BY query:
+    {device id: {chunk start: {metric: array of CHUNK_BUCKETS}}}.
+    """
+    step = resolution * 1000
+    chunk_starts = range(first_ms, last_ms, chunk_ms)
+    chunks = {
+        device_id: {
+            chunk_start: {metric: np.full(CHUNK_BUCKETS, np.nan) for metric in metrics} for chunk_start in chunk_starts
+        }
+        for device_id in device_ids
+    }
+    rows = DeviceStats.objects.filter(
+        device_id__in=device_ids,
+        timestamp__gte=datetime.fromtimestamp(first_ms / 1000, tz=dt_timezone.utc),
+        timestamp__lt=datetime.fromtimestamp(last_ms / 1000, tz=dt_timezone.utc),
+    ).annotate(
+        bucket=Cast(Floor(EpochSeconds('timestamp') / Value(float(resolution))), IntegerField())
+    ).order_by().values('device_id', 'bucket').annotate(
+        **{f'avg_{metric}': Avg(metric) for metric in metrics}
+    ).values_list('device_id', 'bucket', *[f'avg_{metric}' for metric in metrics])
+
+    for device_id, bucket, *values in rows:
+        bucket_ms = bucket * step
+        if not first_ms <= bucket_ms < last_ms:
+            continue
+        chunk_start = bucket_ms - (bucket_ms - first_ms) % chunk_ms
+        position = (bucket_ms - chunk_start) // step
+        columns = chunks[device_id][chunk_start]
+        for metric, value in zip(metrics, values):
+            if value is not None:
+                columns[metric][position] = value
+    return chunks
+
+
+def to_json(values, decimals=3):
+    """Array -> list with NaN as None, rounded to keep the payload small."""
+    values = np.round(values, decimals)
+    return np.where(np.isnan(values), None, values).tolist()
@@ -0,0 +1,92 @@
+# network/sharedcache.py
+"""
+Cache backend for state the pollers and web processes share.
+
+Counter baselines (rates.py), RTT estimates (rto.py), unsupported OIDs and
+the live-read lock (collector.py) and SNMPv3 engine IDs (usm.py) all go
+through the 'default' cache. It has to be shared between processes and
+outlive restarts, so it lives in Redis.
+
+Each of those is only an optimization, so a Redis outage must not stop
+polling. FailSafeRedisCache logs errors (at most once per LOG_INTERVAL
+seconds) and answers like an empty cache: reads miss, add() fails, and
+writes and deletes are dropped.
+"""
+import time
+import logging
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.redis import RedisCache
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+LOG_INTERVAL = 60
+
+CACHE_ERRORS = (RedisError, OSError)
+
+
+class FailSafeRedisCache(RedisCache):
+    def __init__(self, server, params):
+        super().__init__(server, params)
+        self._last_logged = 0
+
+    def _failed(self, operation, error, result):
+        now = time.monotonic()
+        if now - self._last_logged >= LOG_INTERVAL:
+            self._last_logged = now
+            logger.error(f"Shared cache {operation} failed, continuing without it: {error}")
+        return result
+
+    def get(self, key, default=None, version=None):
+        try:
+            return super().get(key, default, version)
+        except CACHE_ERRORS as e:
+            return self._failed('get', e, default)
+
+    def get_many(self, keys, version=None):
+        try:
+            return super().get_many(keys, version)
+        except CACHE_ERRORS as e:
+            return self._failed('get_many', e, {})
+
+    def has_key(self, key, version=None):
+        try:
+            return super().has_key(key, version)
+        except CACHE_ERRORS as e:
+            return self._failed('has_key', e, False)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        try:
+            return super().add(key, value, timeout, version)
+        except CACHE_ERRORS as e:
+            return self._failed('add', e, False)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        try:
+            super().set(key, value, timeout, version)
+        except CACHE_ERRORS as e:
+            self._failed('set', e, None)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        try:
+            return super().set_many(data, timeout, version)
+        except CACHE_ERRORS as e:
+            return self._failed('set_many', e, list(data))
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        try:
+            return super().touch(key, timeout, version)
+        except CACHE_ERRORS as e:
+            return self._failed('touch', e, False)
+
+    def delete(self, key, version=None):
+        try:
+            return super().delete(key, version)
+        except CACHE_ERRORS as e:
+            return self._failed('delete', e, False)
+
+    def delete_many(self, keys, version=None):
+        try:
+            super().delete_many(keys, version)
+        except CACHE_ERRORS as e:
+            self._failed('delete_many', e, None)
@@ -0,0 +1,56 @@
+# network/signals.py
+import threading
+from contextlib import contextmanager
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from .models import Device, DeviceAlert, DeviceStats
+from . import rangecache, rates, recent, rto, tsstore
+
+_deferred = threading.local()
+
+
+def purge_history(devices):
+    """
+    Remove deleted devices' history from the time-series database and drop
+    their in-memory state; devices are (id, ip address) pairs. DeviceStats
+    can't rely on ON DELETE CASCADE because it lives in another database.
+    """
+    if not devices:
+        return
+    device_ids = [device_id for device_id, _ in devices]
+    DeviceStats.objects.filter(device_id__in=device_ids).delete()
+    DeviceAlert.objects.filter(device_id__in=device_ids).delete()
+    rangecache.invalidate(device_ids)
+    store = tsstore.get_store()
+    for device_id, ip_address in devices:
+        if store is not None:
+            store.delete_device(device_id)
+        rates.counters.forget(device_id)
+        recent.samples.forget(device_id)
+        rto.estimator.forget(ip_address)
+
+
+@contextmanager
+def deferred_purge():
+    """
+    Collect the devices deleted inside the block and purge their history in
+    one go when it exits without an error (used by bulk deletes).
+    """
+    _deferred.devices = []
+    try:
+        yield
+        devices = _deferred.devices
+    finally:
+        _deferred.devices = None
+    purge_history(devices)
+
+
+@receiver(post_delete, sender=Device)
+def delete_device_stats(sender, instance, **kwargs):
+    # Django clears instance.pk once the whole delete is done, so keep the id now
+    device = (instance.pk, instance.ip_address)
+    pending = getattr(_deferred, 'devices', None)
+    if pending is not None:
+        pending.append(device)
+    else:
+        purge_history([device])
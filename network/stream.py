@@ -0,0 +1,341 @@
+# network/stream.py
+"""
+Sequenced stream of device stats updates for WebSocket and REST clients.
+
+Every batch of samples written by ingest becomes one delta with the next
+sequence number. The delta is published to the WebSocket group and also
+stored in a ring buffer of STREAM['BUFFER_SIZE'] slots in the cache, where
+slot seq % BUFFER_SIZE holds (seq, delta). A client remembers the last seq it
+saw. When it reconnects with since=<seq> (ws/device-stats/?since=<seq> or
+GET /network/api/changes/?since=<seq>), it gets only the deltas it missed.
+It gets a full snapshot instead when those deltas have already been
+overwritten.
+
+Messages:
+    {"type": "snapshot", "seq": n, "data": [...] or {...}}
+    {"type": "delta", "seq": n, "data": [{"device_id": ..., "cpu_usage": ..., ...}, ...]}
+
+Each branch also has a stream of its own: the rows of its devices get a
+second, per-branch sequence number and ring, and go to the branch's group
+(group_name(branch)). Branch subscribers only receive their slice, and a
+push only reaches the channels that want it.
+
+The counters and rings live in the cache alias STREAM['CACHE']. The ingest
+workers and the WebSocket consumers run in different processes, so that
+alias must be shared between them (Redis). check_cache() stops startup when
+it is process-local and the channel layer isn't.
+"""
+import time
+import hashlib
+import logging
+from datetime import datetime, timezone as dt_timezone
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from .models import Device, DeviceAlert, DeviceStats
+from . import recent
+
+logger = logging.getLogger(__name__)
+
+GROUP = 'all_devices_stats'
+SEQ_KEY = 'stream:seq'
+SLOT_PREFIX = 'stream:slot:'
+METRICS = ('cpu_usage', 'temperature', 'latency', 'bandwidth')
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+IN_MEMORY_CHANNEL_LAYER = 'channels.layers.InMemoryChannelLayer'
+
+
+def get_config():
+    defaults = {
+        'BUFFER_SIZE': 1000,  # Deltas kept for resuming clients
+        'CACHE': 'default',
+        'CLIENT_MAX_RATE': 10,  # Deltas per second per WebSocket client (None: unlimited)
+        'CLIENT_BYTE_BUDGET': 256 * 1024,  # Bytes per second per WebSocket client (None: unlimited)
+    }
+    defaults.update(getattr(settings, 'STREAM', {}))
+    return defaults
+
+
+def get_cache():
+    return caches[get_config()['CACHE']]
+
+
+def check_cache():
+    """
+    Raise ImproperlyConfigured if STREAM['CACHE'] is local to each process
+    while the channel layer is shared. Every process would then number its
+    own deltas, and consumers would miss the ones published elsewhere.
+    """
+    alias = get_config()['CACHE']
+    backend = settings.CACHES.get(alias, {}).get('BACKEND')
+    layer = getattr(settings, 'CHANNEL_LAYERS', {}).get('default', {}).get('BACKEND')
+    if backend in LOCAL_CACHE_BACKENDS and layer != IN_MEMORY_CHANNEL_LAYER:
+        raise ImproperlyConfigured(
+            f"STREAM['CACHE'] ('{alias}') uses {backend}, which isn't shared between processes. "
+            f"Point it at a Redis cache, or use {IN_MEMORY_CHANNEL_LAYER} for a single process."
+        )
+
+
+def group_name(branch=None):
+    """Channel-layer group of the whole stream, or of one branch's slice of it."""
+    if branch is None:
+        return GROUP
+    # Group names only allow a few ASCII characters, branch names don't
+    return f'{GROUP}.{hashlib.sha1(branch.encode()).hexdigest()[:16]}'
+
+
+def _keys(branch):
+    """(sequence counter key, ring slot key prefix) of the whole stream or a branch's."""
+    if branch is None:
+        return SEQ_KEY, SLOT_PREFIX
+    token = group_name(branch).rpartition('.')[2]
+    return f'{SEQ_KEY}:{token}', f'{SLOT_PREFIX}{token}:'
+
+
+def current_seq(branch=None):
+    return get_cache().get(_keys(branch)[0], 0)
+
+
+def _next_seq(cache, key):
+    cache.add(key, 0, None)
+    return cache.incr(key)
+
+
+def make_delta(samples):
+    """The latest sample of each device in a written batch, in the stream's row format."""
+    latest = {}
+    for sample in samples:
+        current = latest.get(sample['device_id'])
+        if current is None or sample['timestamp'] >= current['timestamp']:
+            latest[sample['device_id']] = sample
+    rows = []
+    for device_id, sample in latest.items():
+        timestamp = datetime.fromtimestamp(sample['timestamp'] / 1000, tz=dt_timezone.utc)
+        row = {'device_id': device_id, 'timestamp': timestamp.isoformat()}
+        row.update({metric: sample.get(metric) for metric in METRICS})
+        row['alert_triggered'] = sample.get('alert_triggered', False)
+        row['alert_message'] = sample.get('alert_message') if row['alert_triggered'] else None
+        if 'status' in sample:
+            row['status'] = sample['status']
+        rows.append(row)
+    return rows
+
+
+def select(rows, device_ids=None, metrics=None):
+    """Rows of the given devices only, without the metrics left out of `metrics`."""
+    if device_ids is not None:
+        rows = [row for row in rows if row['device_id'] in device_ids]
+    if metrics is not None:
+        dropped = set(METRICS) - set(metrics)
+        rows = [{key: value for key, value in row.items() if key not in dropped} for row in rows]
+    return rows
+
+
+def _append(branch, rows):
+    """Number, buffer and send one delta of the whole stream (branch None) or a branch's."""
+    seq_key, slot_prefix = _keys(branch)
+    try:
+        cache = get_cache()
+        seq = _next_seq(cache, seq_key)
+        cache.set(f'{slot_prefix}{seq % get_config()["BUFFER_SIZE"]}', (seq, rows), None)
+    except Exception as e:
+        logger.error(f"Failed to buffer stream delta: {e}")
+        return None
+    group = group_name(branch)
+    try:
+        async_to_sync(get_channel_layer().group_send)(group, {
+            'type': 'device_stats_update',
+            'group': group,
+            'seq': seq,
+            'data': rows,
+            'sent_at': time.time(),
+        })
+    except Exception as e:
+        logger.error(f"Failed to publish stream delta {seq} to {group}: {e}")
+    return seq
+
+
+def publish(samples, branches=None):
+    """
+    Give a written batch the next sequence number, keep it in the ring buffer
+    and send it to connected clients. With branches ({device id: branch}),
+    each branch's rows are also published to that branch's stream. Failures
+    are logged: the samples are already stored, and clients catch up from a
+    snapshot.
+    """
+    rows = make_delta(samples)
+    if not rows:
+        return None
+    seq = _append(None, rows)
+    slices = {}
+    for row in rows:
+        branch = (branches or {}).get(row['device_id'])
+        if branch is not None:
+            slices.setdefault(branch, []).append(row)
+    for branch, branch_rows in slices.items():
+        _append(branch, branch_rows)
+    return seq
+
+
+def changes_since(since, device_ids=None, branch=None):
+    """
+    (seq, deltas): every delta after `since`, oldest first, and the seq they
+    bring the client up to. Returns (current seq, None) when the buffer no
+    longer holds all of them and the caller must send a snapshot. Slots at the
+    head that aren't written yet belong to deltas still being published. Those
+    arrive live, so they are left out instead of forcing a snapshot. With
+    device_ids, deltas only contain those devices. With branch, `since` and
+    the result are positions in that branch's stream.
+    """
+    config = get_config()
+    cache = get_cache()
+    slot_prefix = _keys(branch)[1]
+    seq = current_seq(branch)
+    if since > seq or seq - since > config['BUFFER_SIZE']:
+        return seq, None
+    wanted = range(since + 1, seq + 1)
+    slots = cache.get_many([f'{slot_prefix}{n % config["BUFFER_SIZE"]}' for n in wanted])
+
+    deltas, in_flight, covered = [], False, since
+    for n in wanted:
+        entry = slots.get(f'{slot_prefix}{n % config["BUFFER_SIZE"]}')
+        if entry is None or entry[0] < n:
+            in_flight = True
+            continue
+        if in_flight or entry[0] != n:
+            return seq, None  # A gap before a later delta, or the slot was reused: evicted
+        covered, rows = n, select(entry[1], device_ids)
+        if rows:
+            deltas.append({'type': 'delta', 'seq': n, 'data': rows})
+    return covered, deltas
+
+
+def _latest_stats(device, buffered):
+    """The device's newest sample as a dict: from the recent-samples buffer, else DeviceStats/DeviceAlert."""
+    rows = buffered.get(device.id)
+    if rows:
+        return rows[-1]
+    latest = DeviceStats.objects.filter(device=device).order_by('-timestamp').values('timestamp', *METRICS).first()
+    if latest is None:
+        return None
+    message = DeviceAlert.objects.filter(
+        device=device, timestamp=latest['timestamp']
+    ).values_list('message', flat=True).first()
+    latest['alert_triggered'] = message is not None
+    latest['alert_message'] = message or ''
+    return latest
+
+
+def device_snapshot(device_id):
+    """
+    Get latest stats for a specific device
+    """
+    try:
+        device = Device.objects.get(id=device_id)
+        latest_stats = _latest_stats(device, recent.latest([device.id]))
+
+        if latest_stats:
+            return {
+                'device_id': device.id,
+                'name': device.name,
+                'ip_address': device.ip_address,
+                'model': device.model,
+                'status': device.status,
+                'maintenance_mode': device.maintenance_mode,
+                'cpu_usage': latest_stats['cpu_usage'],
+                'temperature': latest_stats['temperature'],
+                'latency': latest_stats['latency'],
+                'bandwidth': latest_stats['bandwidth'],
+                'timestamp': latest_stats['timestamp'].isoformat(),
+                'alert_triggered': latest_stats['alert_triggered'],
+                'alert_message': latest_stats['alert_message'] if latest_stats['alert_triggered'] else None
+            }
+        else:
+            return {
+                'device_id': device.id,
+                'name': device.name,
+                'ip_address': device.ip_address,
+                'model': device.model,
+                'status': device.status,
+                'maintenance_mode': device.maintenance_mode,
+                'cpu_usage': device.cpu_usage,
+                'temperature': device.temperature,
+                'latency': device.latency,
+                'bandwidth': device.bandwidth,
+                'timestamp': device.last_updated.isoformat(),
+                'alert_triggered': False,
+                'alert_message': None
+            }
+    except Device.DoesNotExist:
+        return {'error': f'Device with ID {device_id} not found'}
+
+
+def snapshot(branch=None):
+    """
+    Get latest stats for all devices, or a branch's devices
+    """
+    devices = Device.objects.all()
+    if branch is not None:
+        devices = devices.filter(branch=branch)
+    devices = list(devices)
+    buffered = recent.latest([device.id for device in devices])
+    result = []
+
+    for device in devices:
+        latest_stats = _latest_stats(device, buffered)
+
+        device_data = {
+            'device_id': device.id,
+            'name': device.name,
+            'ip_address': device.ip_address,
+            'model': device.model,
+            'status': device.status,
+            'maintenance_mode': device.maintenance_mode
+        }
+
+        if latest_stats:
+            device_data.update({
+                'cpu_usage': latest_stats['cpu_usage'],
+                'temperature': latest_stats['temperature'],
+                'latency': latest_stats['latency'],
+                'bandwidth': latest_stats['bandwidth'],
+                'timestamp': latest_stats['timestamp'].isoformat(),
+                'alert_triggered': latest_stats['alert_triggered'],
+                'alert_message': latest_stats['alert_message'] if latest_stats['alert_triggered'] else None
+            })
+        else:
+            device_data.update({
+                'cpu_usage': device.cpu_usage,
+                'temperature': device.temperature,
+                'latency': device.latency,
+                'bandwidth': device.bandwidth,
+                'timestamp': device.last_updated.isoformat(),
+                'alert_triggered': False,
+                'alert_message': None
+            })
+
+        result.append(device_data)
+
+    return result
+
+
+def snapshot_message(device_id=None, branch=None, device_ids=None, metrics=None):
+    """
+    A snapshot tagged with the sequence number it is current as of (in the
+    branch's stream if given). The seq is read first, so deltas published
+    during the query are replayed, not lost. device_ids and metrics narrow
+    it like select().
+    """
+    seq = current_seq(branch)
+    if device_id:
+        data = device_snapshot(device_id)
+        if 'error' not in data:
+            data = select([data], metrics=metrics)[0]
+    else:
+        data = select(snapshot(branch), device_ids, metrics)
+    return {'type': 'snapshot', 'seq': seq, 'data': data}
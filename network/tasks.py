@@ -1,12 +1,17 @@
 # network/tasks.py (updated)
 from celery import shared_task
 import logging
-from .models import Device, DeviceStats
-from .api_views import fetch_snmp_data  # Ensure correct import
+import time
+from .models import Device, DeviceAlert, DeviceStats, RequestProfile
+from django.utils import timezone
+from . import breaker, discovery, ingest, metrics, rates, remote, rto, tsstore
 
 # Setup logging
 logger = logging.getLogger(__name__)
 
+# Number of polled samples handed to the ingest pipeline at once
+SUBMIT_BATCH_SIZE = 100
+
 @shared_task
 def update_snmp_data():
     """
@@ -14,88 +19,86 @@ def update_snmp_data():
     Stores historical records in DeviceStats.
     Runs as a scheduled Celery task.
     """
-    devices = Device.objects.all()
+    started = time.perf_counter()
+    saved_before = rto.estimator.saved_seconds
+    devices = remote.centrally_polled(Device.objects.all())  # Skip branches with a standalone collector
+    pending = []
     
     for device in devices:
         try:
-            # Ensure SNMP settings are available
-            snmp_community = device.snmp_community or "public"
-            snmp_version = device.snmp_version or "2c"
-
-            # Fetch SNMP data safely
-            try:
-                cpu_usage = fetch_snmp_data(device.ip_address, '1.3.6.1.4.1.2021.11.10.0', snmp_community, snmp_version)
-                device.cpu_usage = cpu_usage
-            except Exception as e:
-                logger.error(f"Failed to fetch CPU usage for {device.name}: {e}")
-                cpu_usage = None
-
-            try:
-                temperature = fetch_snmp_data(device.ip_address, '1.3.6.1.4.1.2021.13.16.0', snmp_community, snmp_version)
-                device.temperature = temperature
-            except Exception as e:
-                logger.error(f"Failed to fetch temperature for {device.name}: {e}")
-                temperature = None
+            # One GET per device for the OIDs its model supports; devices whose
+            # circuit breaker is open only get a periodic probe
+            values = breaker.poll(device)
+            if values is None:
+                continue
+            for name, value in values.items():
+                setattr(device, name, value)
 
-            try:
-                latency = fetch_snmp_data(device.ip_address, '1.3.6.1.2.1.31.1.1.1.10.1', snmp_community, snmp_version)
-                device.latency = latency
-            except Exception as e:
-                logger.error(f"Failed to fetch latency for {device.name}: {e}")
-                latency = None
-
-            try:
-                bandwidth = fetch_snmp_data(device.ip_address, '1.3.6.1.2.1.31.1.1.1.15.1', snmp_community, snmp_version)
-                device.bandwidth = bandwidth
-            except Exception as e:
-                logger.error(f"Failed to fetch bandwidth for {device.name}: {e}")
-                bandwidth = None
-
-            # Save updated device stats
-            device.save()
-            
-            # Create historical record
-            DeviceStats.objects.create(
-                device=device,
-                cpu_usage=cpu_usage,
-                temperature=temperature,
-                latency=latency,
-                bandwidth=bandwidth
-            )
+            # Hand the sample to the ingest pipeline instead of writing it here
+            pending.append(ingest.make_sample(device.id, timezone.now(), values))
+            if len(pending) >= SUBMIT_BATCH_SIZE:
+                ingest.submit(pending)
+                pending = []
         
         except Exception as e:
             logger.error(f"Error updating SNMP data for {device.name}: {e}")
+
+    if pending:
+        ingest.submit(pending)
+
+    rates.flush()
+    rto.flush()
+    elapsed = time.perf_counter() - started
+    metrics.POLL_CYCLE_SECONDS.observe(elapsed, task='update_snmp_data')
+    _log_timeout_savings('update_snmp_data', elapsed, rto.estimator.saved_seconds - saved_before)
+    metrics.registry.flush()
 logger = logging.getLogger(__name__)
 
 @shared_task
 def poll_all_devices():
-    devices = Device.objects.all()
+    started = time.perf_counter()
+    saved_before = rto.estimator.saved_seconds
+    devices = remote.centrally_polled(Device.objects.all())  # Skip branches with a standalone collector
+    pending = []
     for device in devices:
         try:
-            cpu = fetch_snmp_data(device.ip_address, '1.3.6.1.4.1.2021.11.10.0', device.snmp_community, device.snmp_version)
-            temp = fetch_snmp_data(device.ip_address, '1.3.6.1.4.1.2021.13.16.0', device.snmp_community, device.snmp_version)
-            latency = fetch_snmp_data(device.ip_address, '1.3.6.1.2.1.31.1.1.1.10.1', device.snmp_community, device.snmp_version)
-            bandwidth = fetch_snmp_data(device.ip_address, '1.3.6.1.2.1.31.1.1.1.15.1', device.snmp_community, device.snmp_version)
-
-            # Update current stats in Device
-            device.cpu_usage = cpu
-            device.temperature = temp
-            device.latency = latency
-            device.bandwidth = bandwidth
-            device.save()
-
-            # Log historical stat
-            DeviceStats.objects.create(
-                device=device,
-                cpu_usage=cpu,
-                temperature=temp,
-                latency=latency,
-                bandwidth=bandwidth
-            )
+            values = breaker.poll(device)
+            if values is None:
+                continue
+            pending.append(ingest.make_sample(device.id, timezone.now(), values))
+            if len(pending) >= SUBMIT_BATCH_SIZE:
+                ingest.submit(pending)
+                pending = []
 
         except Exception as e:
             logger.error(f"Polling failed for device {device.ip_address}: {e}")
+
+    if pending:
+        ingest.submit(pending)
+
+    rates.flush()
+    rto.flush()
+    elapsed = time.perf_counter() - started
+    metrics.POLL_CYCLE_SECONDS.observe(elapsed, task='poll_all_devices')
+    _log_timeout_savings('poll_all_devices', elapsed, rto.estimator.saved_seconds - saved_before)
+    metrics.registry.flush()
             
+def _log_timeout_savings(task, elapsed, saved):
+    """Report the wait adaptive timeouts saved (or added) on timed-out GETs this cycle."""
+    if saved:
+        logger.info(f"{task}: cycle took {elapsed:.1f}s, adaptive SNMP timeouts "
+                    f"{'saved' if saved > 0 else 'added'} {abs(saved):.1f}s of timeout waits")
+
+@shared_task
+def discover_devices(ranges=None):
+    """
+    Sweep CIDR ranges ({branch: [CIDR, ...]}, default DISCOVERY['RANGES'])
+    and register the SNMP agents found. See network/discovery.py.
+    """
+    summary = discovery.discover(ranges)
+    metrics.registry.flush()
+    return summary
+
 @shared_task
 def cleanup_old_stats():
     """
@@ -104,6 +107,23 @@ def cleanup_old_stats():
     """
     try:
         DeviceStats.cleanup_old_records()
+        DeviceAlert.cleanup_old_records()
+        RequestProfile.cleanup_old_records()
+        tsstore.cleanup()
         logger.info("Successfully cleaned up old device stats records")
     except Exception as e:
-        logger.error(f"Error cleaning up old stats records: {e}")
\ No newline at end of file
+        logger.error(f"Error cleaning up old stats records: {e}")
+
+@shared_task
+def drain_ingest_buffer():
+    """
+    Write buffered poll results to the database in batched transactions.
+    Routed to the dedicated 'ingest' queue so it never competes with polling.
+    """
+    try:
+        written = ingest.drain()
+        metrics.registry.flush()
+        if written:
+            logger.info(f"Ingested {written} buffered samples")
+    except Exception as e:
+        logger.error(f"Error draining ingest buffer: {e}")
@@ -193,7 +193,7 @@ function updateChartTitle() {
   const metricLabels = {
     'cpu_usage': 'CPU Usage (%)',
     'temperature': 'Temperature (°C)',
-    'latency': 'Latency (ms)',
+    'latency': 'Outbound Traffic (Mbps)',
     'bandwidth': 'Bandwidth (Mbps)'
   };
   
@@ -274,7 +274,7 @@ function updateChart(data) {
   const metricLabels = {
     'cpu_usage': 'CPU Usage (%)',
     'temperature': 'Temperature (°C)',
-    'latency': 'Latency (ms)',
+    'latency': 'Outbound Traffic (Mbps)',
     'bandwidth': 'Bandwidth (Mbps)'
   };
   
@@ -290,7 +290,7 @@ function updateChart(data) {
       threshold = 70; // 70°C is high for most devices
       break;
     case 'latency':
-      threshold = 100; // 100ms is high latency
+      threshold = 100; // 100Mbps outbound is high for a branch uplink
       break;
     case 'bandwidth':
       threshold = 10; // 10Mbps is low bandwidth (context dependent)
@@ -565,7 +565,7 @@ function exportToCSV() {
   const metricLabels = {
     'cpu_usage': 'CPU Usage (%)',
     'temperature': 'Temperature (°C)',
-    'latency': 'Latency (ms)',
+    'latency': 'Outbound Traffic (Mbps)',
     'bandwidth': 'Bandwidth (Mbps)'
   };
   csvContent += `${metricLabels[currentMetric]},Status\n`;
@@ -0,0 +1,83 @@
+# network/tests/test_async_views.py
+from datetime import timedelta
+from unittest import mock
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from network import collector
+from network.models import Device, DeviceStats
+
+LOCAL_ONLY = {
+    'RECENT_SAMPLES': {'REDIS_URL': None},
+    'TIMESERIES_STORE': {'ENABLED': False},
+    'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    'METRICS': {'REDIS_URL': None},
+}
+LIVE = {'cpu_usage': 42.0, 'temperature': 51.0, 'latency': 3.5, 'bandwidth': 1000.0}
+
+
+@override_settings(**LOCAL_ONLY)
+class AsyncViewTests(TestCase):
+    databases = {'default', 'timeseries'}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('viewer')
+        cls.lab = Device.objects.create(serial_number='A-1', ip_address='10.0.3.1', name='lab', model='m', branch='Lab')
+        cls.office = Device.objects.create(
+            serial_number='A-2', ip_address='10.0.3.2', name='office', model='m', branch='Office', cpu_usage=7.0,
+        )
+        now = timezone.now()
+        DeviceStats.objects.bulk_create([
+            DeviceStats(device=cls.lab, timestamp=now - timedelta(minutes=n), cpu_usage=float(n))
+            for n in range(10)
+        ])
+
+    def setUp(self):
+        self.async_client.force_login(self.user)
+
+    async def test_login_required(self):
+        await self.async_client.alogout()
+        response = await self.async_client.get(reverse('async-current-stats'))
+        self.assertEqual(response.status_code, 302)
+
+    async def test_device_live_merges_live_values(self):
+        with mock.patch.object(collector, 'alive_read', mock.AsyncMock(return_value=(LIVE, True))) as alive_read:
+            response = await self.async_client.get(reverse('async-device-live', args=[self.lab.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(alive_read.call_args.args[0].pk, self.lab.pk)
+        data = response.json()
+        self.assertEqual((data['name'], data['cpu_usage'], data['bandwidth']), ('lab', 42.0, 1000.0))
+
+    async def test_device_live_unknown_device(self):
+        response = await self.async_client.get(reverse('async-device-live', args=[999999]))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_current_stats_of_the_session_branch(self):
+        response = await self.async_client.get(reverse('async-current-stats'))
+        self.assertEqual({row['name'] for row in response.json()}, {'lab', 'office'})
+
+        session = await self.async_client.asession()
+        session['branch'] = 'Office'
+        await session.asave()
+        response = await self.async_client.get(reverse('async-current-stats'))
+        self.assertEqual([(row['name'], row['cpu_usage']) for row in response.json()], [('office', 7.0)])
+
+    async def test_historical_stats_every_nth_row(self):
+        response = await self.async_client.get(reverse('async-historical-stats', args=[self.lab.pk]) + '?interval=3')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['cpu_usage'] for row in response.json()], [9.0, 6.0, 3.0, 0.0])
+
+    async def test_historical_stats_downsampled(self):
+        response = await self.async_client.get(reverse('async-historical-stats', args=[self.lab.pk]) + '?points=4')
+        rows = response.json()
+        self.assertEqual(len(rows), 4)
+        self.assertEqual((rows[0]['cpu_usage'], rows[-1]['cpu_usage']), (9.0, 0.0))
+
+    async def test_historical_stats_bad_parameters(self):
+        for query in ('days=x', 'interval=1.5', 'points=abc'):
+            response = await self.async_client.get(reverse('async-historical-stats', args=[self.lab.pk]) + f'?{query}')
+            self.assertEqual(response.status_code, 400, query)
+        response = await self.async_client.get(reverse('async-historical-stats', args=[999999]))
+        self.assertEqual(response.status_code, 404)
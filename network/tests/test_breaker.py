@@ -0,0 +1,97 @@
+# network/tests/test_breaker.py
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from network import breaker, metrics
+from network.models import Device
+
+VALUES = {'cpu_usage': 12.0}
+ANSWERED = SimpleNamespace(timed_out=False)
+TIMED_OUT = SimpleNamespace(timed_out=True)
+
+
+@override_settings(
+    COLLECTOR={'BREAKER': {'FAILURE_THRESHOLD': 3, 'BASE_BACKOFF': 30, 'MAX_BACKOFF': 120}},
+    METRICS={'REDIS_URL': None},
+)
+class BreakerTests(TestCase):
+    def setUp(self):
+        self.device = Device.objects.create(
+            serial_number='B-1', ip_address='10.0.0.2', name='sw2', model='m', branch='A'
+        )
+        self.now = timezone.now()
+
+    def poll(self, response, now=None):
+        with mock.patch.object(breaker.collector, 'query', return_value=(VALUES, response)) as query:
+            values = breaker.poll(self.device, now or self.now)
+        return values, query.called
+
+    def skipped_polls(self):
+        return metrics.BREAKER_SKIPPED_POLLS._local.get('', 0)
+
+    def open_breaker(self):
+        with self.assertLogs('network.breaker', 'WARNING'):
+            for _ in range(3):
+                self.poll(TIMED_OUT)
+        self.assertIsNotNone(self.device.breaker_opened_at)
+
+    def test_backoff_doubles_up_to_max(self):
+        config = breaker.get_config()
+        self.assertEqual([breaker.backoff(failures, config) for failures in range(1, 7)], [30, 30, 30, 60, 120, 120])
+
+    def test_opens_after_threshold_consecutive_timeouts(self):
+        self.poll(TIMED_OUT)
+        self.poll(TIMED_OUT)
+        self.assertIsNone(self.device.breaker_opened_at)
+        with self.assertLogs('network.breaker', 'WARNING'):
+            self.poll(TIMED_OUT)
+
+        self.device.refresh_from_db()
+        self.assertEqual(self.device.breaker_failures, 3)
+        self.assertEqual(self.device.breaker_opened_at, self.now)
+        self.assertEqual(self.device.breaker_next_probe, self.now + timedelta(seconds=30))
+
+    def test_answer_resets_failure_count(self):
+        self.poll(TIMED_OUT)
+        self.poll(TIMED_OUT)
+        self.assertEqual(self.poll(ANSWERED), (VALUES, True))
+        self.device.refresh_from_db()
+        self.assertEqual(self.device.breaker_failures, 0)
+
+    def test_open_breaker_skips_polls_until_probe_due(self):
+        self.open_breaker()
+        skipped = self.skipped_polls()
+        with mock.patch.object(breaker, 'probe') as probe:
+            self.assertEqual(self.poll(TIMED_OUT, self.now + timedelta(seconds=10)), (None, False))
+        probe.assert_not_called()
+        self.assertEqual(self.skipped_polls(), skipped + 1)
+
+    def test_unanswered_probe_backs_off(self):
+        self.open_breaker()
+        skipped = self.skipped_polls()
+        probe_at = self.now + timedelta(seconds=30)
+        with mock.patch.object(breaker, 'probe', return_value=False):
+            self.assertEqual(self.poll(ANSWERED, probe_at), (None, False))
+        self.assertEqual(self.device.breaker_failures, 4)
+        self.assertEqual(self.device.breaker_next_probe, probe_at + timedelta(seconds=60))
+        self.assertEqual(self.skipped_polls(), skipped)
+
+    def test_answered_probe_closes_and_polls(self):
+        self.open_breaker()
+        skipped = self.skipped_polls()
+        with mock.patch.object(breaker, 'probe', return_value=True):
+            self.assertEqual(self.poll(ANSWERED, self.now + timedelta(seconds=30)), (VALUES, True))
+
+        self.device.refresh_from_db()
+        self.assertEqual(
+            (self.device.breaker_failures, self.device.breaker_opened_at, self.device.breaker_next_probe), (0, None, None)
+        )
+        self.assertEqual(self.skipped_polls(), skipped)
+
+    def test_reset(self):
+        self.open_breaker()
+        breaker.reset(Device.objects.filter(pk=self.device.pk))
+        self.device.refresh_from_db()
+        self.assertIsNone(self.device.breaker_opened_at)
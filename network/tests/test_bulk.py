@@ -0,0 +1,83 @@
+# network/tests/test_bulk.py
+from unittest import mock
+from django.db import IntegrityError
+from django.test import TestCase, override_settings
+from network import bulk
+from network.models import Device
+
+
+def device(n, **fields):
+    values = {'serial_number': f'SN{n}', 'ip_address': f'10.0.0.{n}', 'name': f'd{n}', 'model': 'm', 'branch': 'Lab'}
+    values.update(fields)
+    return values
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    METRICS={'REDIS_URL': None},
+)
+class BulkViewTests(TestCase):
+    def post(self, action, body):
+        return self.client.post(f'/api/devices/{action}/', body, content_type='application/json')
+
+    def test_create_reports_each_item(self):
+        Device.objects.create(**device(1))
+        response = self.post('bulk-create', {'devices': [device(1), device(2), device(3, ip_address='x'), device(4, serial_number='SN2')]})
+        self.assertEqual(response.status_code, 200)
+        statuses = [result['status'] for result in response.json()['results']]
+        self.assertEqual(statuses, ['error', 'created', 'error', 'error'])
+        self.assertEqual(Device.objects.count(), 2)
+
+    def test_update_selection(self):
+        for n in (1, 2, 3):
+            Device.objects.create(**device(n, branch='Old' if n < 3 else 'Lab'))
+        response = self.post('bulk-update', {'filter': {'branch': 'Old'}, 'changes': {'model': 'new'}})
+        self.assertEqual(response.json()['counts'], {'updated': 2})
+        self.assertEqual(Device.objects.filter(model='new').count(), 2)
+
+    def test_update_items_and_not_found(self):
+        pk = Device.objects.create(**device(1)).pk
+        response = self.post('bulk-update', {'devices': [{'id': pk, 'name': 'renamed'}, {'id': pk + 100, 'name': 'x'}]})
+        self.assertEqual([result['status'] for result in response.json()['results']], ['updated', 'not_found'])
+        self.assertEqual(Device.objects.get(pk=pk).name, 'renamed')
+
+    def test_delete_by_ids(self):
+        pk = Device.objects.create(**device(1)).pk
+        with mock.patch('network.signals.purge_history') as purge:
+            response = self.post('bulk-delete', {'ids': [pk, pk + 100]})
+        self.assertEqual([result['status'] for result in response.json()['results']], ['deleted', 'not_found'])
+        self.assertFalse(Device.objects.exists())
+        purge.assert_called_once()
+
+    def test_maintenance_set_and_toggle(self):
+        on = Device.objects.create(**device(1, maintenance_mode=True)).pk
+        off = Device.objects.create(**device(2)).pk
+        self.post('bulk-maintenance', {'ids': [on, off]})
+        self.assertEqual(dict(Device.objects.values_list('pk', 'maintenance_mode')), {on: False, off: True})
+        response = self.post('bulk-maintenance', {'filter': {'maintenance_mode': True}, 'maintenance_mode': False})
+        self.assertEqual(response.json()['results'], [{'index': 0, 'id': off, 'status': 'updated', 'maintenance_mode': False}])
+        self.assertFalse(Device.objects.filter(maintenance_mode=True).exists())
+
+    def test_bad_filter_value_is_400(self):
+        Device.objects.create(**device(1))
+        for action in ('bulk-update', 'bulk-delete', 'bulk-maintenance'):
+            response = self.post(action, {'filter': {'maintenance_mode': 'abc'}, 'changes': {'model': 'x'}})
+            self.assertEqual(response.status_code, 400, action)
+            self.assertIn('maintenance_mode', response.json()['error'])
+        self.assertEqual(self.post('bulk-delete', {'filter': {'name': 'd1'}}).status_code, 400)
+        self.assertTrue(Device.objects.exists())
+
+    def test_conflict_rolls_back_and_is_409(self):
+        # A concurrent insert of the same serial number after the uniqueness check
+        with mock.patch.object(bulk, '_unique_errors', return_value={}), self.assertLogs('network.api_views', 'ERROR'):
+            response = self.post('bulk-create', {'devices': [device(1), device(2, serial_number='SN1')]})
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Device.objects.exists())
+
+    def test_update_conflict_rolls_back(self):
+        first = Device.objects.create(**device(1)).pk
+        second = Device.objects.create(**device(2)).pk
+        with mock.patch.object(bulk, '_unique_errors', return_value={}), self.assertLogs('network.api_views', 'ERROR'):
+            response = self.post('bulk-update', {'devices': [{'id': first, 'name': 'a'}, {'id': second, 'serial_number': 'SN1'}]})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Device.objects.get(pk=first).name, 'd1')
@@ -0,0 +1,267 @@
+# network/tests/test_collector.py
+import threading
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from django.utils import timezone
+from pysnmp.proto.rfc1902 import Counter64, Gauge32, Integer
+from pysnmp.proto.rfc1905 import NoSuchInstance, NoSuchObject
+from network import collector, recent
+
+CPU = collector.METRIC_REGISTRY['cpu_usage'].oid
+TEMPERATURE = collector.METRIC_REGISTRY['temperature'].oid
+OUT_OCTETS = collector.METRIC_REGISTRY['latency'].oid
+ALT_CPU = '1.3.6.1.4.1.9.9.109.1.1.1.1.8.1'
+LOCAL_ONLY = {
+    'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    'METRICS': {'REDIS_URL': None},
+    'RECENT_SAMPLES': {'REDIS_URL': None},
+}
+
+
+def device(address='10.0.1.1', model='generic', pk=1):
+    return SimpleNamespace(pk=pk, ip_address=address, model=model)
+
+
+def reply(*pairs, error_status=0, error_index=0, error_indication=None):
+    """What getCmd yields: (errorIndication, errorStatus, errorIndex, varBinds)."""
+    return error_indication, Integer(error_status), Integer(error_index), [(oid, value) for oid, value in pairs]
+
+
+@override_settings(**LOCAL_ONLY, COLLECTOR={'MODEL_PROFILES': {
+    'cisco': {'cpu_usage': ALT_CPU, 'temperature': None},
+}})
+class ProfileTests(SimpleTestCase):
+    def test_default_profile_polls_every_metric(self):
+        self.assertEqual(
+            collector.get_profile('generic'),
+            {name: definition.oid for name, definition in collector.METRIC_REGISTRY.items()},
+        )
+
+    def test_model_profile_swaps_and_drops_oids(self):
+        profile = collector.get_profile('cisco')
+        self.assertEqual(profile['cpu_usage'], ALT_CPU)
+        self.assertNotIn('temperature', profile)
+        self.assertEqual(profile['bandwidth'], collector.METRIC_REGISTRY['bandwidth'].oid)
+
+    def test_dropped_metric_is_none_and_not_requested(self):
+        result, requested = collector._plan(device(model='cisco'), None)
+        self.assertIsNone(result['temperature'])
+        self.assertNotIn(TEMPERATURE, requested.values())
+        self.assertIn(ALT_CPU, collector.request_oids(device(model='cisco')))
+
+
+@override_settings(**LOCAL_ONLY, COLLECTOR={'UNSUPPORTED_TTL': 60})
+class UnsupportedOidCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.unsupported = collector.UnsupportedOidCache()
+
+    def mark(self, address, oid):
+        with self.assertLogs('network.collector', 'INFO'):
+            self.unsupported.mark(address, oid)
+
+    def test_mark_and_clear(self):
+        self.assertFalse(self.unsupported.is_unsupported('10.0.1.1', CPU))
+        self.mark('10.0.1.1', CPU)
+        self.assertTrue(self.unsupported.is_unsupported('10.0.1.1', CPU))
+        self.assertFalse(self.unsupported.is_unsupported('10.0.1.2', CPU))
+        self.unsupported.clear('10.0.1.1', CPU)
+        self.assertFalse(self.unsupported.is_unsupported('10.0.1.1', CPU))
+
+    def test_shared_with_other_workers(self):
+        self.mark('10.0.1.1', CPU)
+        self.assertTrue(collector.UnsupportedOidCache().is_unsupported('10.0.1.1', CPU))
+
+    def test_expires(self):
+        self.mark('10.0.1.1', CPU)
+        cache.clear()
+        self.unsupported._local[('10.0.1.1', CPU)] = 0
+        self.assertFalse(self.unsupported.is_unsupported('10.0.1.1', CPU))
+
+    def test_skipped_by_plan(self):
+        with mock.patch.object(collector, 'unsupported_oids', self.unsupported):
+            self.mark('10.0.1.1', CPU)
+            self.assertNotIn(CPU, collector.request_oids(device()))
+            self.assertIn(CPU, collector.request_oids(device(address='10.0.1.2')))
+
+
+@override_settings(**LOCAL_ONLY, COLLECTOR={})
+class ResultsTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        patcher = mock.patch.object(collector, 'unsupported_oids', collector.UnsupportedOidCache())
+        self.unsupported = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def response(self, values, unsupported=(), counter_bits=None):
+        response = collector.SnmpResponse()
+        response.values = values
+        response.unsupported = set(unsupported)
+        response.counter_bits = counter_bits or {}
+        response.received_at = 100.0
+        return response
+
+    def test_gauges_are_stored_as_read(self):
+        result = collector.from_response(device(), self.response({CPU: 12.5}))
+        self.assertEqual(result['cpu_usage'], 12.5)
+        self.assertIsNone(result['temperature'])
+
+    def test_counters_become_scaled_rates(self):
+        with mock.patch.object(collector.rates, 'rate', return_value=1_000_000.0) as rate:
+            result = collector.from_response(device(), self.response({OUT_OCTETS: 5000}, counter_bits={OUT_OCTETS: 64}))
+        rate.assert_called_once_with(1, OUT_OCTETS, 5000, 100.0, 64)
+        self.assertAlmostEqual(result['latency'], 8.0)  # 1 MB/s is 8 Mbps
+
+    def test_first_counter_reading_has_no_value(self):
+        with mock.patch.object(collector.rates, 'rate', return_value=None):
+            result = collector.from_response(device(), self.response({OUT_OCTETS: 5000}))
+        self.assertIsNone(result['latency'])
+
+    def test_non_numeric_values_are_ignored(self):
+        result = collector.from_response(device(), self.response({CPU: 'n/a'}))
+        self.assertIsNone(result['cpu_usage'])
+
+    def test_unsupported_oids_are_remembered(self):
+        with self.assertLogs('network.collector', 'INFO'):
+            collector.from_response(device(), self.response({}, unsupported=[TEMPERATURE]))
+        self.assertTrue(self.unsupported.is_unsupported('10.0.1.1', TEMPERATURE))
+
+
+@override_settings(**LOCAL_ONLY, COLLECTOR={'ADAPTIVE_TIMEOUT': {'ENABLED': False}})
+class SnmpGetTests(SimpleTestCase):
+    def get(self, replies, oids, version='2c'):
+        with mock.patch.object(collector, 'getCmd', side_effect=[iter([r]) for r in replies]) as get_cmd:
+            response = collector.snmp_get('10.0.1.9', oids, version=version, timeout=1)
+        return response, get_cmd
+
+    def test_one_pdu_for_all_oids(self):
+        response, get_cmd = self.get([reply((CPU, Gauge32(7)), (OUT_OCTETS, Counter64(2 ** 40)))], [CPU, OUT_OCTETS])
+        self.assertEqual(get_cmd.call_count, 1)
+        self.assertEqual(response.values, {CPU: 7.0, OUT_OCTETS: 2 ** 40})
+        self.assertEqual(response.counter_bits, {OUT_OCTETS: 64})
+
+    def test_no_such_object_is_unsupported(self):
+        response, _ = self.get([reply((CPU, NoSuchObject()), (TEMPERATURE, NoSuchInstance()))], [CPU, TEMPERATURE])
+        self.assertEqual(response.unsupported, {CPU, TEMPERATURE})
+        self.assertEqual(response.values, {})
+
+    def test_v1_no_such_name_repeats_without_the_oid(self):
+        response, get_cmd = self.get([
+            reply(error_status=collector.NO_SUCH_NAME, error_index=2),
+            reply((CPU, Gauge32(7))),
+        ], [CPU, TEMPERATURE], version='1')
+        self.assertEqual(get_cmd.call_count, 2)
+        self.assertEqual(len(get_cmd.call_args.args[4:]), 1)
+        self.assertEqual(response.unsupported, {TEMPERATURE})
+        self.assertEqual(response.values, {CPU: 7.0})
+
+    def test_timeout(self):
+        with self.assertLogs('network.collector', 'ERROR'):
+            response, _ = self.get([reply(error_indication='No SNMP response received before timeout')], [CPU])
+        self.assertTrue(response.timed_out)
+        self.assertEqual(response.values, {})
+
+
+@override_settings(**LOCAL_ONLY, COLLECTOR={'LIVE_FRESH_SECONDS': 30, 'LIVE_CACHE_SECONDS': 5})
+class LiveReadTests(SimpleTestCase):
+    VALUES = {'cpu_usage': 40.0, 'temperature': 50.0, 'latency': 1.0, 'bandwidth': 1000.0}
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        patcher = mock.patch.object(collector.recent, 'samples', recent.RecentSamples())
+        self.recent = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.device = SimpleNamespace(
+            pk=7, ip_address='10.0.1.7', model='generic', breaker_opened_at=None, cpu_usage=5.0,
+            temperature=None, latency=None, bandwidth=None,
+        )
+
+    def record(self, age, cpu_usage=20.0):
+        timestamp = timezone.now() - timedelta(seconds=age)
+        self.recent.record([{'device_id': 7, 'timestamp': int(timestamp.timestamp() * 1000), 'cpu_usage': cpu_usage}])
+
+    def live_read(self, collect=None):
+        with mock.patch.object(collector, 'collect', collect or mock.Mock(return_value=self.VALUES)) as patched:
+            return collector.live_read(self.device), patched
+
+    def test_fresh_poller_sample(self):
+        self.record(age=5)
+        (values, queried), collect = self.live_read()
+        self.assertEqual(values['cpu_usage'], 20.0)
+        self.assertFalse(queried)
+        collect.assert_not_called()
+
+    def test_stale_sample_queries_and_caches(self):
+        self.record(age=60)
+        (values, queried), collect = self.live_read()
+        self.assertEqual((values, queried), (self.VALUES, True))
+        (values, queried), collect = self.live_read()
+        self.assertEqual((values, queried), (self.VALUES, False))
+        collect.assert_not_called()
+
+    def test_breaker_open_returns_stored_values(self):
+        self.device.breaker_opened_at = timezone.now()
+        (values, queried), collect = self.live_read()
+        self.assertEqual(values['cpu_usage'], 5.0)
+        self.assertFalse(queried)
+        collect.assert_not_called()
+
+    @override_settings(COLLECTOR={'LIVE_FRESH_SECONDS': 30, 'LIVE_CACHE_SECONDS': 0})
+    def test_uncached(self):
+        self.live_read()
+        (_, queried), collect = self.live_read()
+        self.assertTrue(queried)
+        collect.assert_called_once()
+
+    def test_concurrent_readers_share_one_query(self):
+        started, release = threading.Event(), threading.Event()
+
+        def slow_collect(device):
+            started.set()
+            release.wait(5)
+            return self.VALUES
+
+        collect = mock.Mock(side_effect=slow_collect)
+        results = []
+        with mock.patch.object(collector, 'collect', collect):
+            readers = [threading.Thread(target=lambda: results.append(collector.live_read(self.device))) for _ in range(5)]
+            readers[0].start()
+            started.wait(5)
+            for reader in readers[1:]:
+                reader.start()
+            time.sleep(0.1)
+            release.set()
+            for reader in readers:
+                reader.join(5)
+        collect.assert_called_once()
+        self.assertEqual([values for values, _ in results], [self.VALUES] * 5)
+        self.assertEqual(sum(queried for _, queried in results), 1)
+
+    def test_waits_for_another_process_holding_the_lock(self):
+        cache.add(f'{collector.LIVE_LOCK_PREFIX}7', 1, 5)
+        other = threading.Timer(0.2, cache.set, (f'{collector.LIVE_CACHE_PREFIX}7', self.VALUES, 5))
+        other.start()
+        self.addCleanup(other.cancel)
+        (values, queried), collect = self.live_read()
+        self.assertEqual((values, queried), (self.VALUES, False))
+        collect.assert_not_called()
+
+
+class SingleFlightTests(SimpleTestCase):
+    def test_sequential_calls_each_run(self):
+        flights = collector.SingleFlight()
+        self.assertEqual(flights.do('a', lambda: 1), (1, True))
+        self.assertEqual(flights.do('a', lambda: 2), (2, True))
+
+    def test_failure_releases_the_key(self):
+        flights = collector.SingleFlight()
+        with self.assertRaises(ZeroDivisionError):
+            flights.do('a', lambda: 1 / 0)
+        self.assertEqual(flights.do('a', lambda: 1), (1, True))
@@ -0,0 +1,118 @@
+# network/tests/test_discovery.py
+import asyncio
+from unittest import mock
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from network import discovery
+from network.models import Device
+
+CONFIG = {
+    'COMMUNITIES': ['public'], 'SNMP_VERSION': '2c', 'TIMEOUT': 1, 'RETRIES': 0, 'ICMP': False,
+    'CONCURRENCY': 4, 'RATE': 0, 'BATCH_SIZE': 100, 'MAX_ADDRESSES': 1024, 'MODELS': {},
+}
+
+
+def record(ip, serial='', model='model', profiled=False):
+    return {
+        'ip_address': ip, 'serial_number': serial, 'name': ip, 'model': model,
+        'profiled': profiled, 'snmp_community': 'public', 'branch': 'Lab',
+    }
+
+
+@override_settings(DISCOVERY=CONFIG)
+class RangeTests(SimpleTestCase):
+    def test_parse_ranges(self):
+        self.assertEqual(discovery.parse_ranges({'Lab': ['10.0.0.7/30']}), {'Lab': ['10.0.0.4/30']})
+        for bad in ({}, {'Lab': '10.0.0.0/30'}, {'Lab': ['10.0.0.0/33']}, {'Lab': ['10.0.0.0/16']}):
+            with self.assertRaises(ValueError):
+                discovery.parse_ranges(bad)
+
+    def test_public_ranges_are_rejected(self):
+        for bad in ({'Lab': ['8.8.8.0/30']}, {'Lab': ['172.32.0.0/30']}, {'Lab': ['10.0.0.0/7']}, {'Lab': ['fd00::/126']}):
+            with self.assertRaises(ValueError):
+                discovery.parse_ranges(bad)
+
+    def test_configured_ranges_are_allowed(self):
+        with self.settings(DISCOVERY=dict(CONFIG, RANGES={'DMZ': ['198.51.100.0/24']})):
+            self.assertEqual(discovery.parse_ranges({'DMZ': ['198.51.100.8/29']}), {'DMZ': ['198.51.100.8/29']})
+            with self.assertRaises(ValueError):
+                discovery.parse_ranges({'DMZ': ['198.51.101.0/29']})
+
+    def test_addresses_are_host_addresses(self):
+        self.assertEqual(list(discovery.addresses({'Lab': ['10.0.0.0/30']})), [('10.0.0.1', 'Lab'), ('10.0.0.2', 'Lab')])
+
+    def test_overlapping_ranges_yield_each_address_once(self):
+        targets = list(discovery.addresses({'A': ['10.0.0.0/29', '10.0.0.0/30'], 'B': ['10.0.0.0/28']}))
+        addresses = [address for address, _ in targets]
+        self.assertEqual(len(addresses), len(set(addresses)))
+        self.assertEqual(len(addresses), 14)
+        self.assertEqual(dict(targets)['10.0.0.1'], 'A')  # The first range listed claims it
+        self.assertEqual(dict(targets)['10.0.0.9'], 'B')
+
+    def test_model_for_longest_prefix(self):
+        models = {'1.3.6.1.4.1.9': 'Cisco', '1.3.6.1.4.1.9.1.1208': 'Catalyst 2960'}
+        self.assertEqual(discovery.model_for('1.3.6.1.4.1.9.1.1208', models), ('Catalyst 2960', True))
+        self.assertEqual(discovery.model_for('1.3.6.1.4.1.9.1.516', models), ('Cisco', True))
+        self.assertEqual(discovery.model_for('1.3.6.1.4.1.99', models), ('1.3.6.1.4.1.99', False))
+
+    @override_settings(SNMP_PORT=16161)
+    def test_identify_uses_snmp_port(self):
+        reply = (None, 0, 0, [])
+        with mock.patch.object(discovery.asyncsnmp, 'get', mock.AsyncMock(return_value=reply)) as get:
+            asyncio.run(discovery._identify('10.0.0.1', 'public', CONFIG))
+        self.assertEqual(get.call_args.args[:2], ('10.0.0.1', 16161))
+
+
+@override_settings(DISCOVERY=CONFIG, METRICS={'REDIS_URL': None})
+class UpsertTests(TransactionTestCase):
+    def test_creates_with_placeholder_serial(self):
+        counts = discovery.upsert([record('10.0.0.1'), record('10.0.0.2', 'SN2')])
+        self.assertEqual(counts, {'created': 2, 'updated': 0})
+        self.assertEqual(
+            set(Device.objects.values_list('serial_number', flat=True)), {'auto-10.0.0.1', 'SN2'}
+        )
+
+    def test_moved_device_matched_by_serial(self):
+        device = Device.objects.create(serial_number='SN1', ip_address='10.0.1.1', name='old', model='old', branch='Keep')
+        counts = discovery.upsert([record('10.0.0.1', 'SN1', 'Catalyst', profiled=True)])
+        self.assertEqual(counts['updated'], 1)
+        device.refresh_from_db()
+        self.assertEqual((device.ip_address, device.model, device.branch), ('10.0.0.1', 'Catalyst', 'Keep'))
+
+    def test_serial_of_another_device_is_skipped(self):
+        Device.objects.create(serial_number='SN1', ip_address='10.0.1.1', name='a', model='m', branch='Keep')
+        Device.objects.create(serial_number='SN2', ip_address='10.0.0.2', name='b', model='m', branch='Keep')
+        with self.assertLogs('network.discovery', 'WARNING'):
+            counts = discovery.upsert([record('10.0.0.2', 'SN1')])
+        self.assertEqual(counts['skipped'], 1)
+
+    def test_sweep_of_overlapping_ranges_registers_each_agent_once(self):
+        async def probe(address, config, executor=None):
+            return dict(record(address), branch=None), False
+
+        with mock.patch.object(discovery, 'probe', probe):
+            counts = asyncio.run(discovery.sweep({'A': ['10.0.0.0/29'], 'B': ['10.0.0.0/28']}, CONFIG))
+        self.assertEqual((counts['addresses'], counts['created'], counts['skipped']), (14, 14, 0))
+        self.assertEqual(Device.objects.filter(branch='A').count(), 6)
+
+
+@override_settings(DISCOVERY=CONFIG, CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class DiscoverViewTests(TestCase):
+    URL = '/api/devices/discover/'
+
+    def post(self, ranges):
+        return self.client.post(self.URL, {'ranges': ranges}, content_type='application/json')
+
+    def test_requires_staff(self):
+        self.assertEqual(self.post({'Lab': ['10.0.0.0/30']}).status_code, 403)
+        self.client.force_login(User.objects.create_user('user', password='x'))
+        self.assertEqual(self.post({'Lab': ['10.0.0.0/30']}).status_code, 403)
+
+    def test_staff_queues_a_sweep(self):
+        self.client.force_login(User.objects.create_user('admin', password='x', is_staff=True))
+        with mock.patch('network.tasks.discover_devices.delay') as delay:
+            delay.return_value.id = 'task'
+            response = self.post({'Lab': ['10.0.0.0/30']})
+            self.assertEqual(response.status_code, 202)
+            self.assertEqual(self.post({'Lab': ['8.8.8.0/30']}).status_code, 400)
+        delay.assert_called_once_with({'Lab': ['10.0.0.0/30']})
@@ -0,0 +1,67 @@
+# network/tests/test_downsample.py
+import numpy as np
+from django.test import SimpleTestCase, TestCase, override_settings
+from network import downsample
+from network.models import Device
+
+
+class LttbTests(SimpleTestCase):
+    def setUp(self):
+        self.x = np.arange(1000, dtype=np.float64)
+        self.y = np.sin(self.x / 50)
+
+    def test_short_series_kept_whole(self):
+        self.assertEqual(downsample.lttb(self.x[:10], self.y[:10], 20).tolist(), list(range(10)))
+
+    def test_keeps_endpoints_and_point_budget(self):
+        keep = downsample.lttb(self.x, self.y, 100)
+        self.assertEqual(len(keep), 100)
+        self.assertEqual((keep[0], keep[-1]), (0, 999))
+        self.assertTrue(np.all(np.diff(keep) > 0))
+
+    def test_keeps_spikes(self):
+        y = np.zeros(1000)
+        y[123], y[777] = 100, -100
+        keep = downsample.lttb(self.x, y, 50)
+        self.assertIn(123, keep)
+        self.assertIn(777, keep)
+
+    def test_one_point_per_bucket(self):
+        keep = downsample.lttb(self.x, self.y, 12)
+        edges = np.linspace(1, 999, 11).astype(np.int64)
+        for bucket, index in enumerate(keep[1:-1]):
+            self.assertTrue(edges[bucket] <= index < edges[bucket + 1])
+
+    def test_parse_points(self):
+        self.assertEqual(downsample.parse_points(None), downsample.DEFAULT_POINTS)
+        self.assertEqual(downsample.parse_points('1'), 3)
+        self.assertEqual(downsample.parse_points('99999'), downsample.MAX_POINTS)
+        with self.assertRaises(ValueError):
+            downsample.parse_points('many')
+
+    def test_downsample_series_drops_missing_readings(self):
+        values = self.y.copy()
+        values[::2] = np.nan
+        timestamps, kept = downsample.downsample_series(self.x.astype(np.int64), values, 50)
+        self.assertEqual(len(kept), 50)
+        self.assertFalse(np.isnan(kept).any())
+        self.assertTrue(np.all(timestamps % 2 == 1))
+
+    def test_shared_indices_union_of_metrics(self):
+        cpu = np.zeros(1000)
+        cpu[100] = 1
+        latency = np.zeros(1000)
+        latency[900] = 1
+        keep = downsample.shared_indices(self.x, {'cpu_usage': cpu, 'latency': latency}, 10)
+        self.assertIn(100, keep)
+        self.assertIn(900, keep)
+        self.assertLessEqual(len(keep), 20)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}, METRICS={'REDIS_URL': None})
+class HistoricalStatsViewTests(TestCase):
+    def test_bad_points_is_400(self):
+        device = Device.objects.create(serial_number='SN1', ip_address='10.0.0.1', name='a', model='m', branch='Lab')
+        for query in ('points=abc', 'days=x', 'interval=1.5'):
+            response = self.client.get(f'/api/devices/{device.pk}/historical_stats/?{query}')
+            self.assertEqual(response.status_code, 400, query)
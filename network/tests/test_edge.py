@@ -0,0 +1,46 @@
+# network/tests/test_edge.py
+import asyncio
+import io
+import urllib.error
+from unittest import mock
+from django.test import SimpleTestCase
+from network import edge
+
+
+def http_error(code):
+    return urllib.error.HTTPError(edge.RESULTS_PATH, code, 'error', {}, io.BytesIO())
+
+
+class ShipTests(SimpleTestCase):
+    def setUp(self):
+        self.collector = edge.EdgeCollector('http://central', 'token', ['Lab'], name='edge')
+        for n in range(3):
+            self.collector.pending.append({'collector': 'edge', 'samples': [[n, 0, None, []]], 'unsupported': []})
+
+    def ship(self, side_effect):
+        with mock.patch.object(self.collector, '_request', side_effect=side_effect) as request:
+            asyncio.run(self.collector.ship())
+        return request
+
+    def test_ships_in_order(self):
+        request = self.ship([{}, {}, {}])
+        self.assertEqual([call.args[2]['samples'][0][0] for call in request.call_args_list], [0, 1, 2])
+        self.assertFalse(self.collector.pending)
+
+    def test_keeps_batches_while_server_is_down(self):
+        with self.assertLogs('network.edge', 'ERROR'):
+            self.ship([urllib.error.URLError('refused')])
+        self.assertEqual(len(self.collector.pending), 3)
+
+    def test_keeps_batches_on_server_errors_and_throttling(self):
+        for code in (500, 503, 429, 408):
+            with self.assertLogs('network.edge', 'ERROR'):
+                self.ship([http_error(code)])
+            self.assertEqual(len(self.collector.pending), 3, code)
+
+    def test_drops_rejected_batch_and_continues(self):
+        with self.assertLogs('network.edge', 'ERROR') as logs:
+            request = self.ship([http_error(400), {}, {}])
+        self.assertIn('dropping it', logs.output[0])
+        self.assertEqual(request.call_count, 3)
+        self.assertFalse(self.collector.pending)
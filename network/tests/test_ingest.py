@@ -0,0 +1,50 @@
+# network/tests/test_ingest.py
+from datetime import timedelta
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from network import ingest
+from network.models import Device, DeviceAlert, DeviceStats
+
+LOCAL_ONLY = {
+    'INGEST': {'ENABLED': False},
+    'RECENT_SAMPLES': {'REDIS_URL': None},
+    'TIMESERIES_STORE': {'ENABLED': False},
+    'STREAM': {'CACHE': 'default'},
+    'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    'CHANNEL_LAYERS': {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+}
+
+
+@override_settings(**LOCAL_ONLY)
+class WriteSamplesTests(TestCase):
+    databases = {'default', 'timeseries'}
+
+    def setUp(self):
+        self.device = Device.objects.create(
+            serial_number='T-1', ip_address='10.0.0.1', name='sw1', model='m', branch='A'
+        )
+        self.now = timezone.now().replace(microsecond=0)
+
+    def test_writes_stats_alerts_and_latest_device_values(self):
+        samples = [
+            ingest.make_sample(self.device.id, self.now - timedelta(seconds=3), {'cpu_usage': 10.0}),
+            ingest.make_sample(self.device.id, self.now, {'cpu_usage': 95.0}, status='Up',
+                               alert_triggered=True, alert_message='High CPU usage'),
+        ]
+        self.assertEqual(ingest.write_samples(samples), 2)
+
+        self.assertEqual(DeviceStats.objects.filter(device=self.device).count(), 2)
+        alert = DeviceAlert.objects.get(device=self.device)
+        self.assertEqual((alert.timestamp, alert.message), (self.now, 'High CPU usage'))
+        self.device.refresh_from_db()
+        self.assertEqual((self.device.cpu_usage, self.device.status, self.device.last_updated), (95.0, 'Up', self.now))
+
+    def test_replayed_batch_is_idempotent(self):
+        samples = [ingest.make_sample(self.device.id, self.now, {'cpu_usage': 10.0})]
+        ingest.write_samples(samples)
+        ingest.write_samples(samples)
+        self.assertEqual(DeviceStats.objects.filter(device=self.device).count(), 1)
+
+    def test_submit_writes_directly_without_buffer(self):
+        ingest.submit([ingest.make_sample(self.device.id, self.now, {'latency': 4.0})])
+        self.assertEqual(DeviceStats.objects.get(device=self.device).latency, 4.0)
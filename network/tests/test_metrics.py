@@ -0,0 +1,99 @@
+# network/tests/test_metrics.py
+import os
+from unittest import mock
+from django.contrib.auth.models import User
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from network import metrics
+
+UNREACHABLE_REDIS = 'redis://127.0.0.1:1/0'
+
+
+@override_settings(METRICS={'REDIS_URL': None})
+class RenderTests(SimpleTestCase):
+    def setUp(self):
+        self.registry = metrics.Registry()
+
+    def test_counter_and_gauge(self):
+        failures = self.registry.counter('failures_total', 'Failures.', ['device'])
+        backlog = self.registry.gauge('backlog', 'Backlog.')
+        failures.inc(device='10.0.0.1')
+        failures.inc(2, device='10.0.0.1')
+        backlog.set(7)
+        lines = self.registry.render().splitlines()
+        self.assertIn('failures_total{device="10.0.0.1"} 3', lines)
+        self.assertIn('backlog 7', lines)
+
+    def test_histogram_buckets_are_cumulative(self):
+        latency = self.registry.histogram('latency_seconds', 'Latency.', buckets=(0.1, 1))
+        for value in (0.05, 0.5, 5):
+            latency.observe(value)
+        lines = self.registry.render().splitlines()
+        self.assertIn('latency_seconds_bucket{le="0.1"} 1', lines)
+        self.assertIn('latency_seconds_bucket{le="1"} 2', lines)
+        self.assertIn('latency_seconds_bucket{le="+Inf"} 3', lines)
+        self.assertIn('latency_seconds_count 3', lines)
+
+    def test_label_values_are_escaped(self):
+        self.assertEqual(metrics._label_string((('model', 'a"b\\c'),)), 'model="a\\"b\\\\c"')
+
+    @override_settings(METRICS={'REDIS_URL': UNREACHABLE_REDIS})
+    def test_unreachable_redis_renders_local_values(self):
+        self.registry.counter('polls_total', 'Polls.').inc()
+        with self.assertLogs('network.metrics', 'ERROR'):
+            output = self.registry.render()
+        self.assertIn('polls_total 1', output.splitlines())
+
+
+@override_settings(METRICS={'REDIS_URL': None, 'FLUSH_INTERVAL': 60})
+class FlushTests(SimpleTestCase):
+    def test_updates_never_flush_inline(self):
+        registry = metrics.Registry()
+        polls = registry.counter('polls_total', 'Polls.')
+        with mock.patch.object(registry, 'flush') as flush, mock.patch('threading.Thread') as thread:
+            polls.inc()
+            polls.inc()
+        flush.assert_not_called()
+        thread.assert_called_once()  # One flusher thread per process
+        self.assertTrue(thread.call_args.kwargs['daemon'])
+        self.assertEqual(registry._flusher_pid, os.getpid())
+
+    @override_settings(CHANNEL_LAYERS={'default': {
+        'BACKEND': 'channels_redis.core.RedisChannelLayer', 'CONFIG': {'hosts': [('127.0.0.1', 6379)]},
+    }})
+    def test_channel_layer_client_is_reused(self):
+        metrics._channel_layer_clients.clear()
+        self.addCleanup(metrics._channel_layer_clients.clear)
+        with mock.patch('redis.Redis') as client_class:
+            client_class.return_value.scan_iter.return_value = []
+            metrics.collect_channel_layer_depth()
+            metrics.collect_channel_layer_depth()
+        client_class.assert_called_once()
+
+
+@override_settings(
+    METRICS={'REDIS_URL': None, 'TOKEN': 'scrape-token'},
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+)
+class MetricsViewTests(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def get(self, user=None, **headers):
+        request = self.factory.get('/metrics', **headers)
+        request.user = user or User()
+        return metrics.metrics_view(request)
+
+    def test_anonymous_request_is_refused(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Bearer realm="metrics"')
+
+    def test_bearer_token(self):
+        self.assertEqual(self.get(HTTP_AUTHORIZATION='Bearer wrong').status_code, 401)
+        self.assertEqual(self.get(HTTP_AUTHORIZATION='Bearer scrape-token').status_code, 200)
+
+    def test_staff_session(self):
+        staff = User.objects.create_user('ops', is_staff=True)
+        plain = User.objects.create_user('viewer')
+        self.assertEqual(self.get(staff).status_code, 200)
+        self.assertEqual(self.get(plain).status_code, 401)
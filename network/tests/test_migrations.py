@@ -0,0 +1,51 @@
+# network/tests/test_migrations.py
+from datetime import datetime, timezone as dt_timezone
+from django.db import connections
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+from network.routers import TIMESERIES_DB
+
+BEFORE = [('network', '0012_device_circuit_breaker')]
+AFTER = [('network', '0013_slim_devicestats')]
+
+
+class SlimDeviceStatsMigrationTests(TransactionTestCase):
+    databases = {'default', 'timeseries'}
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connections[TIMESERIES_DB])
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets[0]).apps
+
+    def setUp(self):
+        latest = MigrationExecutor(connections[TIMESERIES_DB]).loader.graph.leaf_nodes('network')
+        self.addCleanup(self.migrate, latest)
+        self.now = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+    def test_forward_moves_alerts_and_backward_restores_them(self):
+        apps = self.migrate(BEFORE)
+        LegacyStats = apps.get_model('network', 'DeviceStats')
+        LegacyStats.objects.using(TIMESERIES_DB).bulk_create([
+            LegacyStats(device_id=1, timestamp=self.now, cpu_usage=10.0),
+            LegacyStats(device_id=1, timestamp=self.now.replace(minute=1), cpu_usage=95.0,
+                        alert_triggered=True, alert_message='High CPU usage'),
+        ])
+
+        apps = self.migrate(AFTER)
+        DeviceStats = apps.get_model('network', 'DeviceStats')
+        DeviceAlert = apps.get_model('network', 'DeviceAlert')
+        self.assertEqual(
+            sorted(DeviceStats.objects.using(TIMESERIES_DB).values_list('cpu_usage', flat=True)), [10.0, 95.0]
+        )
+        alert = DeviceAlert.objects.using(TIMESERIES_DB).get()
+        self.assertEqual((alert.device_id, alert.timestamp, alert.message), (1, self.now.replace(minute=1), 'High CPU usage'))
+        DeviceStats.objects.using(TIMESERIES_DB).create(device_id=2, timestamp=self.now, cpu_usage=1.0)  # Sequence was reset
+
+        apps = self.migrate(BEFORE)
+        LegacyStats = apps.get_model('network', 'DeviceStats')
+        rows = LegacyStats.objects.using(TIMESERIES_DB).order_by('device_id', 'timestamp').values_list(
+            'device_id', 'cpu_usage', 'alert_triggered', 'alert_message'
+        )
+        self.assertEqual(list(rows), [(1, 10.0, False, ''), (1, 95.0, True, 'High CPU usage'), (2, 1.0, False, '')])
+
@@ -0,0 +1,79 @@
+# network/tests/test_profiling.py
+from types import SimpleNamespace
+from asgiref.sync import async_to_sync, sync_to_async
+from django.test import SimpleTestCase, TestCase, override_settings
+from network import profiling
+from network.models import Device, RequestProfile
+
+ALWAYS = {'ENABLED': True, 'SAMPLE_RATE': 1.0, 'SLOW_MS': 10 ** 6, 'N_PLUS_ONE_THRESHOLD': 3}
+
+
+class FingerprintTests(SimpleTestCase):
+    def test_literals_and_in_lists_are_normalized(self):
+        self.assertEqual(
+            profiling.fingerprint("SELECT * FROM t WHERE id IN (1, 2, 3) AND name = 'a''b' AND x > 1.5"),
+            'SELECT * FROM t WHERE id IN (...) AND name = ? AND x > ?',
+        )
+        self.assertEqual(profiling.fingerprint('SELECT 1\n  FROM t'), 'SELECT ? FROM t')
+
+
+@override_settings(PROFILING=ALWAYS, CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class QueryProfileTests(TestCase):
+    def setUp(self):
+        self.devices = [
+            Device.objects.create(serial_number=f'SN{n}', ip_address=f'10.0.0.{n}', name=f'd{n}', model='m', branch='Lab')
+            for n in range(1, 5)
+        ]
+
+    def n_plus_one(self):
+        for device in self.devices:
+            Device.objects.get(pk=device.pk)
+
+    def test_counts_queries_and_repeated_fingerprints(self):
+        with profiling.QueryProfile() as profile:
+            self.n_plus_one()
+            Device.objects.count()
+        self.assertEqual(profile.query_count, 5)
+        self.assertEqual([d['count'] for d in profile.duplicates(3)], [4])
+
+    def test_async_profile_follows_the_context(self):
+        async def request():
+            async with profiling.QueryProfile() as profile:
+                await sync_to_async(self.n_plus_one)()
+            return profile
+        profile = async_to_sync(request)()
+        self.assertEqual(profile.query_count, 4)
+
+    def test_report_stores_n_plus_one_only(self):
+        with profiling.QueryProfile() as quiet:
+            Device.objects.count()
+        self.assertIsNone(profiling.report(quiet, 'request', 'quiet'))
+
+        with profiling.QueryProfile() as noisy:
+            self.n_plus_one()
+        with self.assertLogs('network.profiling', 'WARNING'):
+            stored = profiling.report(noisy, 'request', 'noisy', 'GET', 200)
+        self.assertEqual(RequestProfile.objects.get(), stored)
+        self.assertTrue(stored.n_plus_one)
+        self.assertEqual(stored.query_count, 4)
+
+    def test_slow_requests_are_stored(self):
+        with override_settings(PROFILING=dict(ALWAYS, SLOW_MS=0)), self.assertLogs('network.profiling', 'WARNING'):
+            self.client.get('/api/devices/')
+        profile = RequestProfile.objects.get()
+        self.assertEqual((profile.kind, profile.method, profile.status_code), ('request', 'GET', 200))
+        self.assertFalse(profile.n_plus_one)
+
+    @override_settings(PROFILING=dict(ALWAYS, ENABLED=False, SLOW_MS=0))
+    def test_disabled(self):
+        self.client.get('/api/devices/')
+        self.assertFalse(RequestProfile.objects.exists())
+
+    def test_celery_task_hooks(self):
+        task = SimpleNamespace(name='network.tasks.update_snmp_data')
+        profiling._task_prerun(task_id='t1', task=task)
+        self.n_plus_one()
+        with self.assertLogs('network.profiling', 'WARNING'):
+            profiling._task_postrun(task_id='t1', task=task)
+        profile = RequestProfile.objects.get()
+        self.assertEqual((profile.kind, profile.name, profile.query_count), ('task', task.name, 4))
@@ -0,0 +1,55 @@
+# network/tests/test_rates.py
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from network import rates
+
+IF_OUT_OCTETS = '1.3.6.1.2.1.2.2.1.16.1'
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class CounterRateTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.counters = rates.CounterCache()
+
+    def rate(self, value, timestamp, bits=64):
+        return self.counters.rate(1, IF_OUT_OCTETS, value, timestamp, bits)
+
+    def test_first_reading_has_no_rate(self):
+        self.assertIsNone(self.rate(1000, 100.0))
+
+    def test_rate_per_second(self):
+        self.rate(1000, 100.0)
+        self.assertEqual(self.rate(4000, 110.0), 300.0)
+
+    def test_32_bit_wrap(self):
+        self.rate(2 ** 32 - 1000, 100.0, bits=32)
+        self.assertEqual(self.rate(1000, 102.0, bits=32), 1000.0)
+
+    def test_64_bit_decrease_is_a_reset(self):
+        self.rate(5000, 100.0)
+        with self.assertLogs('network.rates', 'INFO'):
+            self.assertIsNone(self.rate(10, 110.0))
+        # The reset reading becomes the new baseline
+        self.assertEqual(self.rate(110, 120.0), 10.0)
+
+    def test_32_bit_decrease_below_half_range_is_a_reset(self):
+        self.rate(1000, 100.0, bits=32)
+        with self.assertLogs('network.rates', 'INFO'):
+            self.assertIsNone(self.rate(10, 110.0, bits=32))
+
+    def test_stale_previous_sample_is_discarded(self):
+        self.rate(1000, 100.0)
+        self.assertIsNone(self.rate(2000, 100.0 + rates.MAX_AGE + 1))
+
+    def test_out_of_order_reading_keeps_newer_sample(self):
+        self.rate(1000, 100.0)
+        self.rate(2000, 110.0)
+        self.assertIsNone(self.rate(1500, 105.0))
+        self.assertEqual(self.rate(3000, 120.0), 100.0)
+
+    def test_new_process_resumes_from_snapshot(self):
+        self.rate(1000, 100.0)
+        self.counters.flush()
+        restarted = rates.CounterCache()
+        self.assertEqual(restarted.rate(1, IF_OUT_OCTETS, 2000, 110.0), 100.0)
@@ -0,0 +1,117 @@
+# network/tests/test_recent.py
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+import numpy as np
+from django.test import SimpleTestCase, TestCase, override_settings
+from network import recent
+from network.models import Device, DeviceStats
+
+START_MS = 1_700_000_000_000
+
+
+def sample(n, device_id=1, **values):
+    return {'device_id': device_id, 'timestamp': START_MS + n * 1000, 'cpu_usage': float(n), **values}
+
+
+@override_settings(RECENT_SAMPLES={'CAPACITY': 4, 'REDIS_URL': None})
+class RingTests(SimpleTestCase):
+    def setUp(self):
+        self.samples = recent.RecentSamples()
+
+    def test_keeps_the_newest_capacity_samples_in_order(self):
+        self.samples.record([sample(n) for n in range(6)])
+        rows = self.samples.latest([1], count=4)[1]
+        self.assertEqual([row['cpu_usage'] for row in rows], [2.0, 3.0, 4.0, 5.0])
+        self.assertEqual(rows[-1]['timestamp'], datetime.fromtimestamp((START_MS + 5000) / 1000, tz=dt_timezone.utc))
+
+    def test_missing_metrics_and_alerts(self):
+        self.samples.record([sample(0, temperature=None, alert_triggered=True, alert_message='CPU high')])
+        row = self.samples.latest([1])[1][0]
+        self.assertIsNone(row['temperature'])
+        self.assertEqual((row['alert_triggered'], row['alert_message']), (True, 'CPU high'))
+
+    def test_overwritten_samples_drop_their_alert_messages(self):
+        self.samples.record([sample(0, alert_triggered=True, alert_message='old')] + [sample(n) for n in range(1, 5)])
+        self.assertEqual(self.samples._rings[1].messages, {})
+
+    def test_replayed_samples_are_deduplicated(self):
+        self.samples.record([sample(0), sample(1)])
+        self.samples.record([sample(1)])
+        self.assertEqual([row['cpu_usage'] for row in self.samples.latest([1], count=2)[1]], [0.0, 1.0])
+
+    def test_devices_with_fewer_samples_are_left_out(self):
+        self.samples.record([sample(0, device_id=1), sample(0, device_id=2), sample(1, device_id=2)])
+        self.assertEqual(list(self.samples.latest([1, 2, 3], count=2)), [2])
+
+    def test_read_columns_only_when_the_buffer_covers_the_window(self):
+        self.samples.record([sample(n) for n in range(6)])
+        self.assertIsNone(self.samples.read_columns(1, START_MS + 1000, START_MS + 9000))
+        timestamps, columns = self.samples.read_columns(1, START_MS + 2000, START_MS + 4000)
+        self.assertEqual((timestamps - START_MS).tolist(), [2000, 3000, 4000])
+        self.assertEqual(columns['cpu_usage'].tolist(), [2.0, 3.0, 4.0])
+        self.assertTrue(np.isnan(columns['latency']).all())
+
+    def test_pack_round_trip(self):
+        items = [recent._pack(sample(1, alert_triggered=True, alert_message='hot')), recent._pack(sample(0))]
+        records, messages = recent._unpack(items)
+        self.assertEqual((records['timestamp'] - START_MS).tolist(), [0, 1000])
+        self.assertEqual(messages, {START_MS + 1000: 'hot'})
+
+
+@override_settings(RECENT_SAMPLES={'CAPACITY': 4, 'REDIS_URL': 'redis://localhost:6379/0'})
+class RedisMirrorTests(SimpleTestCase):
+    def setUp(self):
+        self.samples = recent.RecentSamples()
+        self.samples._redis = self.client = mock.MagicMock()
+        self.pipe = self.client.pipeline.return_value
+
+    def test_appends_and_trims_each_device_list(self):
+        self.samples.record([sample(0), sample(1)])
+        self.assertEqual(self.pipe.rpush.call_count, 2)
+        self.pipe.ltrim.assert_called_once_with(f'{recent.KEY_PREFIX}1', -4, -1)
+        self.pipe.execute.assert_called_once()
+
+    def test_failed_write_drops_the_list_on_the_next_write(self):
+        self.pipe.execute.side_effect = ConnectionError('down')
+        with self.assertLogs('network.recent', 'ERROR'):
+            self.samples.record([sample(0)])
+        self.pipe.execute.side_effect = None
+        self.samples.record([sample(1)])
+        self.pipe.delete.assert_called_once_with(f'{recent.KEY_PREFIX}1')
+        self.assertEqual(self.samples._broken, set())
+
+    def test_reads_come_from_redis(self):
+        self.pipe.execute.return_value = [[recent._pack(sample(7))]]
+        self.assertEqual(self.samples.latest([1])[1][0]['cpu_usage'], 7.0)
+        self.pipe.lrange.assert_called_once_with(f'{recent.KEY_PREFIX}1', -1, -1)
+
+    def test_read_failure_is_an_empty_result(self):
+        self.pipe.execute.side_effect = ConnectionError('down')
+        with self.assertLogs('network.recent', 'ERROR'):
+            self.assertEqual(self.samples.latest([1]), {})
+
+
+@override_settings(RECENT_SAMPLES={'CAPACITY': 4, 'REDIS_URL': None})
+class LatestStatsTests(TestCase):
+    databases = {'default', 'timeseries'}
+
+    def setUp(self):
+        patcher = mock.patch.object(recent, 'samples', recent.RecentSamples())
+        self.samples = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.device = Device.objects.create(serial_number='R-1', ip_address='10.0.4.1', name='r', model='m', branch='Lab')
+        start = datetime.fromtimestamp(START_MS / 1000, tz=dt_timezone.utc)
+        DeviceStats.objects.bulk_create([
+            DeviceStats(device=self.device, timestamp=start - timedelta(seconds=n), cpu_usage=-float(n)) for n in range(1, 4)
+        ])
+
+    def test_served_from_the_buffer_when_it_holds_enough(self):
+        self.samples.record([sample(n, device_id=self.device.pk) for n in range(3)])
+        with self.assertNumQueries(0, using='timeseries'):
+            stats = self.device.get_latest_stats(limit=2)
+        self.assertEqual([stat.cpu_usage for stat in stats], [2.0, 1.0])
+
+    def test_falls_back_to_the_database(self):
+        self.samples.record([sample(0, device_id=self.device.pk)])
+        stats = list(self.device.get_latest_stats(limit=2))
+        self.assertEqual([stat.cpu_usage for stat in stats], [-1.0, -2.0])
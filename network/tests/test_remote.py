@@ -0,0 +1,71 @@
+# network/tests/test_remote.py
+from unittest import mock
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from network import collector, remote
+from network.models import Device
+
+TOKEN = 'secret'
+CPU = collector.METRIC_REGISTRY['cpu_usage'].oid
+OUT_OCTETS = collector.METRIC_REGISTRY['latency'].oid
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    COLLECTOR={'REMOTE_BRANCHES': ['Edge'], 'REMOTE_TOKEN': TOKEN, 'REMOTE_INTERVAL': 5},
+    METRICS={'REDIS_URL': None},
+)
+class RemoteCollectorTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.device = Device.objects.create(serial_number='SN1', ip_address='10.0.0.1', name='a', model='m', branch='Edge')
+        Device.objects.create(serial_number='SN2', ip_address='10.0.0.2', name='b', model='m', branch='Edge', snmp_version='3')
+        Device.objects.create(serial_number='SN3', ip_address='10.0.0.3', name='c', model='m', branch='Core')
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {TOKEN}'}
+
+    def post(self, batch, **headers):
+        return self.client.post('/network/api/collector/results/', batch, content_type='application/json', **headers)
+
+    def test_requires_token(self):
+        self.assertEqual(self.client.get('/network/api/collector/assignment/?branch=Edge').status_code, 403)
+        self.assertEqual(self.post({}, HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+
+    @override_settings(COLLECTOR={'REMOTE_BRANCHES': ['Edge'], 'REMOTE_TOKEN': ''})
+    def test_disabled_without_token(self):
+        self.assertEqual(self.client.get('/network/api/collector/assignment/', HTTP_AUTHORIZATION='Bearer ').status_code, 403)
+
+    def test_assignment_skips_v3_and_unassigned_branches(self):
+        response = self.client.get('/network/api/collector/assignment/?branch=Edge&branch=Core', **self.auth)
+        assignment = response.json()
+        self.assertEqual(assignment['branches'], ['Edge'])
+        self.assertEqual(assignment['interval'], 5)
+        self.assertEqual([device['id'] for device in assignment['devices']], [self.device.id])
+        self.assertIn(CPU, assignment['devices'][0]['oids'])
+
+    def test_centrally_polled_excludes_remote_devices(self):
+        polled = remote.centrally_polled(Device.objects.all())
+        self.assertEqual(sorted(polled.values_list('serial_number', flat=True)), ['SN2', 'SN3'])
+
+    def test_results_are_ingested(self):
+        batch = {'collector': 'edge', 'unsupported': [[self.device.id, '1.3.6.1.4.1.2021.13.16.0']], 'samples': [
+            [self.device.id, 1_700_000_000_000, {CPU: 12.0, OUT_OCTETS: 1000}, []],
+            [self.device.id, 1_700_000_010_000, {CPU: 14.0, OUT_OCTETS: 126000}, []],
+            [self.device.id + 100, 1_700_000_010_000, {CPU: 1.0}, []],
+        ]}
+        with mock.patch('network.ingest.submit') as submit:
+            response = self.post(batch, **self.auth)
+        self.assertEqual(response.json(), {'accepted': 2})
+        first, second = submit.call_args.args[0]
+        self.assertEqual(second['cpu_usage'], 14.0)
+        self.assertIsNone(first['latency'])  # No previous counter sample yet
+        self.assertAlmostEqual(second['latency'], 125000 / 10 * 8 / 1_000_000)
+        self.assertTrue(collector.unsupported_oids.is_unsupported('10.0.0.1', '1.3.6.1.4.1.2021.13.16.0'))
+
+    def test_unanswered_device(self):
+        with mock.patch('network.ingest.submit') as submit:
+            self.post({'samples': [[self.device.id, 1_700_000_000_000, None, []]]}, **self.auth)
+        self.assertIsNone(submit.call_args.args[0][0]['cpu_usage'])
+
+    def test_malformed_batch_is_400(self):
+        for body in ({'samples': [[1, 2]]}, {'samples': [['x', 0, {}, []]]}, {'unsupported': 5}):
+            self.assertEqual(self.post(body, **self.auth).status_code, 400, body)
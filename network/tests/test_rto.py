@@ -0,0 +1,77 @@
+# network/tests/test_rto.py
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from network import rto
+
+ADDRESS = '10.0.0.3'
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    COLLECTOR={'ADAPTIVE_TIMEOUT': {'INITIAL_TIMEOUT': 2, 'MIN_TIMEOUT': 0.25, 'MAX_TIMEOUT': 10}},
+    METRICS={'REDIS_URL': None},
+)
+class RtoEstimatorTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.estimator = rto.RtoEstimator()
+
+    def test_initial_timeout_until_first_answer(self):
+        self.assertEqual(self.estimator.timeout(ADDRESS), 2)
+
+    def test_first_sample(self):
+        # SRTT = RTT, RTTVAR = RTT / 2, RTO = SRTT + 4 * RTTVAR
+        self.estimator.observe(ADDRESS, 0.1, timeout=2)
+        self.assertAlmostEqual(self.estimator.timeout(ADDRESS), 0.1 + 4 * 0.05)
+
+    def test_smoothing(self):
+        self.estimator.observe(ADDRESS, 0.2, timeout=2)
+        self.estimator.observe(ADDRESS, 0.4, timeout=2)
+        rttvar = 0.75 * 0.1 + 0.25 * 0.2
+        srtt = 0.875 * 0.2 + 0.125 * 0.4
+        self.assertAlmostEqual(self.estimator.timeout(ADDRESS), srtt + 4 * rttvar)
+
+    def test_clamped_to_min_and_max(self):
+        self.estimator.observe(ADDRESS, 0.001, timeout=2)
+        self.assertEqual(self.estimator.timeout(ADDRESS), 0.25)
+        self.estimator.observe('10.0.0.4', 8, timeout=10)
+        self.assertEqual(self.estimator.timeout('10.0.0.4'), 10)
+
+    def test_karn_ignores_replies_to_retries(self):
+        self.estimator.observe(ADDRESS, 0.1, timeout=2)
+        before = self.estimator.timeout(ADDRESS)
+        # Slower than the per-attempt timeout: answered a retry, ambiguous
+        self.estimator.observe(ADDRESS, 2.5, timeout=before)
+        self.assertEqual(self.estimator.timeout(ADDRESS), before)
+
+    def test_timeout_doubles_up_to_max(self):
+        self.estimator.observe(ADDRESS, 0.5, timeout=2)
+        self.estimator.timed_out(ADDRESS, timeout=2, retries=1)
+        self.assertEqual(self.estimator.timeout(ADDRESS), 4)
+        self.estimator.timed_out(ADDRESS, timeout=8, retries=1)
+        self.assertEqual(self.estimator.timeout(ADDRESS), 10)
+
+    def test_no_backoff_before_first_answer(self):
+        self.estimator.timed_out(ADDRESS, timeout=2, retries=1)
+        self.estimator.timed_out(ADDRESS, timeout=2, retries=1)
+        self.assertEqual(self.estimator.timeout(ADDRESS), 2)
+
+    def test_answer_after_backoff_keeps_smoothed_state(self):
+        self.estimator.observe(ADDRESS, 0.2, timeout=2)
+        self.estimator.timed_out(ADDRESS, timeout=self.estimator.timeout(ADDRESS), retries=0)
+        self.estimator.observe(ADDRESS, 0.2, timeout=self.estimator.timeout(ADDRESS))
+        self.assertAlmostEqual(self.estimator.timeout(ADDRESS), 0.2 + 4 * 0.075)
+
+    def test_saved_seconds(self):
+        self.estimator.timed_out(ADDRESS, timeout=0.5, retries=1)
+        self.assertEqual(self.estimator.saved_seconds, 3.0)
+
+    def test_new_process_starts_from_snapshot(self):
+        self.estimator.observe(ADDRESS, 0.1, timeout=2)
+        self.estimator.flush()
+        self.assertEqual(rto.RtoEstimator().timeout(ADDRESS), self.estimator.timeout(ADDRESS))
+
+    @override_settings(COLLECTOR={'ADAPTIVE_TIMEOUT': {'ENABLED': False, 'INITIAL_TIMEOUT': 2}})
+    def test_disabled(self):
+        self.estimator.observe(ADDRESS, 0.1, timeout=2)
+        self.assertEqual(self.estimator.timeout(ADDRESS), 2)
@@ -0,0 +1,182 @@
+# network/tests/test_series.py
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+from django.db import connections
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from network import ingest, rangecache, series
+from network.models import Device, DeviceStats
+from network.routers import TIMESERIES_DB
+
+LOCAL_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'series': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'series'},
+}
+LOCAL_ONLY = {
+    'INGEST': {'ENABLED': False},
+    'RECENT_SAMPLES': {'REDIS_URL': None},
+    'TIMESERIES_STORE': {'ENABLED': False},
+    'STREAM': {'CACHE': 'default'},
+    'CACHES': LOCAL_CACHES,
+    'CHANNEL_LAYERS': {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    'RANGE_CACHE': {'CLOSE_DELAY': 600},
+}
+HOUR_MS = 60 * 60 * 1000
+
+
+@override_settings(**LOCAL_ONLY)
+class RangeCacheTests(SimpleTestCase):
+    def setUp(self):
+        rangecache.get_cache().clear()
+        self.calls = []
+        self.now_ms = 100 * HOUR_MS
+
+    def compute(self, device_ids, first_ms, last_ms):
+        self.calls.append((sorted(device_ids), first_ms, last_ms))
+        return {device_id: {start: (device_id, start) for start in range(first_ms, last_ms, HOUR_MS)} for device_id in device_ids}
+
+    def fetch(self, device_ids, start_ms, end_ms):
+        return rangecache.fetch('test', device_ids, start_ms, end_ms, HOUR_MS, self.compute, now_ms=self.now_ms)
+
+    def test_closed_chunks_are_cached_and_the_head_is_not(self):
+        first = self.fetch([1, 2], 95 * HOUR_MS, self.now_ms)
+        self.assertEqual(first[1][95 * HOUR_MS], (1, 95 * HOUR_MS))
+        self.assertEqual(self.fetch([1, 2], 95 * HOUR_MS, self.now_ms), first)
+        # Only the chunk still within CLOSE_DELAY (and the open head) are computed again
+        self.assertEqual(self.calls[1], ([1, 2], 99 * HOUR_MS, 101 * HOUR_MS))
+
+    def test_invalidate_drops_one_devices_chunks(self):
+        self.fetch([1, 2], 90 * HOUR_MS, 95 * HOUR_MS - 1)
+        rangecache.invalidate([2])
+        self.fetch([1, 2], 90 * HOUR_MS, 95 * HOUR_MS - 1)
+        self.assertEqual(self.calls[1], ([2], 90 * HOUR_MS, 95 * HOUR_MS))
+
+    @override_settings(RANGE_CACHE={'ENABLED': False})
+    def test_disabled(self):
+        self.fetch([1], 90 * HOUR_MS, 91 * HOUR_MS - 1)
+        self.fetch([1], 90 * HOUR_MS, 91 * HOUR_MS - 1)
+        self.assertEqual(len(self.calls), 2)
+
+
+@override_settings(**LOCAL_ONLY)
+class SeriesQueryTests(TestCase):
+    databases = {'default', 'timeseries'}
+
+    def setUp(self):
+        rangecache.get_cache().clear()
+        self.device = Device.objects.create(serial_number='SN1', ip_address='10.0.0.1', name='a', model='m', branch='Lab')
+        self.start = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+    def stat(self, seconds, cpu):
+        return DeviceStats(device=self.device, timestamp=self.start + timedelta(seconds=seconds), cpu_usage=cpu)
+
+    def test_epoch_seconds_sql(self):
+        # '%%%%s' in the template must reach SQLite as strftime('%s', ...)
+        DeviceStats.objects.bulk_create([self.stat(90.5, 1.0)])
+        epoch = DeviceStats.objects.annotate(epoch=series.EpochSeconds('timestamp')).values_list('epoch', flat=True).get()
+        self.assertEqual(epoch, self.start.timestamp() + 90)
+        sql = str(DeviceStats.objects.annotate(epoch=series.EpochSeconds('timestamp')).values('epoch').query)
+        self.assertIn("strftime('%s', ", sql)
+
+    def test_epoch_seconds_other_vendors(self):
+        query = DeviceStats.objects.annotate(epoch=series.EpochSeconds('timestamp')).query
+        compiler = query.get_compiler(TIMESERIES_DB)
+        connection = connections[TIMESERIES_DB]
+        expression = query.annotations['epoch']
+        self.assertTrue(expression.as_postgresql(compiler, connection)[0].startswith('EXTRACT(EPOCH FROM '))
+        self.assertTrue(expression.as_mysql(compiler, connection)[0].startswith('UNIX_TIMESTAMP('))
+
+    def test_bucket_means_from_the_database(self):
+        DeviceStats.objects.bulk_create([self.stat(0, 10.0), self.stat(30, 20.0), self.stat(70, 40.0)])
+        start_ms = int(self.start.timestamp() * 1000)
+        axis, values = series.read([self.device.id], ['cpu_usage'], start_ms, start_ms + 179_999, 60)
+        self.assertEqual((axis - start_ms).tolist(), [0, 60_000, 120_000])
+        self.assertEqual(series.to_json(values[self.device.id]['cpu_usage']), [15.0, 40.0, None])
+
+    def test_late_samples_and_deletes_invalidate_cached_chunks(self):
+        start_ms = int(self.start.timestamp() * 1000)
+        end_ms = start_ms + 179_999
+        series.read([self.device.id], ['cpu_usage'], start_ms, end_ms, 60)
+        version = rangecache.get_cache().get(f'{rangecache.VERSION_PREFIX}{self.device.id}')
+        self.assertIsNotNone(version)
+
+        # A late edge-collector sample lands in a cached (closed) chunk
+        ingest.write_samples([ingest.make_sample(self.device.id, self.start + timedelta(seconds=130), {'cpu_usage': 50.0})])
+        _, values = series.read([self.device.id], ['cpu_usage'], start_ms, end_ms, 60)
+        self.assertEqual(series.to_json(values[self.device.id]['cpu_usage']), [None, None, 50.0])
+
+        device_id = self.device.id
+        self.device.delete()
+        _, values = series.read([device_id], ['cpu_usage'], start_ms, end_ms, 60)
+        self.assertEqual(series.to_json(values[device_id]['cpu_usage']), [None, None, None])
+
+
+class ResolutionTests(SimpleTestCase):
+    def test_finest_resolution_within_points(self):
+        self.assertEqual(series.pick_resolution(0, HOUR_MS, points=1000), 5)
+        self.assertEqual(series.pick_resolution(0, 24 * HOUR_MS, points=100), 900)
+
+    def test_requested_resolution_is_capped_at_max_points(self):
+        self.assertEqual(series.pick_resolution(0, HOUR_MS, requested='60'), 60)
+        self.assertEqual(series.pick_resolution(0, 24 * HOUR_MS, requested='1'), 18)  # 86400 s / MAX_POINTS
+
+    def test_axis_is_aligned_to_the_resolution(self):
+        self.assertEqual(series.bucket_axis(90_000, 200_000, 60).tolist(), [60_000, 120_000, 180_000])
+
+
+@override_settings(**LOCAL_ONLY)
+class SeriesViewTests(TestCase):
+    databases = {'default', 'timeseries'}
+
+    def setUp(self):
+        rangecache.get_cache().clear()
+        self.start = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+        self.start_ms = int(self.start.timestamp() * 1000)
+        self.devices = [
+            Device.objects.create(serial_number=f'SN{n}', ip_address=f'10.0.0.{n}', name=f'd{n}', model='m',
+                                  branch='Lab' if n < 3 else 'Office')
+            for n in range(1, 4)
+        ]
+        DeviceStats.objects.bulk_create([
+            DeviceStats(device=device, timestamp=self.start + timedelta(seconds=seconds), cpu_usage=float(n * 10 + seconds))
+            for n, device in enumerate(self.devices) for seconds in (0, 30, 60)
+        ])
+
+    def get(self, **params):
+        params.setdefault('start', self.start_ms)
+        params.setdefault('end', self.start_ms + 119_999)
+        return self.client.get(reverse('device-series'), params)
+
+    def test_columnar_payload_from_one_query(self):
+        ids = f'{self.devices[0].id},{self.devices[1].id}'
+        with self.assertNumQueries(1, using=TIMESERIES_DB):
+            response = self.get(devices=ids, metrics='cpu_usage,latency', resolution=60)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['timestamps'], [self.start_ms, self.start_ms + 60_000])
+        self.assertEqual([device['name'] for device in data['devices']], ['d1', 'd2'])
+        self.assertEqual(data['series'][str(self.devices[0].id)], {'cpu_usage': [15.0, 60.0], 'latency': [None, None]})
+        self.assertEqual(data['series'][str(self.devices[1].id)]['cpu_usage'], [25.0, 70.0])
+
+    def test_branch_selection(self):
+        data = self.get(branch='Office', resolution=60).json()
+        self.assertEqual(list(data['series']), [str(self.devices[2].id)])
+        self.assertEqual(data['metrics'], list(series.tsstore.METRICS))
+
+    def test_invalid_requests(self):
+        ids = str(self.devices[0].id)
+        for params in (
+            {'devices': 'a,b'},
+            {'devices': ids, 'points': 'many'},
+            {'devices': ids, 'metrics': 'cpu_usage,humidity'},
+            {'devices': ids, 'start': self.start_ms + 1, 'end': self.start_ms},
+            {},
+        ):
+            self.assertEqual(self.get(**params).status_code, 400, params)
+
+    def test_device_limit(self):
+        with mock.patch.object(series, 'MAX_DEVICES', 2):
+            response = self.get(branch='Lab')
+            self.assertEqual(response.status_code, 200)
+            response = self.get(devices=','.join(str(device.id) for device in self.devices))
+        self.assertEqual(response.status_code, 400)
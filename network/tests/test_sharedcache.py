@@ -0,0 +1,34 @@
+# network/tests/test_sharedcache.py
+from django.test import SimpleTestCase
+from network.sharedcache import FailSafeRedisCache
+
+# Nothing listens on port 1, so every command fails with a connection error
+UNREACHABLE = 'redis://127.0.0.1:1/0'
+
+
+class FailSafeRedisCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = FailSafeRedisCache(UNREACHABLE, {})
+
+    def test_reads_miss(self):
+        with self.assertLogs('network.sharedcache', 'ERROR'):
+            self.assertEqual(self.cache.get('key', 'fallback'), 'fallback')
+        self.assertEqual(self.cache.get_many(['a', 'b']), {})
+        self.assertFalse(self.cache.has_key('key'))
+
+    def test_add_fails_so_locks_are_not_taken(self):
+        with self.assertLogs('network.sharedcache', 'ERROR'):
+            self.assertFalse(self.cache.add('lock', 1, 5))
+
+    def test_writes_are_dropped(self):
+        with self.assertLogs('network.sharedcache', 'ERROR'):
+            self.cache.set('key', 1)
+        self.assertEqual(self.cache.set_many({'a': 1, 'b': 2}), ['a', 'b'])
+        self.assertFalse(self.cache.delete('key'))
+        self.cache.delete_many(['a', 'b'])
+
+    def test_errors_are_logged_once_per_interval(self):
+        with self.assertLogs('network.sharedcache', 'ERROR') as logs:
+            self.cache.get('a')
+            self.cache.get('b')
+        self.assertEqual(len(logs.records), 1)
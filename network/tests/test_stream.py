@@ -0,0 +1,277 @@
+# network/tests/test_stream.py
+import json
+import time
+from datetime import datetime, timezone as dt_timezone
+from unittest import mock
+from asgiref.sync import sync_to_async
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
+from network import ingest, metrics, stream
+from network.consumers import DeviceStatsConsumer, parse_subscription
+
+LOCAL_STREAM = {
+    'STREAM': {'CACHE': 'default', 'BUFFER_SIZE': 4, 'CLIENT_MAX_RATE': None, 'CLIENT_BYTE_BUDGET': None},
+    'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    'CHANNEL_LAYERS': {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    'METRICS': {'REDIS_URL': None},
+}
+NOW = datetime(2026, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def publish(*device_ids, branches=None):
+    return stream.publish([ingest.make_sample(device_id, NOW, {'cpu_usage': 1.0}) for device_id in device_ids], branches)
+
+
+@override_settings(**LOCAL_STREAM)
+class ChangesSinceTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_up_to_date_cursor(self):
+        publish(1)
+        self.assertEqual(stream.changes_since(1), (1, []))
+
+    def test_replays_missed_deltas_in_order(self):
+        for device_id in (1, 2, 3):
+            publish(device_id)
+        seq, deltas = stream.changes_since(1)
+        self.assertEqual(seq, 3)
+        self.assertEqual([(delta['seq'], delta['data'][0]['device_id']) for delta in deltas], [(2, 2), (3, 3)])
+
+    def test_device_filter_keeps_cursor_moving(self):
+        publish(1)
+        publish(2)
+        seq, deltas = stream.changes_since(0, device_ids={2})
+        self.assertEqual((seq, [delta['seq'] for delta in deltas]), (2, [2]))
+
+    def test_evicted_deltas_need_snapshot(self):
+        for device_id in range(6):
+            publish(device_id)
+        self.assertEqual(stream.changes_since(1), (6, None))
+        self.assertEqual(stream.changes_since(2)[0], 6)
+
+    def test_cursor_ahead_of_stream_needs_snapshot(self):
+        publish(1)
+        self.assertEqual(stream.changes_since(5), (1, None))
+
+    def test_gap_before_later_delta_needs_snapshot(self):
+        for device_id in (1, 2, 3):
+            publish(device_id)
+        cache.delete(f'{stream.SLOT_PREFIX}{2 % 4}')
+        self.assertEqual(stream.changes_since(0), (3, None))
+
+    def test_unwritten_head_is_left_to_live_delivery(self):
+        publish(1)
+        cache.incr(stream.SEQ_KEY)  # Numbered, not yet buffered
+        seq, deltas = stream.changes_since(0)
+        self.assertEqual((seq, [delta['seq'] for delta in deltas]), (1, [1]))
+
+    @override_settings(STREAM={'CACHE': 'missing'})
+    def test_cache_errors_are_logged_not_raised(self):
+        with self.assertLogs('network.stream', 'ERROR'):
+            self.assertIsNone(publish(1))
+
+    def test_branch_streams_have_their_own_sequence(self):
+        publish(1, 2, branches={1: 'A', 2: 'B'})
+        publish(1, branches={1: 'A'})
+        self.assertEqual(stream.current_seq(), 2)
+        self.assertEqual(stream.current_seq('A'), 2)
+        seq, deltas = stream.changes_since(0, branch='B')
+        self.assertEqual((seq, [[row['device_id'] for row in delta['data']] for delta in deltas]), (1, [[2]]))
+
+
+@override_settings(**LOCAL_STREAM)
+class CheckCacheTests(SimpleTestCase):
+    def test_local_cache_with_in_memory_layer(self):
+        stream.check_cache()
+
+    @override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels_redis.core.RedisChannelLayer'}})
+    def test_local_cache_with_shared_layer(self):
+        with self.assertRaises(ImproperlyConfigured):
+            stream.check_cache()
+
+
+@override_settings(**LOCAL_STREAM)
+class ConsumerGapTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    async def test_delta_beyond_buffer_is_covered_by_snapshot(self):
+        # The ingest process numbered these deltas; this process' buffer has none of them
+        snapshot = mock.AsyncMock(return_value={'type': 'snapshot', 'seq': 0, 'data': []})
+        with mock.patch.object(DeviceStatsConsumer, 'get_snapshot', snapshot):
+            communicator = WebsocketCommunicator(
+                DeviceStatsConsumer.as_asgi(), '/ws/device-stats/', spec_version=3
+            )
+            communicator.scope['url_route'] = {'kwargs': {}}
+            await communicator.connect()
+            self.assertEqual(json.loads(await communicator.receive_from())['type'], 'snapshot')
+
+            received = []
+            for seq in (7, 8):
+                await get_channel_layer().group_send(stream.GROUP, {
+                    'type': 'device_stats_update', 'group': stream.GROUP, 'seq': seq,
+                    'data': [{'device_id': 1, 'cpu_usage': float(seq)}],
+                })
+                received.append(json.loads(await communicator.receive_from()))
+            await communicator.disconnect()
+
+        self.assertEqual(received[0]['type'], 'snapshot')
+        self.assertEqual((received[1]['type'], received[1]['seq']), ('delta', 8))
+
+
+class SubscriptionTests(SimpleTestCase):
+    def test_parse(self):
+        self.assertEqual(
+            parse_subscription({'branch': 'A', 'device_ids': ['1', 2], 'metrics': ['cpu_usage'], 'max_rate': '2'}),
+            {'branch': 'A', 'device_ids': {1, 2}, 'metrics': ('cpu_usage',), 'max_rate': 2.0},
+        )
+        self.assertEqual(
+            parse_subscription({}), {'branch': None, 'device_ids': None, 'metrics': None, 'max_rate': None}
+        )
+
+    def test_malformed(self):
+        for data in ({'branch': 1}, {'device_ids': 'all'}, {'device_ids': ['x']}, {'metrics': ['humidity']},
+                     {'max_rate': 'fast'}, {'max_rate': 0}):
+            with self.assertRaises(ValueError, msg=data):
+                parse_subscription(data)
+
+    def test_select(self):
+        rows = [{'device_id': 1, 'cpu_usage': 1.0, 'latency': 2.0}, {'device_id': 2, 'cpu_usage': 3.0}]
+        self.assertEqual(stream.select(rows, {1}, ('cpu_usage',)), [{'device_id': 1, 'cpu_usage': 1.0}])
+        self.assertEqual(stream.select(rows), rows)
+
+    def test_branch_group_names_are_valid(self):
+        name = stream.group_name('Branch A / Ünïcode')
+        self.assertRegex(name, r'^[a-zA-Z0-9_.-]+$')
+        self.assertNotEqual(name, stream.group_name('Branch B'))
+        self.assertEqual(stream.group_name(), stream.GROUP)
+
+
+@override_settings(**LOCAL_STREAM)
+class ConsumerSubscriptionTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        snapshot = mock.patch.object(DeviceStatsConsumer, 'get_snapshot', mock.AsyncMock(
+            side_effect=lambda device_id: {'type': 'snapshot', 'seq': 0, 'data': []}
+        ))
+        snapshot.start()
+        self.addCleanup(snapshot.stop)
+
+    async def connect(self, query=''):
+        communicator = WebsocketCommunicator(DeviceStatsConsumer.as_asgi(), f'/ws/device-stats/?{query}', spec_version=3)
+        communicator.scope['url_route'] = {'kwargs': {}}
+        await communicator.connect()
+        self.assertEqual(json.loads(await communicator.receive_from())['type'], 'snapshot')
+        return communicator
+
+    async def test_branch_devices_and_metrics_from_the_query(self):
+        communicator = await self.connect('branch=A&device_ids=1,3&metrics=cpu_usage')
+        await sync_to_async(publish)(1, 2, 3, branches={1: 'A', 2: 'A', 3: 'B'})
+        delta = json.loads(await communicator.receive_from())
+        self.assertEqual((delta['type'], delta['seq']), ('delta', 1))  # Branch A's own sequence
+        self.assertEqual([row['device_id'] for row in delta['data']], [1])
+        self.assertIn('cpu_usage', delta['data'][0])
+        self.assertNotIn('temperature', delta['data'][0])
+        await sync_to_async(publish)(3, branches={3: 'B'})
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
+
+    async def test_subscribe_message_switches_branch(self):
+        communicator = await self.connect('branch=A')
+        await communicator.send_to(text_data=json.dumps({'type': 'subscribe', 'branch': 'B'}))
+        self.assertEqual(json.loads(await communicator.receive_from())['type'], 'snapshot')
+        await sync_to_async(publish)(1, 3, branches={1: 'A', 3: 'B'})
+        delta = json.loads(await communicator.receive_from())
+        self.assertEqual([row['device_id'] for row in delta['data']], [3])
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
+
+    async def test_unfiltered_client_gets_every_device(self):
+        communicator = await self.connect()
+        await sync_to_async(publish)(1, 3, branches={1: 'A', 3: 'B'})
+        delta = json.loads(await communicator.receive_from())
+        self.assertEqual(sorted(row['device_id'] for row in delta['data']), [1, 3])
+        await communicator.disconnect()
+
+    async def test_malformed_subscription_is_an_error(self):
+        communicator = await self.connect()
+        await communicator.send_to(text_data=json.dumps({'type': 'subscribe', 'metrics': ['humidity']}))
+        message = json.loads(await communicator.receive_from())
+        self.assertEqual(message['type'], 'error')
+        await communicator.disconnect()
+
+
+def updates(outcome):
+    return metrics.WEBSOCKET_UPDATES._local.get(metrics.WEBSOCKET_UPDATES._key({'outcome': outcome}), 0)
+
+
+@override_settings(**LOCAL_STREAM)
+class ConsumerBackpressureTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def consumer(self, max_rate=None):
+        consumer = DeviceStatsConsumer()
+        consumer.subscription = parse_subscription({'max_rate': max_rate})
+        consumer.last_sent = 0
+        consumer.byte_allowance = 0
+        consumer.allowance_at = time.monotonic()
+        return consumer
+
+    @override_settings(STREAM={**LOCAL_STREAM['STREAM'], 'CLIENT_MAX_RATE': 10})
+    def test_message_rate(self):
+        consumer = self.consumer(max_rate=2)
+        consumer.last_sent = time.monotonic()
+        self.assertAlmostEqual(consumer.send_delay(), 0.5, delta=0.05)
+        consumer.subscription['max_rate'] = 50  # Capped by CLIENT_MAX_RATE
+        self.assertAlmostEqual(consumer.send_delay(), 0.1, delta=0.05)
+        consumer.last_sent -= 1
+        self.assertLessEqual(consumer.send_delay(), 0)
+
+    @override_settings(STREAM={**LOCAL_STREAM['STREAM'], 'CLIENT_BYTE_BUDGET': 1000})
+    def test_byte_budget(self):
+        consumer = self.consumer()
+        consumer.byte_allowance = -500  # Sent 500 bytes over budget
+        self.assertAlmostEqual(consumer.send_delay(), 0.5, delta=0.05)
+        consumer.allowance_at -= 1
+        self.assertLessEqual(consumer.send_delay(), 0)
+        self.assertLessEqual(consumer.byte_allowance, 1000)  # Unused budget doesn't pile up
+
+    async def test_pending_rows_are_conflated_per_device(self):
+        snapshot = mock.AsyncMock(return_value={'type': 'snapshot', 'seq': 0, 'data': []})
+        conflated, sent = updates('conflated'), updates('sent')
+        with mock.patch.object(DeviceStatsConsumer, 'get_snapshot', snapshot):
+            communicator = WebsocketCommunicator(
+                DeviceStatsConsumer.as_asgi(), '/ws/device-stats/?max_rate=5', spec_version=3
+            )
+            communicator.scope['url_route'] = {'kwargs': {}}
+            await communicator.connect()
+            await communicator.receive_from()
+            started = time.monotonic()
+            for seq in (1, 2, 3):
+                await get_channel_layer().group_send(stream.GROUP, {
+                    'type': 'device_stats_update', 'group': stream.GROUP, 'seq': seq,
+                    'data': [{'device_id': 1, 'cpu_usage': float(seq)}, {'device_id': seq + 1, 'cpu_usage': 0.0}],
+                })
+            delta = json.loads(await communicator.receive_from())
+            waited = time.monotonic() - started
+            self.assertTrue(await communicator.receive_nothing())
+            await communicator.disconnect()
+
+        self.assertGreaterEqual(waited, 0.15)  # One delta per 0.2 s after the snapshot
+        self.assertEqual(delta['seq'], 3)
+        self.assertEqual({row['device_id']: row['cpu_usage'] for row in delta['data']}, {1: 3.0, 2: 0.0, 3: 0.0, 4: 0.0})
+        self.assertEqual(updates('conflated') - conflated, 2)
+        self.assertEqual(updates('sent') - sent, 4)
+
+    def test_unsent_rows_are_dropped_on_disconnect(self):
+        consumer = self.consumer()
+        consumer.pending, consumer.pending_seq = {1: {'device_id': 1}, 2: {'device_id': 2}}, 5
+        dropped = updates('dropped')
+        consumer.drop_pending()
+        self.assertEqual((consumer.pending, consumer.pending_seq), ({}, 0))
+        self.assertEqual(updates('dropped') - dropped, 2)
@@ -0,0 +1,82 @@
+# network/tests/test_tsstore.py
+import datetime
+import multiprocessing
+import os
+import tempfile
+import numpy as np
+from django.test import SimpleTestCase, override_settings
+from network import tsstore
+
+DAY_MS = 24 * 60 * 60 * 1000
+
+
+def _append_every_fourth(path, offset):
+    store = tsstore.TimeSeriesStore(path, segment_capacity=64)
+    for i in range(100):
+        ts = 1000 + i * 4 + offset
+        store.append(1, ts, {metric: ts for metric in tsstore.METRICS})
+    store.flush()
+
+
+class TimeSeriesStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.store = tsstore.TimeSeriesStore(self.tmp.name, segment_capacity=4)
+
+    def append(self, store, *timestamps):
+        for ts in timestamps:
+            store.append(1, ts, {'cpu_usage': float(ts), 'temperature': None})
+
+    def test_read_range_across_segments(self):
+        self.append(self.store, *range(10, 110, 10))
+        ts, values = self.store.read_range(1, 'cpu_usage', 25, 85)
+        self.assertEqual(ts.tolist(), [30, 40, 50, 60, 70, 80])
+        self.assertEqual(values.tolist(), [30, 40, 50, 60, 70, 80])
+        self.assertTrue(np.isnan(self.store.read_range(1, 'temperature', 0, 100)[1]).all())
+
+    def test_replayed_samples_are_ignored(self):
+        self.append(self.store, 10, 20, 20, 15)
+        self.assertEqual(self.store.read_range(1, 'cpu_usage', 0, 100)[0].tolist(), [10, 20])
+
+    def test_other_process_appends_are_picked_up(self):
+        other = tsstore.TimeSeriesStore(self.tmp.name, segment_capacity=4)
+        self.append(self.store, 10, 20, 30)
+        self.append(other, 40, 50)  # Fills the shared tail and opens a new segment
+        self.append(self.store, 60)
+        self.assertEqual(self.store.read_range(1, 'cpu_usage', 0, 100)[0].tolist(), [10, 20, 30, 40, 50, 60])
+        self.assertEqual(other.read_range(1, 'cpu_usage', 0, 100)[0].tolist(), [10, 20, 30, 40, 50, 60])
+
+    def test_concurrent_processes_never_share_a_slot(self):
+        context = multiprocessing.get_context('fork')
+        workers = [context.Process(target=_append_every_fourth, args=(self.tmp.name, offset)) for offset in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        store = tsstore.TimeSeriesStore(self.tmp.name, segment_capacity=64)
+        for metric in tsstore.METRICS:
+            ts, values = store.read_range(1, metric, 0, 10 ** 6)
+            self.assertTrue(len(ts))
+            self.assertTrue(np.all(np.diff(ts) > 0), metric)
+            self.assertEqual(values.tolist(), ts.astype(np.float32).tolist(), metric)
+
+    def test_cleanup_keeps_recent_and_tail_segments(self):
+        self.append(self.store, *range(10, 110, 10))  # Segments [10-40], [50-80], [90-100]
+        self.assertEqual(self.store.cleanup(before_ms=85), 2 * len(tsstore.METRICS))
+        self.assertEqual(self.store.read_range(1, 'cpu_usage', 0, 100)[0].tolist(), [90, 100])
+        self.assertEqual(self.store.cleanup(before_ms=1000), 0)  # Never the tail
+        self.append(self.store, 110)
+        self.assertEqual(self.store.read_range(1, 'cpu_usage', 0, 200)[0].tolist(), [90, 100, 110])
+
+    def test_cleanup_uses_retention_setting(self):
+        now = tsstore.to_epoch_ms(datetime.datetime.now(datetime.timezone.utc))
+        config = {'ENABLED': True, 'PATH': self.tmp.name, 'SEGMENT_CAPACITY': 4, 'RETENTION_DAYS': 7}
+        with override_settings(TIMESERIES_STORE=config):
+            tsstore._store = None
+            self.addCleanup(setattr, tsstore, '_store', None)
+            store = tsstore.get_store()
+            self.append(store, *(now - days * DAY_MS for days in (10, 9, 8, 7.5, 1)))
+            self.assertEqual(tsstore.cleanup(), len(tsstore.METRICS))
+            self.assertEqual(len(store.read_range(1, 'cpu_usage', 0, now)[0]), 1)
+            self.assertTrue(os.path.exists(os.path.join(self.tmp.name, '1', tsstore.LOCK_FILE)))
@@ -0,0 +1,116 @@
+# network/tests/test_usm.py
+from unittest import mock
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from pysnmp.hlapi import SnmpEngine
+from pysnmp.carrier.asyncore.dgram import udp
+from network import usm
+
+# RFC 3414 appendix A.3: passphrase "maplesyrup" localized for this engine ID
+ENGINE_ID = '000000000000000000000002'
+MD5_KEY = '526f5eed9fcce26f8964c2930787d82b'
+SHA_KEY = '6695febc9288e36282235fc7151f128497b38f3f'
+LOCAL_ONLY = {'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}}
+
+
+class LocalizedKeyTests(SimpleTestCase):
+    def test_rfc_3414_vectors(self):
+        engine_id = bytes.fromhex(ENGINE_ID)
+        auth, priv = usm.localized_keys(engine_id, 'MD5', 'maplesyrup', 'DES', 'maplesyrup')
+        self.assertEqual(auth.hex(), MD5_KEY)
+        self.assertEqual(priv.hex(), MD5_KEY)
+        auth, priv = usm.localized_keys(engine_id, 'SHA', 'maplesyrup', 'AES', 'maplesyrup')
+        self.assertEqual(auth.hex(), SHA_KEY)
+        self.assertEqual(priv.hex(), SHA_KEY[:32])  # AES-128 uses the first 16 bytes
+
+    def test_unused_keys_are_none(self):
+        self.assertEqual(usm.localized_keys(bytes.fromhex(ENGINE_ID), 'none', '', 'none', ''), (None, None))
+
+    def test_privacy_requires_authentication(self):
+        user = usm.UsmUser('ops', auth_protocol='SHA', auth_key='', priv_protocol='AES', priv_key='secret')
+        self.assertEqual((user.auth_protocol, user.priv_protocol), ('none', 'none'))
+
+
+@override_settings(**LOCAL_ONLY)
+class EngineInfoCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.engines = usm.EngineInfoCache()
+
+    def test_shared_with_other_workers(self):
+        self.engines.set('10.0.2.1', 161, ENGINE_ID, 3, 1000)
+        info = usm.EngineInfoCache().get('10.0.2.1', 161)
+        self.assertEqual((info['engine_id'], info['boots'], info['time']), (ENGINE_ID, 3, 1000))
+        self.assertIsNone(usm.EngineInfoCache().get('10.0.2.1', 1161))
+
+    def test_unchanged_engine_is_not_rewritten(self):
+        self.engines.set('10.0.2.1', 161, ENGINE_ID, 3, 1000)
+        with mock.patch.object(usm.cache, 'set') as cache_set:
+            self.engines.set('10.0.2.1', 161, ENGINE_ID, 3, 1060)
+            cache_set.assert_not_called()
+            self.engines.set('10.0.2.1', 161, ENGINE_ID, 4, 5)  # Rebooted
+            cache_set.assert_called_once()
+
+    def test_delete(self):
+        self.engines.set('10.0.2.1', 161, ENGINE_ID, 3, 1000)
+        self.engines.delete('10.0.2.1', 161)
+        self.assertIsNone(self.engines.get('10.0.2.1', 161))
+        self.assertIsNone(usm.EngineInfoCache().get('10.0.2.1', 161))
+
+
+@override_settings(**LOCAL_ONLY)
+class AuthDataTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        patcher = mock.patch.object(usm, 'engines', usm.EngineInfoCache())
+        self.engines = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.engine = SnmpEngine()
+        self.user = usm.UsmUser('ops', 'SHA', 'maplesyrup', 'AES', 'maplesyrup')
+
+    def test_cached_engine_skips_discovery(self):
+        self.engines.set('10.0.2.1', 161, ENGINE_ID, 3, 1000)
+        with mock.patch.object(usm, 'discover') as discover:
+            data = usm.auth_data(self.engine, self.user, '10.0.2.1', 161)
+        discover.assert_not_called()
+        self.assertEqual(bytes(data.authKey).hex(), SHA_KEY)
+        self.assertEqual(bytes(data.securityEngineId).hex(), ENGINE_ID)
+
+    def test_prime_loads_peer_and_clock(self):
+        self.engines.set('10.0.2.1', 161, ENGINE_ID, 3, 1000)
+        usm.auth_data(self.engine, self.user, '10.0.2.1', 161)
+        peer = usm._peer_cache(self.engine)[(udp.domainName, ('10.0.2.1', 161))]
+        self.assertEqual(peer['securityEngineId'].asOctets().hex(), ENGINE_ID)
+        boots, engine_time, _, _ = usm._timeline(self.engine)[peer['securityEngineId']]
+        self.assertEqual(int(boots), 3)
+        self.assertGreaterEqual(int(engine_time), 1000)
+
+    def test_discovers_unknown_engine(self):
+        with mock.patch.object(usm, 'discover', return_value=ENGINE_ID) as discover:
+            data = usm.auth_data(self.engine, self.user, '10.0.2.2', 161)
+        discover.assert_called_once()
+        self.assertEqual(bytes(data.securityEngineId).hex(), ENGINE_ID)
+
+    def test_undiscoverable_device(self):
+        with mock.patch.object(usm, 'discover', return_value=None):
+            self.assertIsNone(usm.auth_data(self.engine, self.user, '10.0.2.3', 161))
+
+    def test_changed_credentials_drop_old_keys(self):
+        self.engines.set('10.0.2.1', 161, ENGINE_ID, 3, 1000)
+        usm.auth_data(self.engine, self.user, '10.0.2.1', 161)
+        with mock.patch.object(usm.lcd, 'unconfigure') as unconfigure:
+            usm.auth_data(self.engine, self.user, '10.0.2.1', 161)
+            unconfigure.assert_not_called()
+            rekeyed = usm.UsmUser('ops', 'SHA', 'new passphrase', 'AES', 'maplesyrup')
+            usm.auth_data(self.engine, rekeyed, '10.0.2.1', 161)
+        unconfigure.assert_called_once()
+        self.assertEqual(bytes(unconfigure.call_args.args[1].authKey).hex(), SHA_KEY)
+
+    def test_forget(self):
+        self.engines.set('10.0.2.1', 161, ENGINE_ID, 3, 1000)
+        usm.auth_data(self.engine, self.user, '10.0.2.1', 161)
+        usm.forget(self.engine, '10.0.2.1', 161)
+        self.assertIsNone(self.engines.get('10.0.2.1', 161))
+        self.assertNotIn((udp.domainName, ('10.0.2.1', 161)), usm._peer_cache(self.engine))
@@ -0,0 +1,327 @@
+# network/tsstore.py
+"""
+Memory-mapped columnar store for DeviceStats samples.
+
+Samples are kept per device and per metric in fixed-size segment files:
+
+    <PATH>/<device_id>/<metric>/<first_timestamp_ms>.seg
+
+Each segment holds CAPACITY int64 epoch-millisecond timestamps followed by
+CAPACITY float32 values. Unused timestamp slots hold INT64_MAX, so the number
+of samples in a segment is a binary search away and segments stay sorted.
+Missing readings are stored as NaN so every metric of a device shares one
+timestamp axis.
+
+Appends may come from several processes (the ingest drain and the pollers'
+direct-write fallback), so each device's appends hold an exclusive flock on
+<PATH>/<device_id>/.lock. Readers don't lock: a slot's timestamp is written
+after its value, so they see either the old or the new count.
+
+Segments whose last sample is older than TIMESERIES_STORE['RETENTION_DAYS']
+are deleted by cleanup(), which runs with the daily cleanup_old_stats task.
+
+The store is optional and enabled with settings.TIMESERIES_STORE['ENABLED'].
+"""
+import os
+import fcntl
+import shutil
+import datetime
+import threading
+import logging
+from contextlib import contextmanager
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+METRICS = ('cpu_usage', 'temperature', 'latency', 'bandwidth')
+TS_DTYPE = np.dtype('<i8')
+VALUE_DTYPE = np.dtype('<f4')
+EMPTY_TS = np.iinfo(np.int64).max
+SEGMENT_SUFFIX = '.seg'
+LOCK_FILE = '.lock'
+DEFAULT_RETENTION_DAYS = 30  # Same as DeviceStats.cleanup_old_records
+
+
+def to_epoch_ms(timestamp):
+    """Convert an aware datetime to integer epoch milliseconds."""
+    return int(timestamp.timestamp() * 1000)
+
+
+class Segment:
+    """
+    One fixed-capacity segment file for a single device/metric pair.
+    """
+    def __init__(self, path, capacity):
+        self.path = path
+        self.capacity = capacity
+        self.start = int(os.path.basename(path)[:-len(SEGMENT_SUFFIX)])
+        self._ts = None
+        self._values = None
+        self.count = 0
+        self.end = self.start
+
+    @classmethod
+    def create(cls, path, capacity, start):
+        """Preallocate a new segment file filled with empty slots."""
+        with open(path, 'wb') as f:
+            np.full(capacity, EMPTY_TS, dtype=TS_DTYPE).tofile(f)
+            np.full(capacity, np.nan, dtype=VALUE_DTYPE).tofile(f)
+        return cls(path, capacity).open()
+
+    def open(self):
+        """Map the file and recompute count/end from the timestamp column."""
+        if self._ts is None:
+            self._ts = np.memmap(self.path, dtype=TS_DTYPE, mode='r+', shape=(self.capacity,))
+            self._values = np.memmap(
+                self.path, dtype=VALUE_DTYPE, mode='r+',
+                offset=self.capacity * TS_DTYPE.itemsize, shape=(self.capacity,)
+            )
+        self.refresh()
+        return self
+
+    def refresh(self):
+        """Pick up samples appended by another process."""
+        self.count = int(np.searchsorted(self._ts, EMPTY_TS, side='left'))
+        self.end = int(self._ts[self.count - 1]) if self.count else self.start
+        return self
+
+    @property
+    def full(self):
+        return self.count >= self.capacity
+
+    def append(self, ts, value):
+        # Value first: the timestamp is what makes the slot count for readers
+        self._values[self.count] = np.nan if value is None else value
+        self._ts[self.count] = ts
+        self.count += 1
+        self.end = ts
+
+    def slice(self, start, end):
+        """Zero-copy (timestamps, values) views for start <= ts <= end."""
+        ts = self._ts[:self.count]
+        lo = int(np.searchsorted(ts, start, side='left'))
+        hi = int(np.searchsorted(ts, end, side='right'))
+        return ts[lo:hi], self._values[lo:hi]
+
+    def flush(self):
+        if self._ts is not None:
+            self._ts.flush()
+            self._values.flush()
+
+
+class TimeSeriesStore:
+    """
+    Append-only, per-device/per-metric columnar sample store backed by memory-mapped segments.
+    Keeps an in-memory index of each series' segments and their time ranges.
+    """
+    def __init__(self, path, segment_capacity=65536):
+        self.path = str(path)
+        self.segment_capacity = segment_capacity
+        self._index = {}  # (device_id, metric) -> list[Segment] ordered by start
+        self._lock = threading.Lock()
+        os.makedirs(self.path, exist_ok=True)
+
+    def _series_dir(self, device_id, metric):
+        return os.path.join(self.path, str(device_id), metric)
+
+    @contextmanager
+    def _device_lock(self, device_id):
+        """Exclusive flock on the device's lock file, held across processes."""
+        device_dir = os.path.join(self.path, str(device_id))
+        os.makedirs(device_dir, exist_ok=True)
+        with open(os.path.join(device_dir, LOCK_FILE), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _segments(self, device_id, metric):
+        """
+        Return the (cached) segment list for a series, picking up segment files
+        created by other processes since the last call.
+        """
+        key = (device_id, metric)
+        segments = self._index.get(key)
+        series_dir = self._series_dir(device_id, metric)
+        if not os.path.isdir(series_dir):
+            return self._index.setdefault(key, [])
+
+        names = sorted(
+            (name for name in os.listdir(series_dir) if name.endswith(SEGMENT_SUFFIX)),
+            key=lambda name: int(name[:-len(SEGMENT_SUFFIX)])
+        )
+        if segments is None or [os.path.basename(s.path) for s in segments] != names:
+            known = {os.path.basename(s.path): s for s in (segments or [])}
+            segments = [
+                known[name].refresh() if name in known
+                else Segment(os.path.join(series_dir, name), self.segment_capacity).open()
+                for name in names
+            ]
+            self._index[key] = segments
+        elif segments:
+            segments[-1].refresh()
+        return segments
+
+    def append(self, device_id, timestamp_ms, values):
+        """
+        Append one sample for every metric in METRICS. Samples at or before the
+        series' last timestamp are ignored, which makes replays idempotent.
+        """
+        with self._lock, self._device_lock(device_id):
+            for metric in METRICS:
+                segments = self._segments(device_id, metric)
+                tail = segments[-1] if segments else None
+                if tail is not None and tail.count and timestamp_ms <= tail.end:
+                    continue
+                if tail is None or tail.full:
+                    series_dir = self._series_dir(device_id, metric)
+                    os.makedirs(series_dir, exist_ok=True)
+                    path = os.path.join(series_dir, f"{timestamp_ms}{SEGMENT_SUFFIX}")
+                    tail = Segment.create(path, self.segment_capacity, timestamp_ms)
+                    segments.append(tail)
+                tail.append(timestamp_ms, values.get(metric))
+
+    def delete_device(self, device_id):
+        """Drop every series of a deleted device."""
+        with self._lock:
+            for key in [key for key in self._index if key[0] == device_id]:
+                del self._index[key]
+            shutil.rmtree(os.path.join(self.path, str(device_id)), ignore_errors=True)
+
+    def cleanup(self, before_ms):
+        """
+        Delete segments whose samples are all older than before_ms. A series'
+        newest segment is kept, since appends continue in it.
+        Returns the number of segment files deleted.
+        """
+        deleted = 0
+        for name in os.listdir(self.path):
+            if not name.isdigit():
+                continue
+            device_id = int(name)
+            with self._lock, self._device_lock(device_id):
+                for metric in METRICS:
+                    segments = self._segments(device_id, metric)
+                    expired = [segment for segment in segments[:-1] if segment.end < before_ms]
+                    for segment in expired:
+                        os.remove(segment.path)
+                    if expired:
+                        self._index[(device_id, metric)] = segments[len(expired):]
+                        deleted += len(expired)
+        return deleted
+
+    def flush(self):
+        """Flush dirty pages of all open segments to disk."""
+        with self._lock:
+            for segments in self._index.values():
+                for segment in segments:
+                    segment.flush()
+
+    def iter_range(self, device_id, metric, start_ms, end_ms):
+        """
+        Yield zero-copy (timestamps, values) array slices, one per segment
+        overlapping [start_ms, end_ms], in time order.
+        """
+        for segment in self._segments(device_id, metric):
+            if segment.count == 0 or segment.end < start_ms or segment.start > end_ms:
+                continue
+            ts, values = segment.slice(start_ms, end_ms)
+            if len(ts):
+                yield ts, values
+
+    def read_range(self, device_id, metric, start_ms, end_ms):
+        """
+        Return (timestamps, values) for one metric in [start_ms, end_ms].
+        Zero-copy when the range falls inside a single segment.
+        """
+        slices = list(self.iter_range(device_id, metric, start_ms, end_ms))
+        if not slices:
+            return np.empty(0, dtype=TS_DTYPE), np.empty(0, dtype=VALUE_DTYPE)
+        if len(slices) == 1:
+            return slices[0]
+        return np.concatenate([s[0] for s in slices]), np.concatenate([s[1] for s in slices])
+
+    def read_columns(self, device_id, start_ms, end_ms, metrics=METRICS):
+        """
+        Return (timestamps, {metric: values}) on a shared timestamp axis.
+        Metrics are normally appended together, so the axes already match;
+        otherwise the union of timestamps is used and gaps are NaN.
+        """
+        series = {metric: self.read_range(device_id, metric, start_ms, end_ms) for metric in metrics}
+        axes = [ts for ts, _ in series.values()]
+        if all(len(ts) == len(axes[0]) and np.array_equal(ts, axes[0]) for ts in axes):
+            timestamps = axes[0] if axes else np.empty(0, dtype=TS_DTYPE)
+            return timestamps, {metric: values for metric, (_, values) in series.items()}
+
+        timestamps = np.unique(np.concatenate(axes))
+        columns = {}
+        for metric, (ts, values) in series.items():
+            column = np.full(len(timestamps), np.nan, dtype=VALUE_DTYPE)
+            column[np.searchsorted(timestamps, ts)] = values
+            columns[metric] = column
+        return timestamps, columns
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """
+    Return the process-wide TimeSeriesStore, or None when the store is disabled.
+    """
+    global _store
+    config = getattr(settings, 'TIMESERIES_STORE', {})
+    if not config.get('ENABLED'):
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = TimeSeriesStore(config['PATH'], config.get('SEGMENT_CAPACITY', 65536))
+    return _store
+
+
+def record(device_id, timestamp, values):
+    """
+    Append a poll result to the store if it is enabled. Never raises, so a
+    store problem can't break polling.
+    """
+    store = get_store()
+    if store is None:
+        return
+    try:
+        store.append(device_id, to_epoch_ms(timestamp), values)
+    except Exception as e:
+        logger.error(f"Failed to append stats for device {device_id} to the time-series store: {e}")
+
+
+def flush():
+    store = get_store()
+    if store is not None:
+        store.flush()
+
+
+def cleanup():
+    """Delete segments past TIMESERIES_STORE['RETENTION_DAYS']; returns the number deleted."""
+    store = get_store()
+    if store is None:
+        return 0
+    days = getattr(settings, 'TIMESERIES_STORE', {}).get('RETENTION_DAYS', DEFAULT_RETENTION_DAYS)
+    cutoff = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=days)
+    return store.cleanup(to_epoch_ms(cutoff))
+
+
+def iter_rows(timestamps, columns):
+    """
+    Yield (datetime, {metric: float or None}) rows from read_columns() output,
+    for endpoints that still render one row per sample.
+    """
+    metrics = list(columns)
+    for i, ts in enumerate(timestamps.tolist()):
+        row = {}
+        for metric in metrics:
+            value = float(columns[metric][i])
+            row[metric] = None if np.isnan(value) else value
+        yield datetime.datetime.fromtimestamp(ts / 1000, tz=datetime.timezone.utc), row
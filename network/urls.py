@@ -1,10 +1,10 @@
 # network/urls.py 
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .api_views import DeviceViewSet, DeviceStatsViewSet, current_device_stats
+from .api_views import DeviceViewSet, DeviceStatsViewSet, current_device_stats, device_series, stats_changes
 from .views import device_stats_api, download_device_stats, performance_graph_view
 from network.views import register_user
-from . import views
+from . import views, async_views, remote
 
 router = DefaultRouter()
 router.register(r'devices', DeviceViewSet, basename='device')
@@ -28,8 +28,20 @@ urlpatterns = [
     path('devices/stats/', views.device_stats_api, name='device_stats'),  # New URL for device stats page
     path('api/device-stats/', device_stats_api, name='api-device-stats'),
     path('api/current-stats/', current_device_stats, name='current-stats'),
+    path('api/device-historical-stats/', views.device_historical_stats_api, name='api-device-historical-stats'),
+    path('api/series/', device_series, name='device-series'),  # Multi-device columnar series
+    path('api/changes/', stats_changes, name='stats-changes'),  # Stream updates since a cursor
     path('download_stats/', download_device_stats, name='download_stats'),
+
+    # Async (ASGI) versions of the live and stats endpoints
+    path('api/async/devices/<int:pk>/', async_views.device_live, name='async-device-live'),
+    path('api/async/devices/<int:pk>/historical_stats/', async_views.historical_stats, name='async-historical-stats'),
+    path('api/async/current-stats/', async_views.current_stats, name='async-current-stats'),
     
+    # Standalone collectors (see network/remote.py and network/edge.py)
+    path('api/collector/assignment/', remote.assignment_view, name='collector-assignment'),
+    path('api/collector/results/', remote.results_view, name='collector-results'),
+
     # API routes
     path('api/', include(router.urls)),
 ]
\ No newline at end of file
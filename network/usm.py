@@ -0,0 +1,263 @@
+# network/usm.py
+"""
+SNMPv3 User-based Security Model (USM) support for the collector.
+
+A v3 device is normally contacted in three steps: engine-ID discovery, a
+boots/time resync, and then the real request. pysnmp also localizes both
+passphrases for the device's engine ID, which hashes a megabyte per key.
+To pay those costs only on first contact:
+
+- The discovered engine ID and boots/time are kept in the Django cache
+  ('usm:engine:<address>:<port>') and primed into each thread's SnmpEngine,
+  so a fresh worker thread or process also skips discovery and resync.
+- Localized keys are cached in-process per (engine ID, protocol, passphrase)
+  and handed to pysnmp as already-localized keys. They are never written to
+  the shared cache.
+
+After first contact a v3 poll is a single round trip, like v2c.
+"""
+import functools
+import threading
+import time
+import logging
+from django.core.cache import cache
+from pysnmp.carrier.asyncore.dgram import udp
+from pysnmp.entity import config
+from pysnmp.hlapi.asyncore.cmdgen import lcd
+from pysnmp.hlapi import (
+    UsmUserData,
+    UdpTransportTarget,
+    ContextData,
+    ObjectType,
+    ObjectIdentity,
+    getCmd,
+    usmKeyTypeLocalized,
+)
+from pysnmp.proto.rfc1902 import Integer, OctetString
+
+logger = logging.getLogger(__name__)
+
+ENGINE_CACHE_PREFIX = 'usm:engine:'
+ENGINE_CACHE_TTL = 7 * 24 * 60 * 60
+# Re-save boots/time at most this often (seconds); they only drift after reboots
+ENGINE_REFRESH_SECONDS = 600
+# User name sent in the discovery probe; agents answer it with their engine ID
+DISCOVERY_USER = 'signalsync-discovery'
+SYS_DESCR_OID = '1.3.6.1.2.1.1.1.0'
+
+AUTH_PROTOCOLS = {
+    'none': config.usmNoAuthProtocol,
+    'MD5': config.usmHMACMD5AuthProtocol,
+    'SHA': config.usmHMACSHAAuthProtocol,
+    'SHA224': config.usmHMAC128SHA224AuthProtocol,
+    'SHA256': config.usmHMAC192SHA256AuthProtocol,
+    'SHA384': config.usmHMAC256SHA384AuthProtocol,
+    'SHA512': config.usmHMAC384SHA512AuthProtocol,
+}
+
+PRIV_PROTOCOLS = {
+    'none': config.usmNoPrivProtocol,
+    'DES': config.usmDESPrivProtocol,
+    '3DES': config.usm3DESEDEPrivProtocol,
+    'AES': config.usmAesCfb128Protocol,
+    'AES192': config.usmAesCfb192Protocol,
+    'AES256': config.usmAesCfb256Protocol,
+}
+
+
+class UsmUser:
+    """SNMPv3 credentials of one device."""
+    def __init__(self, username, auth_protocol='SHA', auth_key='', priv_protocol='AES', priv_key=''):
+        self.username = username
+        self.auth_protocol = auth_protocol if auth_key else 'none'
+        self.auth_key = auth_key
+        # Privacy requires authentication
+        self.priv_protocol = priv_protocol if priv_key and self.auth_protocol != 'none' else 'none'
+        self.priv_key = priv_key
+
+    @classmethod
+    def from_device(cls, device):
+        return cls(
+            device.snmp_v3_username,
+            device.snmp_v3_auth_protocol,
+            device.snmp_v3_auth_key,
+            device.snmp_v3_priv_protocol,
+            device.snmp_v3_priv_key,
+        )
+
+
+@functools.lru_cache(maxsize=4096)
+def localized_keys(engine_id, auth_protocol, auth_key, priv_protocol, priv_key):
+    """
+    Localize the passphrases for one engine ID (RFC 3414 section 2.6).
+    Returns (auth key, priv key) as bytes, None where not used.
+    """
+    auth_oid = AUTH_PROTOCOLS[auth_protocol]
+    engine_id = OctetString(engine_id)
+    auth_local = priv_local = None
+    if auth_protocol != 'none':
+        service = config.authServices[auth_oid]
+        auth_local = bytes(service.localizeKey(service.hashPassphrase(OctetString(auth_key)), engine_id))
+    if priv_protocol != 'none':
+        service = config.privServices[PRIV_PROTOCOLS[priv_protocol]]
+        master = service.hashPassphrase(auth_oid, OctetString(priv_key))
+        priv_local = bytes(service.localizeKey(auth_oid, master, engine_id))
+    return auth_local, priv_local
+
+
+class EngineInfoCache:
+    """
+    Engine ID and boots/time per device address, shared through the Django
+    cache with an in-process copy.
+    """
+    def __init__(self):
+        self._local = {}
+        self._lock = threading.Lock()
+
+    def _key(self, address, port):
+        return f'{ENGINE_CACHE_PREFIX}{address}:{port}'
+
+    def get(self, address, port):
+        info = self._local.get((address, port))
+        if info is None:
+            info = cache.get(self._key(address, port))
+            if info is not None:
+                with self._lock:
+                    self._local[(address, port)] = info
+        return info
+
+    def set(self, address, port, engine_id, boots, engine_time):
+        previous = self._local.get((address, port))
+        now = time.time()
+        if (previous and previous['engine_id'] == engine_id and previous['boots'] == boots
+                and now - previous['updated'] < ENGINE_REFRESH_SECONDS):
+            return
+        info = {'engine_id': engine_id, 'boots': boots, 'time': engine_time, 'updated': now}
+        with self._lock:
+            self._local[(address, port)] = info
+        cache.set(self._key(address, port), info, ENGINE_CACHE_TTL)
+
+    def delete(self, address, port):
+        with self._lock:
+            self._local.pop((address, port), None)
+        cache.delete(self._key(address, port))
+
+
+engines = EngineInfoCache()
+
+# USM users configured on this thread's SnmpEngine, by (engine, user name, engine ID)
+_configured = threading.local()
+
+
+# pysnmp keeps discovered peers in name-mangled attributes and has no public
+# setter. If a pysnmp upgrade renames them, priming is skipped and pysnmp
+# falls back to its normal discovery.
+def _peer_cache(snmp_engine):
+    return getattr(snmp_engine.messageProcessingSubsystems.get(3), '_SnmpV3MessageProcessingModel__engineIdCache', None)
+
+
+def _timeline(snmp_engine):
+    return getattr(snmp_engine.securityModels.get(3), '_SnmpUSMSecurityModel__timeline', None)
+
+
+def prime(snmp_engine, address, port, info):
+    """
+    Load a cached engine ID and boots/time into snmp_engine unless it already
+    knows the peer, so the request skips discovery and the time resync.
+    """
+    peers, timeline = _peer_cache(snmp_engine), _timeline(snmp_engine)
+    if peers is None or timeline is None:
+        return
+    engine_id = OctetString(hexValue=info['engine_id'])
+    key = (udp.domainName, (address, port))
+    if key not in peers:
+        peers[key] = {'securityEngineId': engine_id, 'contextEngineId': engine_id, 'contextName': OctetString('')}
+    if engine_id not in timeline:
+        # Advance the agent's clock by the time since it was recorded
+        engine_time = int(info['time'] + time.time() - info['updated'])
+        timeline[engine_id] = (Integer(info['boots']), Integer(engine_time), Integer(engine_time), int(time.time()))
+
+
+def learn(snmp_engine, address, port):
+    """Store the engine ID and boots/time snmp_engine has for a peer."""
+    engine_id = snmp_engine.messageProcessingSubsystems[3].getPeerEngineInfo(udp.domainName, (address, port))[0]
+    timeline = _timeline(snmp_engine)
+    if engine_id is None or not timeline or engine_id not in timeline:
+        return
+    boots, engine_time, _, updated = timeline[engine_id]
+    engine_time = int(engine_time) + int(time.time()) - updated
+    engines.set(address, port, engine_id.asOctets().hex(), int(boots), engine_time)
+
+
+def forget(snmp_engine, address, port):
+    """Drop what is known about a peer, e.g. after it was replaced or re-keyed."""
+    engines.delete(address, port)
+    peers = _peer_cache(snmp_engine)
+    if peers is not None:
+        peers.pop((udp.domainName, (address, port)), None)
+
+
+def discover(snmp_engine, address, port, timeout, retries):
+    """
+    Learn a device's engine ID with a probe from an unknown user. The agent
+    answers with a discovery report and then rejects the user, which is
+    expected. Returns the engine ID as hex, or None if the device didn't answer.
+    """
+    next(getCmd(
+        snmp_engine,
+        UsmUserData(DISCOVERY_USER),
+        UdpTransportTarget((address, port), timeout=timeout, retries=retries),
+        ContextData(),
+        ObjectType(ObjectIdentity(SYS_DESCR_OID))
+    ))
+    engine_id = snmp_engine.messageProcessingSubsystems[3].getPeerEngineInfo(udp.domainName, (address, port))[0]
+    if engine_id is None:
+        return None
+    logger.info(f"Discovered SNMP engine ID {engine_id.asOctets().hex()} for {address}")
+    return engine_id.asOctets().hex()
+
+
+def auth_data(snmp_engine, user, address, port, timeout=2, retries=1):
+    """
+    Build UsmUserData for a device with keys localized for its engine ID,
+    discovering the engine ID on first contact. Returns None if the device
+    could not be discovered.
+    """
+    info = engines.get(address, port)
+    if info is None:
+        engine_id = discover(snmp_engine, address, port, timeout, retries)
+        if engine_id is None:
+            return None
+        # No boots/time yet: the first authenticated request resyncs them
+        info = {'engine_id': engine_id, 'boots': 0, 'time': 0, 'updated': time.time()}
+    else:
+        prime(snmp_engine, address, port, info)
+
+    engine_id = bytes.fromhex(info['engine_id'])
+    auth_key, priv_key = localized_keys(
+        engine_id, user.auth_protocol, user.auth_key, user.priv_protocol, user.priv_key
+    )
+    data = UsmUserData(
+        user.username,
+        authKey=auth_key,
+        privKey=priv_key,
+        authProtocol=AUTH_PROTOCOLS[user.auth_protocol],
+        privProtocol=PRIV_PROTOCOLS[user.priv_protocol],
+        securityEngineId=OctetString(engine_id),
+        authKeyType=usmKeyTypeLocalized,
+        privKeyType=usmKeyTypeLocalized,
+    )
+
+    # pysnmp keeps the first keys configured for a (user, engine ID) pair, so
+    # drop them when the device's credentials change
+    configured = _configured.__dict__.setdefault('users', {})
+    key = (id(snmp_engine), user.username, engine_id)
+    previous = configured.get(key)
+    if previous is not None and (previous.authKey, previous.privKey, previous.authProtocol, previous.privProtocol) != (
+            data.authKey, data.privKey, data.authProtocol, data.privProtocol):
+        try:
+            lcd.unconfigure(snmp_engine, previous)
+        except Exception as e:
+            logger.error(f"Failed to drop old SNMPv3 keys for {address}: {e}")
+    configured[key] = data
+    return data
@@ -8,15 +8,15 @@ from django.conf import settings
 from django.contrib.auth import authenticate, login, logout
 from django.http import JsonResponse, HttpResponse
 from django.utils import timezone
-from .models import Device, DeviceStats, NotificationPreference
+from .models import Device, DeviceAlert, DeviceStats, NotificationPreference
 from .forms import DeviceForm
+from . import collector, downsample, recent, tsstore, ingest
 from django.contrib.auth.forms import UserCreationForm
 import csv
 import json
 from datetime import datetime, timedelta
 from ping3 import ping
 import logging
-from pysnmp.hlapi import SnmpEngine, CommunityData, UdpTransportTarget, ContextData, ObjectType, ObjectIdentity, getCmd
 from django.contrib.auth.models import User
 from django.views.decorators.csrf import csrf_exempt
 
@@ -36,34 +36,6 @@ def register_user(request):
         form = UserCreationForm()
     return render(request, 'register.html', {'form': form})
 
-# SNMP utility function
-def fetch_snmp_data(ip, oid, community='public', version='2c'):
-    try:
-        snmp_version = 0 if version == '1' else 1  # SNMP v1 = 0, v2c = 1
-        iterator = getCmd(
-            SnmpEngine(),
-            CommunityData(community, mpModel=snmp_version),
-            UdpTransportTarget((ip, 161), timeout=2, retries=1),
-            ContextData(),
-            ObjectType(ObjectIdentity(oid))
-        )
-
-        errorIndication, errorStatus, errorIndex, varBinds = next(iterator)
-        if errorIndication:
-            logger.error(f"SNMP error from {ip}: {errorIndication}")
-            return None
-        elif errorStatus:
-            return None
-
-        for varBind in varBinds:
-            try:
-                return float(varBind[1])  # Convert to float if possible
-            except (ValueError, TypeError):
-                return None
-    except Exception as e:
-        logger.error(f"SNMP Error for {ip}: {e}")
-        return None
-
 # Login view
 def user_login(request):
     if request.method == 'POST':
@@ -131,20 +103,12 @@ def device_add(request):
         if form.is_valid():
             device = form.save(commit=False)
             device.status = check_device_status(device.ip_address)
-            device.cpu_usage = fetch_snmp_data(device.ip_address, '1.3.6.1.4.1.2021.11.10.0')
-            device.temperature = fetch_snmp_data(device.ip_address, '1.3.6.1.4.1.2021.13.16.0')
-            device.latency = fetch_snmp_data(device.ip_address, '1.3.6.1.2.1.31.1.1.1.10.1')
-            device.bandwidth = fetch_snmp_data(device.ip_address, '1.3.6.1.2.1.31.1.1.1.15.1')
+            for name, value in collector.collect(device).items():
+                setattr(device, name, value)
             device.save()
             
-            # Create initial stats record
-            DeviceStats.objects.create(
-                device=device,
-                cpu_usage=device.cpu_usage,
-                temperature=device.temperature,
-                latency=device.latency,
-                bandwidth=device.bandwidth
-            )
+            # Record the initial stats through the ingest pipeline
+            ingest.submit([initial_sample(device)])
             
             messages.success(request, 'Device added successfully!')
             return redirect('device_list')
@@ -192,6 +156,7 @@ def import_csv(request):
             csv_data = csv.reader(file_data)
             next(csv_data, None)  # Skip header
 
+            samples = []
             for row in csv_data:
                 if len(row) != 5:
                     logger.warning(f"Skipping invalid row: {row}")
@@ -210,13 +175,9 @@ def import_csv(request):
                 
                 # Create initial stats record if device was created
                 if created:
-                    DeviceStats.objects.create(
-                        device=device,
-                        cpu_usage=device.cpu_usage,
-                        temperature=device.temperature,
-                        latency=device.latency,
-                        bandwidth=device.bandwidth
-                    )
+                    samples.append(initial_sample(device))
+            if samples:
+                ingest.submit(samples)
 
             messages.success(request, 'CSV imported successfully.')
             return redirect('device_list')
@@ -225,6 +186,14 @@ def import_csv(request):
             messages.error(request, 'An error occurred while importing the CSV file.')
     return render(request, 'import_csv.html')
 
+# First history sample of a newly added device
+def initial_sample(device):
+    return ingest.make_sample(
+        device.id,
+        timezone.now(),
+        {metric: getattr(device, metric) for metric in ingest.METRICS},
+    )
+
 # Check device status using ping
 def check_device_status(ip_address):
     try:
@@ -349,8 +318,19 @@ def device_stats_api(request):
 # API view to get device historical stats
 @login_required
 def device_historical_stats_api(request):
+    """
+    Chart data for one device, downsampled per metric with LTTB.
+    Query parameters: device_id, days (default 7), points (target points per
+    metric, default downsample.DEFAULT_POINTS).
+    Returns {metric: {'timestamps': [epoch ms], 'values': [...]}}; missing
+    readings are left out rather than sent as 0.
+    """
     device_id = request.GET.get('device_id')
-    days = int(request.GET.get('days', 7))
+    try:
+        days = int(request.GET.get('days', 7))
+        points = downsample.parse_points(request.GET.get('points'))
+    except ValueError:
+        return JsonResponse({'error': 'days and points must be integers'}, status=400)
     
     if not device_id:
         return JsonResponse({'error': 'Device ID is required'}, status=400)
@@ -361,29 +341,27 @@ def device_historical_stats_api(request):
         return JsonResponse({'error': 'Device not found'}, status=404)
     
     # Get stats for the specified period
-    start_date = timezone.now() - timedelta(days=days)
-    stats = DeviceStats.objects.filter(
-        device=device,
-        timestamp__gte=start_date
-    ).order_by('timestamp')
-    
-    # Format data for charts
-    result = {
-        'labels': [],
-        'cpu_usage': [],
-        'temperature': [],
-        'latency': [],
-        'bandwidth': []
-    }
-    
-    for stat in stats:
-        result['labels'].append(stat.timestamp.strftime('%Y-%m-%d %H:%M'))
-        result['cpu_usage'].append(stat.cpu_usage if stat.cpu_usage is not None else 0)
-        result['temperature'].append(stat.temperature if stat.temperature is not None else 0)
-        result['latency'].append(stat.latency if stat.latency is not None else 0)
-        result['bandwidth'].append(stat.bandwidth if stat.bandwidth is not None else 0)
+    end_date = timezone.now()
+    start_date = end_date - timedelta(days=days)
+    
+    # Read straight from the columnar store when it is enabled, or from the
+    # recent-samples buffer when the window fits in it
+    store = tsstore.get_store()
+    start_ms, end_ms = tsstore.to_epoch_ms(start_date), tsstore.to_epoch_ms(end_date)
+    if store is not None:
+        timestamps, columns = store.read_columns(device.id, start_ms, end_ms)
+    else:
+        buffered = recent.read_columns(device.id, start_ms, end_ms)
+        if buffered is not None:
+            timestamps, columns = buffered
+        else:
+            rows = DeviceStats.objects.filter(
+                device=device,
+                timestamp__gte=start_date
+            ).order_by('timestamp').values_list('timestamp', *tsstore.METRICS)
+            timestamps, columns = downsample.columns_from_rows(rows, tsstore.METRICS)
     
-    return JsonResponse(result)
+    return JsonResponse(downsample.downsample_columns(timestamps, columns, points))
 
 # Export devices to CSV
 @login_required
@@ -420,7 +398,26 @@ def download_device_stats(request):
     response['Content-Disposition'] = 'attachment; filename="device_stats.csv"'
     
     writer = csv.writer(response)
-    writer.writerow(['Device', 'Timestamp', 'CPU Usage (%)', 'Temperature (°C)', 'Latency (ms)', 'Bandwidth (Mbps)'])
+    writer.writerow(['Device', 'Timestamp', 'CPU Usage (%)', 'Temperature (°C)', 'Outbound Traffic (Mbps)', 'Bandwidth (Mbps)'])
+    
+    # Export from the columnar store when it is enabled
+    store = tsstore.get_store()
+    if store is not None:
+        if device_id:
+            devices = Device.objects.filter(pk=device_id)
+        else:
+            devices = Device.objects.filter(branch=request.session.get('branch', 'Unknown'))
+        if not devices:
+            writer.writerow(['Device not found'])
+        start_ms = tsstore.to_epoch_ms(timezone.now() - timedelta(days=days))
+        end_ms = tsstore.to_epoch_ms(timezone.now())
+        for device in devices:
+            timestamps, columns = store.read_columns(device.id, start_ms, end_ms)
+            for timestamp, row in tsstore.iter_rows(timestamps, columns):
+                writer.writerow([device.name, timestamp.strftime('%Y-%m-%d %H:%M:%S')] + [
+                    row[metric] if row[metric] is not None else 'N/A' for metric in tsstore.METRICS
+                ])
+        return response
     
     if device_id:
         # Download stats for specific device
@@ -479,10 +476,9 @@ def dashboard(request):
     down_devices = all_devices.filter(status='Down').count()
     unknown_devices = all_devices.filter(status='Unknown').count()
     
-    # Get recent alerts
-    recent_alerts = DeviceStats.objects.filter(
-        device__branch=branch,
-        alert_triggered=True
+    # Get recent alerts (DeviceAlert lives in the time-series database, so filter by id list instead of joining)
+    recent_alerts = DeviceAlert.objects.filter(
+        device_id__in=list(all_devices.values_list('id', flat=True))
     ).order_by('-timestamp')[:10]
     
     context = {
@@ -542,10 +538,9 @@ def update_device_stats():
         new_status = check_device_status(device.ip_address)
         
         # Update device metrics
-        cpu_usage = fetch_snmp_data(device.ip_address, '1.3.6.1.4.1.2021.11.10.0')
-        temperature = fetch_snmp_data(device.ip_address, '1.3.6.1.4.1.2021.13.16.0')
-        latency = fetch_snmp_data(device.ip_address, '1.3.6.1.2.1.31.1.1.1.10.1')
-        bandwidth = fetch_snmp_data(device.ip_address, '1.3.6.1.2.1.31.1.1.1.15.1')
+        values = collector.collect(device)
+        cpu_usage = values['cpu_usage']
+        temperature = values['temperature']
         
         # Check for alerts
         alert_triggered = False
@@ -564,25 +559,15 @@ def update_device_stats():
             alert_triggered = True
             alert_message += f"\nHigh temperature ({temperature}°C)"
         
-        # Update device
-        device.status = new_status
-        device.cpu_usage = cpu_usage
-        device.temperature = temperature
-        device.latency = latency
-        device.bandwidth = bandwidth
-        device.last_updated = timezone.now()
-        device.save()
-        
-        # Create stats record
-        stats = DeviceStats.objects.create(
-            device=device,
-            cpu_usage=cpu_usage,
-            temperature=temperature,
-            latency=latency,
-            bandwidth=bandwidth,
+        # Update the device and record history through the ingest pipeline
+        ingest.submit([ingest.make_sample(
+            device.id,
+            timezone.now(),
+            values,
+            status=new_status,
             alert_triggered=alert_triggered,
             alert_message=alert_message.strip() if alert_triggered else ""
-        )
+        )])
         
         # Send notification if alert triggered
         if alert_triggered:
@@ -617,9 +602,9 @@ def alerts_api(request):
     days = int(request.GET.get('days', 7))
     
     start_date = timezone.now() - timedelta(days=days)
-    alerts = DeviceStats.objects.filter(
-        device__branch=branch,
-        alert_triggered=True,
+    branch_device_ids = list(Device.objects.filter(branch=branch).values_list('id', flat=True))
+    alerts = DeviceAlert.objects.filter(
+        device_id__in=branch_device_ids,
         timestamp__gte=start_date
     ).order_by('-timestamp')
     
@@ -629,7 +614,7 @@ def alerts_api(request):
             'device_name': alert.device.name,
             'device_id': alert.device.id,
             'timestamp': alert.timestamp.strftime('%Y-%m-%d %H:%M'),
-            'message': alert.alert_message
+            'message': alert.message
         })
     
     return JsonResponse({'alerts': result})